@@ -0,0 +1,191 @@
+"""Measure the memory use of pazel on synthetic projects of increasing size.
+
+Each run generates BUILD files for a generated project in a fresh interpreter and reports the peak
+memory allocated by Python (tracemalloc), the memory still allocated at the end of the run, and the
+peak resident set size. Compare the default mode with --low-memory, e.g.
+
+    python benchmarks/memory_benchmark.py --num-files 1000 4000 16000
+
+The benchmark fails if the memory use of low-memory mode is not flat, i.e. if its peak or end memory
+grows by more than --max-growth from the smallest to the largest project, or if its peak exceeds
+that of the default mode for the largest project.
+
+The benchmark needs Python 3 on Unix for tracemalloc and resource. pazel itself still supports
+Python 2.7, but the benchmark exits with an error there.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    import resource
+    import tracemalloc
+except ImportError:     # Python 2 or Windows.
+    resource = tracemalloc = None
+
+FILES_PER_DIRECTORY = 20
+DIRECTORIES_PER_PACKAGE = 10
+IMPORTS_PER_FILE = 5
+
+# Growth of the memory use of low-memory mode that still counts as flat. Parsing scripts grows the
+# identifier table of the interpreter in steps of about 1 MB, independently of pazel's own state.
+DEFAULT_MAX_GROWTH = 1.5
+
+# Run in a child process so that every measurement starts from a fresh interpreter.
+CHILD_SOURCE = """
+import json
+import resource
+import sys
+import tracemalloc
+
+sys.path.insert(0, sys.argv[1])
+
+from pazel.app import app
+
+tracemalloc.start()
+app(sys.argv[2], sys.argv[2], False, sys.argv[3], low_memory=sys.argv[4] == 'True')
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print(json.dumps({'peak': peak, 'current': current,
+                  'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def generate_project(project_root, num_files, seed=0):
+    """Generate a project whose modules import stdlib modules and earlier modules of the project.
+
+    Args:
+        project_root (str): Directory in which the project is generated.
+        num_files (int): Number of Python files.
+        seed (int): Seed for choosing the imported modules.
+    """
+    rng = random.Random(seed)
+    modules = []
+
+    for i in range(num_files):
+        package = 'pkg%d' % (i // (FILES_PER_DIRECTORY * DIRECTORIES_PER_PACKAGE))
+        directory = '%s/sub%d' % (package, (i // FILES_PER_DIRECTORY) % DIRECTORIES_PER_PACKAGE)
+        modules.append((directory, 'mod%d' % i))
+
+    for i, (directory, module) in enumerate(modules):
+        path = os.path.join(project_root, directory)
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+            for init_directory in (os.path.dirname(path), path):
+                open(os.path.join(init_directory, '__init__.py'), 'a').close()
+
+        lines = ['import json', 'import os']
+        lines += ['from %s import %s' % (imported_directory.replace('/', '.'), imported_module)
+                  for imported_directory, imported_module in
+                  rng.sample(modules[:i], min(IMPORTS_PER_FILE, i))]
+        lines += ['', '', 'def main():', '    return %r' % ('data ' * 200)]
+
+        with open(os.path.join(path, module + '.py'), 'w') as script_file:
+            script_file.write('\n'.join(lines) + '\n')
+
+
+def remove_build_files(project_root):
+    """Remove the BUILD files generated by an earlier run."""
+    for dirpath, _, filenames in os.walk(project_root):
+        if 'BUILD' in filenames:
+            os.remove(os.path.join(dirpath, 'BUILD'))
+
+
+def measure(project_root, pazelrc_path, low_memory):
+    """Generate BUILD files for a project in a child process and return its memory use."""
+    remove_build_files(project_root)
+    pazel_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', CHILD_SOURCE,
+                                      pazel_root, project_root, pazelrc_path, str(low_memory)])
+
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def check_flat(results, max_growth):
+    """Check that the memory use of low-memory mode stays flat as the number of files grows.
+
+    Args:
+        results (dict): Mapping from (number of files, low_memory) to the measured memory use.
+        max_growth (float): Growth in MB of the peak and end memory of low-memory mode that still
+            counts as flat.
+
+    Returns:
+        failures (list of str): Descriptions of the violated conditions. Empty if memory is flat.
+    """
+    smallest, largest = min(num_files for num_files, _ in results), max(results)[0]
+    failures = []
+
+    for key, name in (('peak', 'Peak'), ('current', 'End')):
+        growth = (results[(largest, True)][key] - results[(smallest, True)][key]) / 1e6
+
+        if growth > max_growth:
+            failures.append('%s memory of low-memory mode grew by %.1f MB from %d to %d files.' %
+                            (name, growth, smallest, largest))
+
+    if results[(largest, True)]['peak'] > results[(largest, False)]['peak']:
+        failures.append('Peak memory of low-memory mode exceeds the default mode for %d files.' %
+                        largest)
+
+    return failures
+
+
+def main():
+    """Parse command-line flags, print a table of the measurements, and check them."""
+    parser = argparse.ArgumentParser(description='Measure the memory use of pazel.')
+    parser.add_argument('--num-files', type=int, nargs='+', default=[1000, 2000, 4000, 8000],
+                        help='Numbers of files in the generated projects.')
+    parser.add_argument('-c', '--pazelrc', type=str, default=os.devnull,
+                        help='.pazelrc used for all runs, e.g. to benchmark REDUCE_DEPS.')
+    parser.add_argument('--max-growth', type=float, default=DEFAULT_MAX_GROWTH,
+                        help='Growth in MB of the memory use of low-memory mode that still counts'
+                        ' as flat. Defaults to %(default)s.')
+    args = parser.parse_args()
+
+    if resource is None or tracemalloc is None:
+        parser.error('measuring memory requires tracemalloc and resource, i.e. Python 3 on Unix.')
+
+    results = dict()
+
+    print('%8s  %-10s  %12s  %12s  %12s' %
+          ('files', 'mode', 'peak (MB)', 'end (MB)', 'max RSS (MB)'))
+
+    for num_files in args.num_files:
+        project_root = tempfile.mkdtemp()
+
+        try:
+            generate_project(project_root, num_files)
+
+            for low_memory in (False, True):
+                result = measure(project_root, os.path.abspath(args.pazelrc), low_memory)
+                results[(num_files, low_memory)] = result
+
+                print('%8d  %-10s  %12.1f  %12.1f  %12.1f' % (
+                    num_files, 'low-memory' if low_memory else 'default', result['peak'] / 1e6,
+                    result['current'] / 1e6, result['max_rss'] / 1024))
+        finally:
+            shutil.rmtree(project_root)
+
+    failures = check_flat(results, args.max_growth)
+
+    for failure in failures:
+        print('FAILED: ' + failure)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
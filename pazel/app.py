@@ -5,18 +5,87 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import json
 import os
+import sys
 
+from pazel.audit import audit_build_files
+from pazel.audit import has_problems
+from pazel.buildozer import BuildozerCommands
+from pazel.directory_fingerprints import ALL_DIRECTORIES
+from pazel.directory_fingerprints import DirectoryFingerprints
+from pazel.directory_fingerprints import fingerprint_directory
+from pazel.directory_fingerprints import IMPORT_DIRECTORIES
+from pazel.distribution_index import DEFAULT_CACHE_DIR
+from pazel.distribution_index import get_distribution_index
+from pazel.distribution_index import get_environment_fingerprint
+from pazel.distribution_index import read_pinned_requirements
+from pazel.error_report import DEFAULT_FILE_TIME_BUDGET
+from pazel.error_report import ErrorCollector
+from pazel.error_report import format_errors
+from pazel.generate_rule import parse_directory_and_generate_rules
 from pazel.generate_rule import parse_script_and_generate_rule
+from pazel.granularity import AggregatedModuleLabels
+from pazel.granularity import DIRECTORY_GRANULARITY
+from pazel.granularity import get_granularity
+from pazel.graph_stats import compute_target_stats
+from pazel.graph_stats import format_target_stats
 from pazel.helpers import get_build_file_path
 from pazel.helpers import is_ignored
 from pazel.helpers import is_python_file
+from pazel.hook_stats import HOOK_STATS
+from pazel.import_cycles import find_import_cycles
+from pazel.import_cycles import format_import_cycles
+from pazel.import_graph import build_import_graph
+from pazel.import_graph import GRAPH_FORMATS
+from pazel.import_graph import write_graph
+from pazel.import_probes import PROBES
+from pazel.label_index import LabelIndex
+from pazel.module_trie import refresh_module_tries
+from pazel.module_trie import release_module_tries
+from pazel.output_build import BuildFileWriter
 from pazel.output_build import output_build_file
 from pazel.parse_build import get_ignored_rules
+from pazel.parse_imports import DEFAULT_IMPORT_SCAN_BUDGET
+from pazel.pazel_extensions import parse_granularity
+from pazel.pazel_extensions import parse_label_index
 from pazel.pazel_extensions import parse_pazel_extensions
+from pazel.pazel_extensions import parse_reduce_deps
+from pazel.pazel_extensions import parse_split_binaries
+from pazel.pazel_extensions import parse_tests_per_shard
+from pazel.reduce_deps import DependencyReducer
+from pazel.requirement_sets import compute_requirement_sets
+from pazel.requirement_sets import write_requirements_files
+from pazel.sharding import get_relative_directory
+from pazel.sharding import in_shard
+from pazel.sharding import parse_shard
+from pazel.sharding import verify_shard_manifests
+from pazel.sharding import write_shard_manifest
+from pazel.split_binaries import SplitBinaryLabels
+from pazel.timing_index import TimingIndex
 
 
-def app(input_path, project_root, contains_pre_installed_packages, pazelrc_path):
+def _get_package(relative_directory):
+    """Get the Bazel package of a directory relative to the project root, '' for the root."""
+    return '' if relative_directory == '.' else relative_directory
+
+
+def _get_file_key(path):
+    """Identify the version of a file by its path, size, and modification time, if it exists."""
+    if not path or not os.path.exists(path):
+        return path
+
+    file_stat = os.stat(path)
+
+    return [os.path.abspath(path), file_stat.st_size, file_stat.st_mtime]
+
+
+def app(input_path, project_root, contains_pre_installed_packages, pazelrc_path, shard=None,
+        shard_manifest_path=None, import_scan_budget=None, test_timings_path=None,
+        testlogs_path=None, all_or_nothing=False, infer_pip_names=False,
+        requirements_lock_path=None, python=None, cache_dir=None, low_memory=False,
+        keep_going=False, file_time_budget=None, incremental=False, buildozer_commands=None,
+        skip_unchanged=False):
     """Generate BUILD file(s) for a Python script or a directory of Python scripts.
 
     Args:
@@ -26,6 +95,46 @@ def app(input_path, project_root, contains_pre_installed_packages, pazelrc_path)
         contains_pre_installed_packages (bool): Whether the environment is allowed to contain
             pre-installed packages or whether only the Python standard library is available.
         pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+        shard (tuple of int): Tuple (shard index, number of shards). Only the directories assigned
+            to the shard are handled. None handles all directories.
+        shard_manifest_path (str): If given, the directories handled by this run are written to
+            this path for verifying the coverage of all shards.
+        import_scan_budget (int): If given, imports are scanned from the import preamble of each
+            script without parsing the whole script, reading at most this many bytes.
+        test_timings_path (str): Path to a cached index of test durations. The size and timeout of
+            tests are inferred from the durations.
+        testlogs_path (str): Path to bazel-testlogs. Test durations are read from it to the index.
+        all_or_nothing (bool): If True, the BUILD files are written only if all of them could be
+            generated. Otherwise, each BUILD file is written as soon as it has been generated.
+        infer_pip_names (bool): If True, pip names of imported packages are looked up from the
+            metadata of the distributions installed for the target interpreter, see python.
+        requirements_lock_path (str): Path to a requirements lock file. If given, pip names are
+            looked up only from the distributions pinned in it.
+        python (str): Path to the Python interpreter of the target environment. If given, imported
+            modules are probed in a worker process running the interpreter instead of in pazel's
+            own interpreter.
+        cache_dir (str): Directory in which the results of probing imports and the index of
+            installed distributions are cached across runs. None disables caching.
+        low_memory (bool): If True, state that grows with the number of files is not kept for the
+            whole run, so that peak memory use stays roughly flat as the project grows. Imports of
+            packages that are not installed are not memoized one by one, and the module trie, the
+            labels of imported modules, and the import closures used by REDUCE_DEPS are rebuilt
+            for each directory.
+        keep_going (bool): If True, the failures of all files that cannot be handled are
+            collected, directories with failures keep their existing BUILD files, and the other
+            directories are handled as usual.
+        file_time_budget (float): With keep_going, handling a file that takes longer than this
+            many seconds counts as a failure. None disables the budget.
+        incremental (bool): If True, only the rules that have changed are updated in existing
+            BUILD files and everything else in them is kept as is.
+        buildozer_commands (BuildozerCommands): If given, BUILD files are not written. Instead, the
+            buildozer commands that turn the existing rules into the generated ones are collected.
+        skip_unchanged (bool): If True, directories are skipped if neither their files nor the
+            directories in which their imports are resolved have changed since the previous run.
+            Requires cache_dir.
+
+    Returns:
+        errors (list of FileError): Failures collected with keep_going. Empty otherwise.
 
     Raises:
         RuntimeError: input_path does is not a directory or a Python file.
@@ -34,71 +143,252 @@ def app(input_path, project_root, contains_pre_installed_packages, pazelrc_path)
     output_extension, custom_bazel_rules, custom_import_inference_rules, import_name_to_pip_name, \
         local_import_name_to_dep, requirement_load = parse_pazel_extensions(pazelrc_path)
 
-    # Handle directories.
-    if os.path.isdir(input_path):
-        # Traverse the directory recursively.
-        for dirpath, _, filenames in os.walk(input_path):
+    # Tests with many test methods are sharded.
+    tests_per_shard = parse_tests_per_shard(pazelrc_path)
+
+    # Read recorded test durations and ingest new ones, if any.
+    test_timings = None
+
+    if test_timings_path or testlogs_path:
+        test_timings = TimingIndex(test_timings_path)
+
+        if testlogs_path:
+            test_timings.ingest(testlogs_path)
+
+            if test_timings_path:
+                test_timings.save()
+
+    # Binaries with a main block are split into a py_library and a py_binary.
+    split_binaries = parse_split_binaries(pazelrc_path)
+
+    # Libraries in directories with 'directory' granularity are aggregated to a single target.
+    granularity, directory_granularity = parse_granularity(pazelrc_path)
+    module_labels = None
+
+    if DIRECTORY_GRANULARITY in [granularity] + list(directory_granularity.values()):
+        module_labels = AggregatedModuleLabels(project_root, granularity, directory_granularity,
+                                               custom_bazel_rules, split_binaries)
+
+    # Code importing a binary depends on the py_library split from it.
+    if split_binaries:
+        module_labels = SplitBinaryLabels(project_root, custom_bazel_rules, module_labels)
+
+    # Dependencies on modules owned by ignored rules, e.g. hand-written aggregates, point at them.
+    if parse_label_index(pazelrc_path):
+        module_labels = LabelIndex(project_root, cache_dir, module_labels)
+
+    # Optionally, leave out dependencies that are reachable through other dependencies.
+    dependency_reducer = None
+
+    if parse_reduce_deps(pazelrc_path):
+        dependency_reducer = DependencyReducer(project_root, contains_pre_installed_packages,
+                                               custom_bazel_rules, custom_import_inference_rules,
+                                               local_import_name_to_dep, import_scan_budget)
+
+    # Every BUILD file is written atomically. In all-or-nothing mode, they are staged next to the
+    # BUILD files and moved into place only after all of them have been generated.
+    writer = BuildFileWriter(all_or_nothing)
+    error_collector = ErrorCollector(keep_going, file_time_budget if keep_going else None)
+
+    if python:
+        PROBES.start_worker(python)
+
+    PROBES.low_memory = low_memory
+
+    # Check the project tree for changes since the previous run once, not for every import.
+    refresh_module_tries()
+
+    # Remember from earlier runs which imported modules are installed.
+    if cache_dir:
+        PROBES.load_cache(cache_dir)
+
+    # Complement the pip names given in .pazelrc with the names of the distributions installed for
+    # the target interpreter.
+    if infer_pip_names or requirements_lock_path:
+        inferred_import_name_to_pip_name = get_distribution_index(PROBES.get_search_paths(),
+                                                                  requirements_lock_path,
+                                                                  cache_dir)
+        inferred_import_name_to_pip_name.update(import_name_to_pip_name)
+        import_name_to_pip_name = inferred_import_name_to_pip_name
+
+    # Skip the directories that have not changed since the previous run. Changes to anything else
+    # that affects the generated rules, including pazel itself, invalidate all directories.
+    fingerprints = None
+
+    if skip_unchanged and cache_dir and buildozer_commands is None and not testlogs_path and \
+            os.path.isdir(input_path):
+        configuration = [fingerprint_directory(os.path.dirname(os.path.abspath(__file__)))[0],
+                         PROBES.get_environment_key(), contains_pre_installed_packages,
+                         import_scan_budget, incremental, _get_file_key(pazelrc_path),
+                         _get_file_key(test_timings_path), _get_file_key(requirements_lock_path)]
+
+        if infer_pip_names or requirements_lock_path:
+            configuration.append(get_environment_fingerprint(PROBES.get_search_paths()))
+
+        fingerprints = DirectoryFingerprints(project_root, cache_dir, configuration, shard)
+
+        # Fingerprint the input directories before any BUILD file in them is written.
+        fingerprints.get_fingerprint(get_relative_directory(input_path, project_root))
+
+    try:
+        # Handle directories.
+        if os.path.isdir(input_path):
+            handled_directories = []
+
+            # Traverse the directory recursively.
+            for dirpath, dirnames, filenames in os.walk(input_path):
+                # Skip directories assigned to other shards. Imports are resolved against the
+                # project tree on disk and not against generated BUILD files, so every shard
+                # generates the same rules for its directories as a single unsharded run would.
+                if not in_shard(dirpath, project_root, shard):
+                    continue
+
+                relative_directory = get_relative_directory(dirpath, project_root)
+
+                if shard_manifest_path:
+                    handled_directories.append(relative_directory)
+
+                if fingerprints is not None and fingerprints.is_unchanged(relative_directory):
+                    # The shard manifest lists every directory, so it needs the whole walk.
+                    if not shard_manifest_path and \
+                            fingerprints.is_subtree_unchanged(relative_directory):
+                        del dirnames[:]
+
+                    continue
+
+                if fingerprints is not None:
+                    IMPORT_DIRECTORIES.start()
+
+                # With --keep-going, failures leave the BUILD file of the directory as it is.
+                build_file_path = get_build_file_path(dirpath)
+                num_errors = len(error_collector.errors)
+
+                with error_collector.collect(build_file_path):
+                    # Parse ignored rules in an existing BUILD file, if any.
+                    ignored_rules = get_ignored_rules(build_file_path)
+
+                    # Generate Bazel rules for the Python files that are not in the list of ignored
+                    # rules.
+                    script_paths = [os.path.join(dirpath, filename)
+                                    for filename in sorted(filenames)]
+                    script_paths = [path for path in script_paths
+                                    if is_python_file(path) and not is_ignored(path, ignored_rules)]
+
+                    if get_granularity(relative_directory, granularity,
+                                       directory_granularity) == DIRECTORY_GRANULARITY:
+                        new_rules = parse_directory_and_generate_rules(
+                            dirpath, script_paths, project_root, contains_pre_installed_packages,
+                            custom_bazel_rules, custom_import_inference_rules,
+                            import_name_to_pip_name, local_import_name_to_dep, module_labels,
+                            import_scan_budget, test_timings, tests_per_shard, dependency_reducer,
+                            error_collector, split_binaries)
+                    else:
+                        new_rules = []
+
+                        for path in script_paths:
+                            with error_collector.check(path):
+                                new_rules.append(parse_script_and_generate_rule(
+                                    path, project_root, contains_pre_installed_packages,
+                                    custom_bazel_rules, custom_import_inference_rules,
+                                    import_name_to_pip_name, local_import_name_to_dep,
+                                    import_scan_budget, module_labels, test_timings,
+                                    tests_per_shard, dependency_reducer, split_binaries))
+
+                    # Separate the rules by newlines.
+                    build_source = (2*'\n').join([rule for rule in new_rules if rule])
+
+                    # A directory in which any file failed keeps its existing BUILD file.
+                    error_collector.abandon_if_failed()
+
+                    # If Python files were found, output the BUILD file.
+                    if buildozer_commands is not None:
+                        buildozer_commands.add_directory(build_file_path, build_source,
+                                                         _get_package(relative_directory))
+                    elif build_source != '' or ignored_rules:
+                        output_build_file(build_source, ignored_rules, output_extension,
+                                          custom_bazel_rules, build_file_path, requirement_load,
+                                          writer, incremental)
+
+                if fingerprints is not None:
+                    dependencies = IMPORT_DIRECTORIES.stop()
+
+                    # The reduced deps depend on the imports of modules anywhere in the project.
+                    if dependency_reducer is not None:
+                        dependencies = set([ALL_DIRECTORIES])
+
+                    # Directories that failed are handled again in the next run.
+                    if len(error_collector.errors) == num_errors:
+                        fingerprints.record(relative_directory, dependencies)
+
+                # The memoized closures can grow quadratically with the number of modules.
+                if low_memory and dependency_reducer is not None:
+                    dependency_reducer.release_closures()
+
+                # The module trie and the memoized labels grow with the number of imported modules.
+                if low_memory:
+                    release_module_tries()
+
+                    if module_labels is not None:
+                        module_labels.release()
+
+            if shard_manifest_path:
+                write_shard_manifest(shard_manifest_path, shard or (0, 1), handled_directories)
+        # Handle single Python file.
+        elif is_python_file(input_path):
             build_source = ''
+            build_file_path = get_build_file_path(input_path)
 
-            # Parse ignored rules in an existing BUILD file, if any.
-            build_file_path = get_build_file_path(dirpath)
-            ignored_rules = get_ignored_rules(build_file_path)
-
-            for filename in sorted(filenames):
-                path = os.path.join(dirpath, filename)
-
-                # If a Python file is met and it is not in the list of ignored rules,
-                # generate a Bazel rule for it.
-                if is_python_file(path) and not is_ignored(path, ignored_rules):
-                    new_rule = parse_script_and_generate_rule(path, project_root,
-                                                              contains_pre_installed_packages,
-                                                              custom_bazel_rules,
-                                                              custom_import_inference_rules,
-                                                              import_name_to_pip_name,
-                                                              local_import_name_to_dep)
-
-                    # Add the new rule and a newline between it and any previous rules.
-                    if new_rule:
-                        if build_source:
-                            build_source += 2*'\n'
-
-                        build_source += new_rule
-
-            # If Python files were found, output the BUILD file.
-            if build_source != '' or ignored_rules:
-                output_build_file(build_source, ignored_rules, output_extension, custom_bazel_rules,
-                                  build_file_path, requirement_load)
-    # Handle single Python file.
-    elif is_python_file(input_path):
-        build_source = ''
-
-        # Parse ignored rules in an existing BUILD file, if any.
-        build_file_path = get_build_file_path(input_path)
-        ignored_rules = get_ignored_rules(build_file_path)
-
-        # Check that the script is not in the list of ignored rules.
-        if not is_ignored(input_path, ignored_rules):
-            build_source = parse_script_and_generate_rule(input_path, project_root,
-                                                          contains_pre_installed_packages,
-                                                          custom_bazel_rules,
-                                                          custom_import_inference_rules,
-                                                          import_name_to_pip_name,
-                                                          local_import_name_to_dep)
-
-        # If Python files were found, output the BUILD file.
-        if build_source != '' or ignored_rules:
-            output_build_file(build_source, ignored_rules, output_extension, custom_bazel_rules,
-                              build_file_path, requirement_load)
-    else:
-        raise RuntimeError("Invalid input path %s." % input_path)
+            with error_collector.collect(build_file_path):
+                # Parse ignored rules in an existing BUILD file, if any.
+                ignored_rules = get_ignored_rules(build_file_path)
 
+                # Check that the script is not in the list of ignored rules.
+                if not is_ignored(input_path, ignored_rules):
+                    with error_collector.check(input_path):
+                        build_source = parse_script_and_generate_rule(
+                            input_path, project_root, contains_pre_installed_packages,
+                            custom_bazel_rules, custom_import_inference_rules,
+                            import_name_to_pip_name, local_import_name_to_dep, import_scan_budget,
+                            module_labels, test_timings, tests_per_shard, dependency_reducer,
+                            split_binaries)
+
+                error_collector.abandon_if_failed()
+
+                # If Python files were found, output the BUILD file.
+                if buildozer_commands is not None:
+                    relative_directory = get_relative_directory(os.path.dirname(input_path),
+                                                                project_root)
+                    buildozer_commands.add_directory(build_file_path, build_source,
+                                                     _get_package(relative_directory))
+                elif build_source != '' or ignored_rules:
+                    output_build_file(build_source, ignored_rules, output_extension,
+                                      custom_bazel_rules, build_file_path, requirement_load, writer,
+                                      incremental)
+        else:
+            raise RuntimeError("Invalid input path %s." % input_path)
+
+    except BaseException:
+        writer.rollback()
+        raise
+    finally:
+        PROBES.save_cache()
+        PROBES.stop_worker()
+
+        if low_memory:
+            release_module_tries()
+
+    writer.commit()
+
+    # Fingerprint the directories only after their BUILD files have been written.
+    if fingerprints is not None:
+        fingerprints.save()
+
+    return error_collector.errors
 
-def main():
-    """Parse command-line flags and generate the BUILD files accordingly."""
-    parser = argparse.ArgumentParser(description='Generate Bazel BUILD files for a Python project.')
 
+def _add_project_arguments(parser):
+    """Add the command-line arguments that locate the project and configure pazel."""
     working_directory = os.getcwd()
-    default_pazelrc_path = os.path.join(working_directory, '.pazelrc')
 
     parser.add_argument('input_path', nargs='?', type=str, default=working_directory,
                         help='Target Python file or directory of Python files.'
@@ -109,19 +399,297 @@ def main():
     parser.add_argument('-p', '--pre-installed-packages', action='store_true',
                         help='Target will be run in an environment with packages pre-installed.'
                         ' Affects which packages are listed as pip-installable.')
-    parser.add_argument('-c', '--pazelrc', type=str, default=default_pazelrc_path,
-                        help='Path to .pazelrc file.')
+    parser.add_argument('-c', '--pazelrc', type=str, default=None,
+                        help='Path to .pazelrc file. Defaults to .pazelrc in the current working'
+                        ' directory.')
+
+
+def _check_pazelrc(args):
+    """Default to .pazelrc in the working directory. If the user specified a file, it must exist."""
+    if args.pazelrc is None:
+        args.pazelrc = os.path.join(os.getcwd(), '.pazelrc')
+    else:
+        assert os.path.isfile(args.pazelrc), ".pazelrc file %s not found." % args.pazelrc
+
+
+def graph_main(argv):
+    """Parse command-line flags of 'pazel graph' and write the import graph of the project."""
+    parser = argparse.ArgumentParser(prog='pazel graph',
+                                     description='Write the import graph of a Python project.')
+    _add_project_arguments(parser)
+    parser.add_argument('-f', '--format', type=str, default='json', choices=GRAPH_FORMATS,
+                        help='Output format. Defaults to %(default)s.')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='Output file. Defaults to the standard output.')
+
+    args = parser.parse_args(argv)
+    _check_pazelrc(args)
+
+    graph = build_import_graph(args.input_path, args.project_root, args.pre_installed_packages,
+                               args.pazelrc)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            write_graph(graph, output, args.format)
+    else:
+        write_graph(graph, sys.stdout, args.format)
+
+
+def cycles_main(argv):
+    """Parse command-line flags of 'pazel cycles' and report the import cycles of the project."""
+    parser = argparse.ArgumentParser(prog='pazel cycles',
+                                     description='Report import cycles in a Python project.')
+    _add_project_arguments(parser)
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with a non-zero status if there are import cycles.')
+
+    args = parser.parse_args(argv)
+    _check_pazelrc(args)
+
+    graph = build_import_graph(args.input_path, args.project_root, args.pre_installed_packages,
+                               args.pazelrc)
+    cycles = find_import_cycles(graph)
+
+    print(format_import_cycles(graph, cycles))
+
+    if cycles and args.check:
+        sys.exit(1)
+
+
+def stats_main(argv):
+    """Parse command-line flags of 'pazel stats' and report fan-in and fan-out of the targets."""
+    parser = argparse.ArgumentParser(prog='pazel stats',
+                                     description='Report fan-in, fan-out, and closure sizes of the'
+                                     ' targets of a Python project.')
+    _add_project_arguments(parser)
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of targets listed for each statistic.'
+                        ' Defaults to %(default)s.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the statistics of every target as JSON.')
+
+    args = parser.parse_args(argv)
+    _check_pazelrc(args)
+
+    graph = build_import_graph(args.input_path, args.project_root, args.pre_installed_packages,
+                               args.pazelrc)
+    stats = compute_target_stats(graph)
+
+    if args.json:
+        print(json.dumps([target.to_dict() for target in stats], indent=2, sort_keys=True))
+    else:
+        print(format_target_stats(stats, args.top))
+
+
+def audit_main(argv):
+    """Parse command-line flags of 'pazel audit' and report problems in the deps of BUILD files."""
+    parser = argparse.ArgumentParser(prog='pazel audit',
+                                     description='Report unused, missing, and mislabeled deps in'
+                                     ' existing BUILD files without modifying them.')
+    _add_project_arguments(parser)
+    parser.add_argument('--all', action='store_true',
+                        help='Report also the rules whose deps have no problems.')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with a non-zero status if some deps have problems.')
+
+    args = parser.parse_args(argv)
+    _check_pazelrc(args)
+
+    findings = audit_build_files(args.input_path, args.project_root, args.pre_installed_packages,
+                                 args.pazelrc)
+    problems = [finding for finding in findings if has_problems(finding)]
+
+    print(json.dumps(findings if args.all else problems, indent=2, sort_keys=True))
+
+    if problems and args.check:
+        sys.exit(1)
+
+
+def requirements_main(argv):
+    """Parse command-line flags of 'pazel requirements' and output the requirements of binaries."""
+    parser = argparse.ArgumentParser(prog='pazel requirements',
+                                     description='Output the minimal pinned requirements of each'
+                                     ' binary of a Python project.')
+    _add_project_arguments(parser)
+    parser.add_argument('--requirements-lock', type=str, default=None,
+                        help='Lock file from which the requirements are pinned. Distributions that'
+                        ' the pinned distributions require are read from its "# via" comments.')
+    parser.add_argument('--infer-pip-names', action='store_true',
+                        help='Look up pip names of imported packages from installed distributions.')
+    parser.add_argument('--tests', action='store_true',
+                        help='Output the requirements of tests as well as binaries.')
+    parser.add_argument('-o', '--output-dir', type=str, default=None,
+                        help='Write one requirements file per binary to this directory, e.g.'
+                        ' foo/bar.txt for //foo:bar, instead of printing JSON.')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with a non-zero status if some imported distributions are not'
+                        ' pinned in the lock file.')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Directory for caching information about the Python environment.')
+
+    args = parser.parse_args(argv)
+    _check_pazelrc(args)
+
+    graph = build_import_graph(args.input_path, args.project_root, args.pre_installed_packages,
+                               args.pazelrc)
+    pins, dependents, import_name_to_pip_name = None, None, None
+
+    if args.requirements_lock:
+        pins, dependents = read_pinned_requirements(args.requirements_lock)
+
+    if args.infer_pip_names or args.requirements_lock:
+        import_name_to_pip_name = get_distribution_index(lock_path=args.requirements_lock,
+                                                         cache_dir=args.cache_dir)
+
+    rules = ('py_binary', 'py_test') if args.tests else ('py_binary',)
+    requirement_sets = compute_requirement_sets(graph, pins, dependents, import_name_to_pip_name,
+                                                rules)
+    unpinned = [requirement_set for requirement_set in requirement_sets
+                if requirement_set.unpinned]
+
+    for requirement_set in unpinned:
+        print('%s imports distributions that are not pinned: %s'
+              % (requirement_set.label, ', '.join(requirement_set.unpinned)), file=sys.stderr)
+
+    if args.output_dir:
+        write_requirements_files(requirement_sets, args.output_dir)
+    else:
+        print(json.dumps([requirement_set.to_dict() for requirement_set in requirement_sets],
+                         indent=2, sort_keys=True))
+
+    if unpinned and args.check:
+        sys.exit(1)
+
+
+# Subcommands such as 'pazel graph'. Without a subcommand, pazel generates BUILD files.
+COMMANDS = {'audit': audit_main, 'cycles': cycles_main, 'graph': graph_main,
+            'requirements': requirements_main, 'stats': stats_main}
+
+
+def main():
+    """Parse command-line flags and generate the BUILD files accordingly."""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description='Generate Bazel BUILD files for a Python project.')
+
+    _add_project_arguments(parser)
+    parser.add_argument('--shard', type=str, default=None,
+                        help='Generate BUILD files only for the directories of shard i/N, e.g. 0/4.'
+                        ' Directories are assigned to shards deterministically by their path.')
+    parser.add_argument('--shard-manifest', type=str, default=None,
+                        help='Write the directories handled by this run to the given JSON file.')
+    parser.add_argument('--verify-shards', type=str, nargs='+', default=None, metavar='MANIFEST',
+                        help='Instead of generating BUILD files, verify that the given shard'
+                        ' manifests cover every directory of the input path exactly once.')
+    parser.add_argument('--fast-imports', action='store_true',
+                        help='Scan imports from the import preamble of each file instead of parsing'
+                        ' whole files. Files with imports later in the file are parsed fully.')
+    parser.add_argument('--test-timings', type=str, default=None,
+                        help='Path to a cached index of test durations used for inferring the size'
+                        ' and timeout of tests. Updated if --testlogs is given.')
+    parser.add_argument('--testlogs', type=str, default=None,
+                        help='Path to bazel-testlogs from which test durations are read.')
+    parser.add_argument('--infer-pip-names', action='store_true',
+                        help='Look up pip names of imported packages from installed distributions.')
+    parser.add_argument('--requirements-lock', type=str, default=None,
+                        help='Look up pip names from the distributions pinned in this lock file.')
+    parser.add_argument('--python', type=str, default=None,
+                        help='Python interpreter of the target environment for probing imports.')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Directory for caching information about the Python environment.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not cache information about the Python environment across runs.')
+    parser.add_argument('--all-or-nothing', action='store_true',
+                        help='Write the BUILD files only if all of them can be generated.')
+    parser.add_argument('--keep-going', action='store_true',
+                        help='Keep going past files that cannot be handled. Their directories keep'
+                        ' their BUILD files and the failures are reported at the end.')
+    parser.add_argument('--file-time-budget', type=float, default=DEFAULT_FILE_TIME_BUDGET,
+                        help='With --keep-going, give up on a file after this many seconds.'
+                        ' 0 disables the budget. Defaults to %(default)s.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Update only the changed rules of existing BUILD files in place and'
+                        ' keep everything else in them, e.g. the order of the rules.')
+    parser.add_argument('--buildozer', type=str, default=None, metavar='COMMAND_FILE',
+                        help='Instead of writing BUILD files, write the buildozer commands that'
+                        ' update the existing rules to this file, or to stdout if it is "-".'
+                        ' Apply them with "buildozer -f COMMAND_FILE".')
+    parser.add_argument('--requirement-label', type=str, default=None,
+                        help='With --buildozer, label of a pip package with {name} for its name,'
+                        ' e.g. "@pip//{name}". buildozer cannot add requirement("...") calls.')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='Skip directories whose files and resolved imports have not changed'
+                        ' since the previous run. The state is kept in the cache directory.')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='Release memory after each directory to keep peak memory use flat in'
+                        ' large projects at the cost of some speed.')
+    parser.add_argument('--hook-stats', action='store_true',
+                        help='Print the number of calls and the time spent in each BazelRule and'
+                        ' ImportInferenceRule hook, including custom ones from .pazelrc.')
+    parser.add_argument('--import-scan-budget', type=int, default=DEFAULT_IMPORT_SCAN_BUDGET,
+                        help='With --fast-imports, parse a file fully if its import preamble is'
+                        ' longer than this many bytes. Defaults to %(default)s.')
 
     args = parser.parse_args()
 
-    # If the user specified custom .pazelrc file, then check that it exists.
-    custom_pazelrc_path = args.pazelrc != default_pazelrc_path
+    shard = None
 
-    if custom_pazelrc_path:
-        assert os.path.isfile(args.pazelrc), ".pazelrc file %s not found." % args.pazelrc
+    if args.shard is not None:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as error:
+            parser.error(str(error))
+
+    _check_pazelrc(args)
+
+    if args.verify_shards:
+        errors = verify_shard_manifests(args.input_path, args.project_root, args.verify_shards)
+
+        for error in errors:
+            print(error)
+
+        if errors:
+            sys.exit(1)
+
+        print('Shards cover all directories of %s.' % args.input_path)
+        return
+
+    import_scan_budget = args.import_scan_budget if args.fast_imports else None
+    buildozer_commands = None
+
+    if args.buildozer:
+        _, custom_bazel_rules, _, _, _, _ = parse_pazel_extensions(args.pazelrc)
+        buildozer_commands = BuildozerCommands(custom_bazel_rules, args.requirement_label)
+
+    errors = app(args.input_path, args.project_root, args.pre_installed_packages, args.pazelrc,
+                 shard=shard, shard_manifest_path=args.shard_manifest,
+                 import_scan_budget=import_scan_budget, test_timings_path=args.test_timings,
+                 testlogs_path=args.testlogs, all_or_nothing=args.all_or_nothing,
+                 infer_pip_names=args.infer_pip_names,
+                 requirements_lock_path=args.requirements_lock, python=args.python,
+                 cache_dir=None if args.no_cache else args.cache_dir, low_memory=args.low_memory,
+                 keep_going=args.keep_going, file_time_budget=args.file_time_budget,
+                 incremental=args.incremental, buildozer_commands=buildozer_commands,
+                 skip_unchanged=args.skip_unchanged)
+
+    if buildozer_commands is None:
+        print('Generated BUILD files for %s.' % args.input_path)
+    elif args.buildozer == '-':
+        sys.stdout.write(buildozer_commands.format())
+    else:
+        with open(args.buildozer, 'w') as command_file:
+            command_file.write(buildozer_commands.format())
+
+        print('Wrote buildozer commands for %s to %s.' % (args.input_path, args.buildozer))
+
+    if args.hook_stats:
+        print(HOOK_STATS.report())
 
-    app(args.input_path, args.project_root, args.pre_installed_packages, args.pazelrc)
-    print('Generated BUILD files for %s.' % args.input_path)
+    if errors:
+        print(format_errors(errors))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
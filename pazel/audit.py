@@ -0,0 +1,239 @@
+"""Compare the deps of existing BUILD rules with the deps pazel infers for their sources."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from pazel.distribution_index import normalize_distribution_name
+from pazel.generate_rule import get_dep_labels
+from pazel.generate_rule import parse_script
+from pazel.granularity import AggregatedModuleLabels
+from pazel.granularity import DIRECTORY_GRANULARITY
+from pazel.helpers import get_build_file_path
+from pazel.helpers import is_python_file
+from pazel.import_graph import get_module_name
+from pazel.label_index import LabelIndex
+from pazel.module_trie import refresh_module_tries
+from pazel.parse_build import get_rule_deps
+from pazel.parse_build import read_build_file
+from pazel.pazel_extensions import parse_granularity
+from pazel.pazel_extensions import parse_label_index
+from pazel.pazel_extensions import parse_pazel_extensions
+from pazel.pazel_extensions import parse_split_binaries
+from pazel.sharding import get_relative_directory
+from pazel.split_binaries import SplitBinaryLabels
+
+
+def normalize_label(label, package):
+    """Write a label in its canonical absolute form, e.g. ':bar' in package 'foo' as '//foo:bar'.
+
+    Args:
+        label (str): Label or a call such as 'requirement("x")' from the deps of a rule.
+        package (str): Package of the rule, e.g. 'foo/bar' or '' for the root package.
+
+    Returns:
+        label (str): Normalized label. Calls are returned as is.
+    """
+    if label.endswith(')'):
+        return label
+
+    if label.startswith(':'):
+        return '//%s%s' % (package, label)
+
+    if '//' not in label:
+        return '//%s:%s' % (package, label)
+
+    if ':' not in label.split('//', 1)[1]:
+        return '%s:%s' % (label, label.rstrip('/').split('/')[-1])
+
+    return label
+
+
+def _get_dependency_key(dep):
+    """Key under which differently written deps likely refer to the same thing."""
+    if dep.endswith(')'):
+        name = dep[dep.index('(') + 1:-1].strip('"\'')
+        return 'call', dep[:dep.index('(')], normalize_distribution_name(name)
+
+    return 'label', dep.split(':')[-1]
+
+
+def compare_deps(existing_deps, inferred_deps):
+    """Compare existing deps of a rule with inferred deps.
+
+    An existing dep that is not inferred but refers to the same target name (or the same pip
+    package) as a missing inferred dep is reported as mislabeled instead of unused and missing.
+
+    Args:
+        existing_deps (list of str): Normalized deps written in the BUILD file.
+        inferred_deps (list of str): Normalized deps inferred from the sources of the rule.
+
+    Returns:
+        unused (list of str): Existing deps that are not needed.
+        missing (list of str): Inferred deps that are not in the BUILD file.
+        mislabeled (list of tuple): (existing dep, expected dep) tuples.
+    """
+    unused = [dep for dep in existing_deps if dep not in inferred_deps]
+    missing = [dep for dep in inferred_deps if dep not in existing_deps]
+    mislabeled = []
+
+    for dep in list(unused):
+        key = _get_dependency_key(dep)
+        matches = [expected for expected in missing if _get_dependency_key(expected) == key]
+
+        if len(matches) == 1:
+            mislabeled.append((dep, matches[0]))
+            unused.remove(dep)
+            missing.remove(matches[0])
+
+    return sorted(set(unused)), sorted(set(missing)), mislabeled
+
+
+class BuildFileAuditor(object):
+    """Audit the deps of the rules in existing BUILD files. BUILD files are never modified."""
+
+    def __init__(self, project_root, contains_pre_installed_packages, pazelrc_path,
+                 import_scan_budget=None):
+        """Instantiate.
+
+        Args:
+            project_root (str): Imports in the Python files are relative to this path.
+            contains_pre_installed_packages (bool): Whether the environment is allowed to contain
+                pre-installed packages or whether only the Python standard library is available.
+            pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+            import_scan_budget (int): If given, imports are scanned from the import preamble of
+                each script. See get_imports.
+        """
+        _, self.custom_bazel_rules, self.custom_import_inference_rules, \
+            self.import_name_to_pip_name, self.local_import_name_to_dep, _ = \
+            parse_pazel_extensions(pazelrc_path)
+
+        granularity, directory_granularity = parse_granularity(pazelrc_path)
+        split_binaries = parse_split_binaries(pazelrc_path)
+        self.module_labels = None
+
+        if DIRECTORY_GRANULARITY in [granularity] + list(directory_granularity.values()):
+            self.module_labels = AggregatedModuleLabels(project_root, granularity,
+                                                        directory_granularity,
+                                                        self.custom_bazel_rules, split_binaries)
+
+        if split_binaries:
+            self.module_labels = SplitBinaryLabels(project_root, self.custom_bazel_rules,
+                                                   self.module_labels)
+
+        if parse_label_index(pazelrc_path):
+            self.module_labels = LabelIndex(project_root, fallback=self.module_labels)
+
+        self.project_root = project_root
+        self.contains_pre_installed_packages = contains_pre_installed_packages
+        self.import_scan_budget = import_scan_budget
+
+    def _infer_deps(self, script_paths, package, own_label):
+        """Infer the normalized deps of a rule from its source files."""
+        package_names, module_names = set(), set()
+
+        for script_path in script_paths:
+            parsed_script = parse_script(script_path, self.project_root,
+                                         self.contains_pre_installed_packages,
+                                         self.custom_bazel_rules,
+                                         self.custom_import_inference_rules,
+                                         self.import_scan_budget)
+            package_names.update(parsed_script.package_names)
+            module_names.update(parsed_script.module_names)
+
+        # Imports between the sources of the same rule need no deps.
+        module_names -= set(get_module_name(path, self.project_root) for path in script_paths)
+
+        deps = get_dep_labels(package_names, module_names, self.import_name_to_pip_name,
+                              self.local_import_name_to_dep, self.module_labels, own_label)
+
+        return [normalize_label(dep.strip('"'), package) for dep in deps]
+
+    def audit_directory(self, directory):
+        """Audit the rules of the BUILD file in a directory.
+
+        The BUILD file is parsed once for all of its rules.
+
+        Args:
+            directory (str): Path to a directory.
+
+        Returns:
+            findings (list of dict): One entry per rule with Python sources, with the keys
+                'build_file', 'rule', 'kind', 'unused', 'missing', and 'mislabeled', or 'skipped'
+                with the reason if the deps of the rule cannot be audited.
+        """
+        build_file_path = get_build_file_path(directory)
+        build_file = read_build_file(build_file_path)
+
+        if build_file is None:
+            return []
+
+        relative_directory = get_relative_directory(directory, self.project_root)
+        package = '' if relative_directory == '.' else relative_directory
+        findings = []
+
+        for rule in build_file.rules:
+            srcs = rule.get_srcs()
+            script_paths = [os.path.join(directory, src) for src in srcs]
+
+            if not srcs or not all(is_python_file(path) for path in script_paths):
+                continue
+
+            name_argument = rule.kwargs.get('name')
+            name = name_argument.value if name_argument is not None else None
+            finding = {'build_file': os.path.relpath(build_file_path, self.project_root),
+                       'rule': name, 'kind': rule.kind}
+            findings.append(finding)
+
+            existing_deps = get_rule_deps(rule)
+
+            if existing_deps is None:
+                finding['skipped'] = 'deps is not a list of labels'
+                continue
+
+            own_label = '//%s:%s' % (package, name)
+            inferred_deps = self._infer_deps(script_paths, package, own_label)
+            existing_deps = [normalize_label(dep, package) for dep in existing_deps]
+
+            unused, missing, mislabeled = compare_deps(existing_deps, inferred_deps)
+            finding['unused'] = unused
+            finding['missing'] = missing
+            finding['mislabeled'] = [{'existing': existing, 'expected': expected}
+                                     for existing, expected in mislabeled]
+
+        return findings
+
+
+def audit_build_files(input_path, project_root, contains_pre_installed_packages, pazelrc_path,
+                      import_scan_budget=None):
+    """Audit the deps of the existing BUILD files under input_path.
+
+    Args:
+        input_path (str): Path to a directory containing BUILD files.
+        project_root (str): Imports in the Python files are relative to this path.
+        contains_pre_installed_packages (bool): Whether the environment is allowed to contain
+            pre-installed packages or whether only the Python standard library is available.
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+        import_scan_budget (int): If given, imports are scanned from the import preamble of each
+            script. See get_imports.
+
+    Returns:
+        findings (list of dict): Findings of all rules. See BuildFileAuditor.audit_directory.
+    """
+    auditor = BuildFileAuditor(project_root, contains_pre_installed_packages, pazelrc_path,
+                               import_scan_budget)
+    findings = []
+    refresh_module_tries()
+
+    for dirpath, dirnames, _ in os.walk(input_path):
+        dirnames.sort()
+        findings.extend(auditor.audit_directory(dirpath))
+
+    return findings
+
+
+def has_problems(finding):
+    """Check whether an audited rule has unused, missing, or mislabeled deps."""
+    return bool(finding.get('unused') or finding.get('missing') or finding.get('mislabeled'))
@@ -4,11 +4,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import ast
+import fnmatch
 import os
 import re
 
+from pazel.hook_stats import HOOK_STATS
+
 # These templates will be filled and used to generate BUILD files.
-# Note that both 'data' and 'deps' can be empty in which case they are left out from the rules.
+# Note that 'data', 'deps', 'timeout', and 'shard_count' can be empty in which case they are left
+# out from the rules.
 PY_BINARY_TEMPLATE = """py_binary(
     name = "{name}",
     srcs = ["{name}.py"],
@@ -23,10 +28,23 @@ PY_LIBRARY_TEMPLATE = """py_library(
     {deps}
 )"""
 
+# Bazel does not allow more than 50 shards per test.
+MAX_SHARD_COUNT = 50
+
+# Template for a py_library that contains all libraries in a directory.
+PY_LIBRARY_AGGREGATE_TEMPLATE = """py_library(
+    name = "{name}",
+    {srcs}
+    {data}
+    {deps}
+)"""
+
 PY_TEST_TEMPLATE = """py_test(
     name = "{name}",
     srcs = ["{name}.py"],
     size = "{size}",
+    {timeout}
+    {shard_count}
     {data}
     {deps}
 )"""
@@ -43,6 +61,12 @@ class BazelRule(object):
     template = None
     rule_identifier = None
 
+    # Optional prefilters that pazel checks before calling applies_to. If a prefilter is not None,
+    # then applies_to is called only for scripts that match at least one of its entries.
+    filename_patterns = None    # Globs for the script file name, e.g. ['test_*.py'].
+    import_prefixes = None      # Imported modules or their prefixes, e.g. ['doctest'].
+    source_substrings = None    # Substrings of the script source, e.g. ['import doctest'].
+
     @staticmethod
     def applies_to(script_name, script_source):
         """Check whether this rule applies to a given script.
@@ -145,6 +169,10 @@ class PyTestRule(BazelRule):
     template = PY_TEST_TEMPLATE     # Filled version of this will be written to the BUILD file.
     rule_identifier = 'py_test'     # The name of the rule.
 
+    # Prefilters that hold for every script to which this rule applies.
+    filename_patterns = ['test_*.py', '*_test.py']
+    source_substrings = ['TestCase']
+
     @staticmethod
     def applies_to(script_name, script_source):
         """Check whether this rule applies to a given script.
@@ -167,18 +195,137 @@ class PyTestRule(BazelRule):
         return applies
 
 
+def count_test_cases(script_source):
+    """Count test classes and test methods in a Python test statically.
+
+    Test classes are top-level classes that derive from a class whose name ends with 'TestCase' or
+    from another test class in the same script. Test methods are methods of test classes whose name
+    starts with 'test', including the methods inherited from other test classes in the script.
+
+    Args:
+        script_source (str): Source code of a Python test.
+
+    Returns:
+        num_test_classes (int): Number of test classes.
+        num_test_methods (int): Number of test methods in all test classes.
+    """
+    try:
+        top_node = ast.parse(script_source)
+    except SyntaxError:
+        return 0, 0
+
+    methods_per_class = dict()
+
+    for node in top_node.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        base_names = []
+
+        for base in node.bases:
+            if isinstance(base, ast.Name):
+                base_names.append(base.id)
+            elif isinstance(base, ast.Attribute):
+                base_names.append(base.attr)
+
+        is_test_class = any(name.endswith('TestCase') or name in methods_per_class
+                            for name in base_names)
+
+        if not is_test_class:
+            continue
+
+        num_methods = sum(isinstance(child, ast.FunctionDef) and child.name.startswith('test')
+                          for child in node.body)
+        num_inherited = sum(methods_per_class.get(name, 0) for name in base_names)
+
+        methods_per_class[node.name] = num_methods + num_inherited
+
+    return len(methods_per_class), sum(methods_per_class.values())
+
+
+def get_shard_count(num_test_methods, tests_per_shard):
+    """Get the number of shards for a test.
+
+    Args:
+        num_test_methods (int): Number of test methods in the test.
+        tests_per_shard (int): Maximum number of test methods per shard. None disables sharding.
+
+    Returns:
+        shard_count (int): Number of shards or None if the test does not need to be sharded.
+    """
+    if not tests_per_shard or not num_test_methods or num_test_methods <= tests_per_shard:
+        return None
+
+    shard_count = (num_test_methods + tests_per_shard - 1) // tests_per_shard
+
+    return min(shard_count, MAX_SHARD_COUNT)
+
+
 def get_native_bazel_rules():
     """Return a copy of the pazel-native classes implementing BazelRule."""
     return [PyBinaryRule, PyLibraryRule, PyTestRule]    # No custom classes here.
 
 
-def infer_bazel_rule_type(script_path, script_source, custom_rules):
+def _imports_prefix(imported_names, import_prefixes):
+    """Check if any of the imported names equals one of the prefixes or is in a prefix package."""
+    for imported_name in imported_names:
+        for prefix in import_prefixes:
+            if imported_name == prefix or imported_name.startswith(prefix + '.'):
+                return True
+
+    return False
+
+
+def passes_prefilters(bazel_rule, script_filename, script_source, imported_names,
+                      found_substrings):
+    """Check the cheap prefilters of a rule before calling its applies_to.
+
+    Args:
+        bazel_rule (BazelRule class): A registered rule.
+        script_filename (str): File name of a Python script.
+        script_source (str): Source code of the script.
+        imported_names (set of str): Names of the modules imported by the script, or None if they
+            are not known. In that case, import prefixes are not checked.
+        found_substrings (dict): Cache from substring to whether it is in the script source. Shared
+            by all rules so that each substring is searched only once per script.
+
+    Returns:
+        passes (bool): False if the rule certainly does not apply to the script.
+    """
+    filename_patterns = getattr(bazel_rule, 'filename_patterns', None)
+
+    if filename_patterns is not None and \
+            not any(fnmatch.fnmatchcase(script_filename, pattern) for pattern in filename_patterns):
+        return False
+
+    import_prefixes = getattr(bazel_rule, 'import_prefixes', None)
+
+    if import_prefixes is not None and imported_names is not None and \
+            not _imports_prefix(imported_names, import_prefixes):
+        return False
+
+    source_substrings = getattr(bazel_rule, 'source_substrings', None)
+
+    if source_substrings is not None:
+        for substring in source_substrings:
+            if substring not in found_substrings:
+                found_substrings[substring] = substring in script_source
+
+        if not any(found_substrings[substring] for substring in source_substrings):
+            return False
+
+    return True
+
+
+def infer_bazel_rule_type(script_path, script_source, custom_rules, imported_names=None):
     """Infer the Bazel rule type given the path to the script and its source code.
 
     Args:
         script_path (str): Path to a Python script.
         script_source (str): Source code of the Python script.
         custom_rules (list of BazelRule classes): User-defined classes implementing BazelRule.
+        imported_names (set of str): Names of the modules imported by the script for checking the
+            import prefilters of the rules. If None, the import prefilters are not checked.
 
     Returns:
         bazel_rule_type (BazelRule): Rule object representing the type of the Python script.
@@ -186,15 +333,24 @@ def infer_bazel_rule_type(script_path, script_source, custom_rules):
     Raises:
         RuntimeError: If zero or more than one Bazel rule is found for the current script.
     """
-    script_name = os.path.basename(script_path).replace('.py', '')
+    script_filename = os.path.basename(script_path)
+    script_name = script_filename.replace('.py', '')
 
     bazel_rule_types = []
+    found_substrings = dict()
 
     native_rules = get_native_bazel_rules()
     registered_rules = native_rules + custom_rules
 
     for bazel_rule in registered_rules:
-        if bazel_rule.applies_to(script_name, script_source):
+        hook_name = bazel_rule.__name__ + '.applies_to'
+
+        if not passes_prefilters(bazel_rule, script_filename, script_source, imported_names,
+                                 found_substrings):
+            HOOK_STATS.skip(hook_name)
+            continue
+
+        if HOOK_STATS.call(hook_name, bazel_rule.applies_to, script_name, script_source):
             bazel_rule_types.append(bazel_rule)
 
     if not bazel_rule_types:
@@ -0,0 +1,201 @@
+"""Express the changes to BUILD files as buildozer commands instead of writing the files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from pazel.audit import normalize_label
+from pazel.output_build import get_generated_rules
+from pazel.output_build import get_named_rules
+from pazel.parse_build import get_rule_deps
+from pazel.parse_build import read_build_file
+from pazel.starlark import parse_rules
+
+# Attributes that pazel generates. Other attributes of existing rules, e.g. visibility, are kept.
+GENERATED_ATTRIBUTES = ['srcs', 'data', 'deps', 'size', 'timeout', 'shard_count']
+
+# Attributes whose values are lists of labels or file names.
+_LIST_ATTRIBUTES = ['srcs', 'data', 'deps']
+
+
+def _get_call_name(dep):
+    """Get the argument of a call such as 'requirement("pyyaml")', i.e., 'pyyaml'."""
+    return dep[dep.index('(') + 1:-1].strip('"\'')
+
+
+def _normalize(attribute, value, package):
+    """Normalize an entry of a list attribute for comparison, e.g. a dep ':bar' to '//foo:bar'."""
+    return normalize_label(value, package) if attribute == 'deps' else value
+
+
+class BuildozerCommands(object):
+    """Collect the buildozer commands that turn the existing rules into the generated ones.
+
+    The commands of all directories are collected into a single command file that buildozer
+    applies in one invocation, e.g. 'buildozer -f commands.txt'. Changes that buildozer cannot
+    express are written as comments so that they are not lost silently.
+    """
+
+    def __init__(self, custom_bazel_rules, requirement_label=None):
+        """Instantiate.
+
+        Args:
+            custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+            requirement_label (str): Template of the label of a pip package such as
+                '@pip//{name}'. buildozer adds only labels to deps, so without a template,
+                requirement("...") deps are left as comments.
+        """
+        self.custom_bazel_rules = custom_bazel_rules
+        self.requirement_label = requirement_label
+        self.lines = []
+
+    def _emit(self, command, label):
+        """Add a command for a target."""
+        self.lines.append('%s|%s' % (command, label))
+
+    def _unsupported(self, message, label):
+        """Add a comment about a change that buildozer cannot make."""
+        self.lines.append('# %s: %s' % (label, message))
+
+    def _resolve_dep(self, dep):
+        """Write a requirement("...") dep as a label if a template is given."""
+        if self.requirement_label is not None and dep.startswith('requirement('):
+            return self.requirement_label.format(name=_get_call_name(dep))
+
+        return dep
+
+    def _format_deps(self, deps, label):
+        """Format deps as buildozer values, leaving out calls that cannot be expressed as labels."""
+        values = []
+
+        for dep in deps:
+            if dep.endswith(')'):
+                self._unsupported('cannot add or remove %s' % dep, label)
+            else:
+                values.append(dep)
+
+        return values
+
+    def _diff_list(self, attribute, old_rule, new_rule, label, package):
+        """Add the commands for adding and removing entries of a list attribute."""
+        if attribute == 'deps':
+            old_values = get_rule_deps(old_rule) if old_rule is not None else []
+            new_values = get_rule_deps(new_rule)
+        else:
+            old_argument = old_rule.kwargs.get(attribute) if old_rule is not None else None
+            new_argument = new_rule.kwargs.get(attribute)
+            old_values = old_argument.value if old_argument is not None else []
+            new_values = new_argument.value if new_argument is not None else []
+
+        if attribute == 'deps' and old_values is not None and new_values is not None:
+            old_values = [self._resolve_dep(dep) for dep in old_values]
+            new_values = [self._resolve_dep(dep) for dep in new_values]
+
+        if old_values is None or new_values is None or \
+                not isinstance(old_values, list) or not isinstance(new_values, list):
+            if old_rule is None or \
+                    old_rule.get_value_text(attribute) != new_rule.get_value_text(attribute):
+                self._unsupported('cannot update %s, which is not a plain list' % attribute,
+                                  label)
+            return
+
+        old_keys = set(_normalize(attribute, value, package) for value in old_values)
+        new_keys = set(_normalize(attribute, value, package) for value in new_values)
+
+        removed = [value for value in old_values
+                   if _normalize(attribute, value, package) not in new_keys]
+        added = [value for value in new_values
+                 if _normalize(attribute, value, package) not in old_keys]
+
+        if attribute == 'deps':
+            removed = self._format_deps(removed, label)
+            added = self._format_deps(added, label)
+
+        if removed:
+            self._emit('remove %s %s' % (attribute, ' '.join(removed)), label)
+
+        if added:
+            self._emit('add %s %s' % (attribute, ' '.join(added)), label)
+
+    def _diff_rule(self, old_rule, new_rule, label, package):
+        """Add the commands for updating the generated attributes of a rule."""
+        if old_rule is not None and old_rule.kind != new_rule.kind:
+            self._emit('set kind %s' % new_rule.kind, label)
+
+        # Custom rules may take their sources as positional arguments, which buildozer cannot set.
+        if len(new_rule.args) > 1 and (old_rule is None or [arg.value for arg in old_rule.args] !=
+                                       [arg.value for arg in new_rule.args]):
+            self._unsupported('cannot set positional arguments of %s' % new_rule.kind, label)
+
+        for attribute in GENERATED_ATTRIBUTES:
+            if attribute in _LIST_ATTRIBUTES:
+                self._diff_list(attribute, old_rule, new_rule, label, package)
+                continue
+
+            old_value = old_rule.get_value_text(attribute) if old_rule is not None else None
+            new_value = new_rule.get_value_text(attribute)
+
+            if new_value is None and old_value is not None:
+                self._emit('remove %s' % attribute, label)
+            elif new_value is not None and new_value != old_value:
+                self._emit('set %s %s' % (attribute, new_value), label)
+
+    def _get_load_commands(self, existing_rules, new_rules):
+        """Get the new_load commands for custom rules whose load statements are missing."""
+        loads = [rule.text for rule in existing_rules if rule.kind == 'load']
+        commands = []
+
+        for custom_rule in self.custom_bazel_rules:
+            load_statement = custom_rule.get_load_statement()
+
+            if load_statement is None or \
+                    custom_rule.rule_identifier not in [rule.kind for rule in new_rules] or \
+                    any(custom_rule.rule_identifier in load for load in loads):
+                continue
+
+            load = parse_rules(load_statement)[0]
+            commands.append('new_load %s' % ' '.join(arg.value for arg in load.args))
+
+        return commands
+
+    def add_directory(self, build_file_path, build_source, package):
+        """Add the commands for updating the BUILD file of a directory.
+
+        Args:
+            build_file_path (str): Path to the existing BUILD file, which need not exist.
+            build_source (str): The generated rules of the BUILD file.
+            package (str): Package of the BUILD file relative to the workspace root, e.g.
+                'foo/bar' or '' for the root package.
+        """
+        build_file = read_build_file(build_file_path)
+        existing_rules = build_file.rules if build_file is not None else []
+        package_label = '//%s:__pkg__' % package
+
+        # Like the BUILD files written by pazel, a directory without Python files or ignored rules,
+        # e.g. of data files only, keeps its BUILD file as it is.
+        if not build_source.strip() and not any(rule.ignored for rule in existing_rules):
+            return
+
+        old_rules = get_generated_rules(existing_rules, self.custom_bazel_rules)
+        new_rules = get_named_rules(parse_rules(build_source))
+
+        if old_rules is None or new_rules is None:
+            self._unsupported('cannot match rules with missing or repeated names', package_label)
+            return
+
+        for command in self._get_load_commands(existing_rules, list(new_rules.values())):
+            self._emit(command, package_label)
+
+        for name in old_rules:
+            if name not in new_rules:
+                self._emit('delete', '//%s:%s' % (package, name))
+
+        for name, new_rule in new_rules.items():
+            if name not in old_rules:
+                self._emit('new %s %s' % (new_rule.kind, name), package_label)
+
+            self._diff_rule(old_rules.get(name), new_rule, '//%s:%s' % (package, name), package)
+
+    def format(self):
+        """Format the command file, one command per line."""
+        return ''.join(line + '\n' for line in self.lines)
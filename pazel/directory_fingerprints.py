@@ -0,0 +1,306 @@
+"""Skip directories whose files and resolved imports have not changed since the previous run."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+DIRECTORY_FINGERPRINTS_VERSION = 1
+
+# Dependency of directories whose rules may depend on any file of the project, e.g. with
+# REDUCE_DEPS. It stands for the fingerprint of the whole project tree.
+ALL_DIRECTORIES = '*'
+
+
+def get_import_directories(base, unknown=None):
+    """Get the directories in which an import is resolved against the project tree.
+
+    Resolving an import checks for modules and packages along its dotted path, starting from the
+    project root. For example, a new module 'a.py' at the project root changes how 'import a.b' is
+    resolved.
+
+    Args:
+        base (str): Imported package or module, e.g. 'a.b'.
+        unknown (str): Object imported from it, e.g. 'c' in 'from a.b import c', or None.
+
+    Returns:
+        directories (list of str): Directories relative to the project root, e.g. ['.', 'a', 'a/b',
+            'a/b/c'] for ('a.b', 'c').
+    """
+    parts = base.split('.') if base else []
+
+    if unknown is not None and unknown != '*':
+        parts.append(unknown)
+
+    return ['.'] + ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+class ImportDirectoryRecorder(object):
+    """Record the directories in which imports are resolved, e.g. for the rules of a directory."""
+
+    def __init__(self):
+        """Instantiate without recording."""
+        self._directories = None
+
+    def start(self):
+        """Start recording."""
+        self._directories = set()
+
+    def stop(self):
+        """Stop recording and return the set of recorded directories."""
+        directories, self._directories = self._directories, None
+
+        return directories
+
+    def record(self, base, unknown=None):
+        """Record the directories of an import, if recording. See get_import_directories."""
+        if self._directories is not None:
+            self._directories.update(get_import_directories(base, unknown))
+
+
+IMPORT_DIRECTORIES = ImportDirectoryRecorder()
+
+
+def fingerprint_directory(directory):
+    """Fingerprint the entries of a directory by their names, types, sizes, and modification times.
+
+    Subdirectories contribute only their names. Their contents are covered by their own
+    fingerprints.
+
+    Args:
+        directory (str): Path to a directory.
+
+    Returns:
+        fingerprint (str): Fingerprint of the entries, or None if the directory cannot be listed.
+        subdirectories (list of str): Names of the subdirectories that os.walk descends into.
+    """
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return None, []
+
+    fingerprint = hashlib.md5()
+    subdirectories = []
+
+    for name in names:
+        path = os.path.join(directory, name)
+
+        try:
+            link_stat = os.lstat(path)
+            entry_stat = os.stat(path) if stat.S_ISLNK(link_stat.st_mode) else link_stat
+        except OSError:
+            entry = '%s:missing' % name  # Broken symbolic links.
+        else:
+            if stat.S_ISDIR(entry_stat.st_mode):
+                entry = '%s:dir' % name
+
+                # Like os.walk, do not follow symbolic links to directories.
+                if not stat.S_ISLNK(link_stat.st_mode):
+                    subdirectories.append(name)
+            else:
+                entry = '%s:%d:%r' % (name, entry_stat.st_size, entry_stat.st_mtime)
+
+        fingerprint.update((entry + '\n').encode('utf-8'))
+
+    return fingerprint.hexdigest(), subdirectories
+
+
+class DirectoryFingerprints(object):
+    """A persisted tree of directory fingerprints for skipping unchanged directories.
+
+    The fingerprint of a directory covers its entries and, like a Merkle tree, the fingerprints of
+    its subdirectories. For each directory whose rules were generated, the tree also stores the
+    fingerprints of the directories its imports were resolved in. A directory is unchanged if
+    neither its own entries nor those of the directories it resolves imports in have changed, and a
+    whole subtree is unchanged if its fingerprint matches and all of its directories are unchanged.
+
+    Fingerprints are taken after the BUILD files have been written so that the BUILD files written
+    by pazel do not invalidate the next run.
+    """
+
+    def __init__(self, project_root, cache_dir, configuration, shard=None):
+        """Instantiate.
+
+        Args:
+            project_root (str): Path to the root of the project.
+            cache_dir (str): Directory in which the tree is stored across runs.
+            configuration (list): Everything else that affects the generated rules, e.g. options,
+                the modification time of .pazelrc, and the installed packages. The stored tree
+                is discarded if it changes.
+            shard (tuple of int): Shard handled by this run, if any. Each shard has its own tree so
+                that shards can run concurrently.
+        """
+        self.project_root = project_root
+        self.cache_dir = cache_dir
+        self._configuration = hashlib.md5(json.dumps(configuration, sort_keys=True)
+                                          .encode('utf-8')).hexdigest()
+        key = json.dumps([os.path.abspath(project_root), list(shard) if shard else None])
+        self._cache_path = os.path.join(cache_dir, 'directories-%s.json' %
+                                        hashlib.md5(key.encode('utf-8')).hexdigest())
+        self._stored = self._load()
+        self._handled = dict()
+        self._reset()
+
+    def _reset(self):
+        """Forget the fingerprints taken so far, e.g. after writing BUILD files."""
+        self._local = dict()
+        self._subdirectories = dict()
+        self._tree = dict()
+        self._unchanged = dict()
+
+    def _load(self):
+        """Load the tree of the previous run, or an empty dict."""
+        try:
+            with open(self._cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return dict()
+
+        if cached.get('version') != DIRECTORY_FINGERPRINTS_VERSION or \
+                cached.get('configuration') != self._configuration:
+            return dict()
+
+        return cached['directories']
+
+    def _get_local(self, relative_directory):
+        """Get the fingerprint of the entries of a directory, memoized until _reset()."""
+        if relative_directory not in self._local:
+            local, subdirectories = fingerprint_directory(os.path.join(self.project_root,
+                                                                       relative_directory))
+            self._local[relative_directory] = local
+            self._subdirectories[relative_directory] = subdirectories
+
+        return self._local[relative_directory]
+
+    def _get_child(self, relative_directory, name):
+        """Get the relative path of a subdirectory."""
+        return name if relative_directory == '.' else relative_directory + '/' + name
+
+    def get_fingerprint(self, relative_directory):
+        """Get the fingerprint of a directory and everything under it.
+
+        Args:
+            relative_directory (str): Directory relative to the project root, '.' for the root.
+
+        Returns:
+            fingerprint (str): Fingerprint of the subtree.
+        """
+        if relative_directory not in self._tree:
+            fingerprint = hashlib.md5(str(self._get_local(relative_directory)).encode('utf-8'))
+
+            for name in self._subdirectories[relative_directory]:
+                child = self.get_fingerprint(self._get_child(relative_directory, name))
+                fingerprint.update(('%s:%s\n' % (name, child)).encode('utf-8'))
+
+            self._tree[relative_directory] = fingerprint.hexdigest()
+
+        return self._tree[relative_directory]
+
+    def _get_dependency(self, relative_directory):
+        """Get the fingerprint that a directory depends on: its entries, or the whole tree."""
+        if relative_directory == ALL_DIRECTORIES:
+            return self.get_fingerprint('.')
+
+        return self._get_local(relative_directory)
+
+    def is_unchanged(self, relative_directory):
+        """Check whether the rules of a directory would be generated as in the previous run.
+
+        Args:
+            relative_directory (str): Directory relative to the project root, '.' for the root.
+
+        Returns:
+            unchanged (bool): Whether the directory was handled in the previous run and neither it
+                nor the directories its imports were resolved in have changed since.
+        """
+        if relative_directory not in self._unchanged:
+            entry = self._stored.get(relative_directory)
+            self._unchanged[relative_directory] = entry is not None and \
+                entry[0] == self._get_local(relative_directory) and \
+                all(self._get_dependency(dependency) == fingerprint
+                    for dependency, fingerprint in entry[2].items())
+
+        return self._unchanged[relative_directory]
+
+    def is_subtree_unchanged(self, relative_directory):
+        """Check whether no directory under a directory, including itself, needs to be handled.
+
+        Comparing the fingerprint of the subtree first rejects changed subtrees without checking
+        the dependencies of their directories one by one.
+
+        Args:
+            relative_directory (str): Directory relative to the project root, '.' for the root.
+
+        Returns:
+            unchanged (bool): Whether the whole subtree is unchanged.
+        """
+        entry = self._stored.get(relative_directory)
+
+        if entry is None or entry[1] != self.get_fingerprint(relative_directory):
+            return False
+
+        pending = [relative_directory]
+
+        while pending:
+            directory = pending.pop()
+
+            if not self.is_unchanged(directory):
+                return False
+
+            pending.extend(self._get_child(directory, name)
+                           for name in self._subdirectories[directory])
+
+        return True
+
+    def record(self, relative_directory, dependencies):
+        """Record that the rules of a directory were generated.
+
+        Args:
+            relative_directory (str): Directory relative to the project root, '.' for the root.
+            dependencies (set of str): Directories relative to the project root in which the
+                imports of the directory were resolved, or set([ALL_DIRECTORIES]).
+        """
+        self._handled[relative_directory] = dependencies
+
+    def save(self):
+        """Fingerprint the recorded directories and save the tree atomically.
+
+        Call this after the BUILD files have been written. Directories that were not handled in
+        this run keep their entries.
+        """
+        self._reset()
+        directories = dict(self._stored)
+
+        for relative_directory, dependencies in self._handled.items():
+            directories[relative_directory] = [
+                self._get_local(relative_directory), None,
+                dict((dependency, self._get_dependency(dependency))
+                     for dependency in sorted(dependencies))]
+
+        # Directories that no longer exist are dropped.
+        directories = dict((relative_directory, entry)
+                           for relative_directory, entry in directories.items()
+                           if os.path.isdir(os.path.join(self.project_root, relative_directory)))
+
+        for relative_directory, entry in directories.items():
+            entry[1] = self.get_fingerprint(relative_directory)
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+
+            with os.fdopen(file_descriptor, 'w') as cache_file:
+                json.dump({'version': DIRECTORY_FINGERPRINTS_VERSION,
+                           'configuration': self._configuration, 'directories': directories},
+                          cache_file, separators=(',', ':'), sort_keys=True)
+
+            getattr(os, 'replace', os.rename)(temporary_path, self._cache_path)
+        except (IOError, OSError):
+            pass    # The fingerprints are only an optimization.
@@ -0,0 +1,333 @@
+"""Map import names of Python packages to the names of the distributions that provide them."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+DISTRIBUTION_INDEX_VERSION = 1
+
+# Distribution index files are cached here, one file per Python environment.
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                                 os.path.join(os.path.expanduser('~'), '.cache'), 'pazel')
+
+_METADATA_DIRECTORY_SUFFIXES = ('.dist-info', '.egg-info')
+_IDENTIFIER_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+# Name of a requirement in a lock file, e.g. "PyYAML==5.1 --hash=..." or "foo[bar]==1.0".
+_REQUIREMENT_REGEX = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)')
+
+
+def normalize_distribution_name(name):
+    """Normalize a distribution name as pip does, e.g. 'Foo_Bar' to 'foo-bar'."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _read_lines(path):
+    """Return the lines of a file, or None if the file cannot be read."""
+    try:
+        with open(path, 'r') as metadata_file:
+            return metadata_file.read().splitlines()
+    except (IOError, OSError):
+        return None
+
+
+def _read_distribution_name(metadata_dir):
+    """Read the name of a distribution from its metadata directory."""
+    for metadata_filename in ('METADATA', 'PKG-INFO'):
+        lines = _read_lines(os.path.join(metadata_dir, metadata_filename)) or []
+
+        for line in lines:
+            if not line.strip():  # The headers end at the first empty line.
+                break
+
+            if line.startswith('Name:'):
+                return line[len('Name:'):].strip()
+
+    # Fall back to the directory name, e.g. 'PyYAML-5.1.dist-info'.
+    return os.path.basename(metadata_dir).split('-')[0]
+
+
+def _get_top_level_names(metadata_dir):
+    """Get the import names a distribution installs from its top_level.txt or RECORD file.
+
+    Args:
+        metadata_dir (str): Path to a .dist-info or .egg-info directory.
+
+    Returns:
+        top_level_names (set of str): Importable top-level package and module names.
+    """
+    lines = _read_lines(os.path.join(metadata_dir, 'top_level.txt'))
+
+    if lines is not None:
+        return set(line.strip().split('/')[0] for line in lines if line.strip())
+
+    lines = _read_lines(os.path.join(metadata_dir, 'RECORD'))
+    top_level_names = set()
+
+    for row in csv.reader(lines or []):
+        if not row:
+            continue
+
+        parts = row[0].split('/')
+
+        if len(parts) > 1:
+            name = parts[0]
+        elif parts[0].endswith('.py'):
+            name = parts[0][:-len('.py')]
+        else:   # Compiled extension modules, e.g. foo.cpython-36m-x86_64-linux-gnu.so.
+            name = parts[0].split('.')[0]
+
+        if not name.endswith(_METADATA_DIRECTORY_SUFFIXES + ('.data',)) and \
+                _IDENTIFIER_REGEX.match(name):
+            top_level_names.add(name)
+
+    return top_level_names
+
+
+def get_search_paths():
+    """Get the directories of the current interpreter in which distributions are installed."""
+    return [path for path in sys.path if path and os.path.isdir(path)]
+
+
+def build_distribution_index(search_paths, allowed_names=None):
+    """Build a mapping from import names to the distributions that provide them.
+
+    Import names provided by more than one distribution (e.g. namespace packages) are left out
+    because they cannot be resolved from the metadata alone. Allowed distributions that are not
+    installed are assumed to be imported by their name with dashes replaced by underscores, e.g.
+    'typing-extensions' by 'typing_extensions'.
+
+    Args:
+        search_paths (list of str): Directories that contain installed distributions.
+        allowed_names (dict): Optional mapping from normalized distribution names to the names used
+            in the generated rules, e.g. from a lock file. Other distributions are left out.
+
+    Returns:
+        import_name_to_pip_name (dict): Mapping from import names to distribution names.
+    """
+    import_name_to_pip_name = {}
+    ambiguous = set()
+    installed = set()
+
+    for search_path in search_paths:
+        try:
+            filenames = sorted(os.listdir(search_path))
+        except OSError:
+            continue
+
+        for filename in filenames:
+            if not filename.endswith(_METADATA_DIRECTORY_SUFFIXES):
+                continue
+
+            metadata_dir = os.path.join(search_path, filename)
+            pip_name = _read_distribution_name(metadata_dir)
+
+            if allowed_names is not None:
+                pip_name = allowed_names.get(normalize_distribution_name(pip_name))
+
+                if pip_name is None:
+                    continue
+
+                installed.add(normalize_distribution_name(pip_name))
+
+            for import_name in _get_top_level_names(metadata_dir):
+                existing = import_name_to_pip_name.get(import_name)
+
+                if existing is not None and normalize_distribution_name(existing) != \
+                        normalize_distribution_name(pip_name):
+                    ambiguous.add(import_name)
+
+                import_name_to_pip_name.setdefault(import_name, pip_name)
+
+    for import_name in ambiguous:
+        del import_name_to_pip_name[import_name]
+
+    for normalized_name, pip_name in sorted((allowed_names or {}).items()):
+        import_name = normalized_name.replace('-', '_')
+
+        if normalized_name not in installed and _IDENTIFIER_REGEX.match(import_name):
+            import_name_to_pip_name.setdefault(import_name, pip_name)
+
+    return import_name_to_pip_name
+
+
+def read_lock_file(lock_path):
+    """Read the distributions pinned in a requirements lock file.
+
+    Args:
+        lock_path (str): Path to a requirements file, e.g. one generated by pip-compile.
+
+    Returns:
+        names (dict): Mapping from normalized distribution names to the names in the lock file.
+    """
+    names = {}
+
+    for line in _read_lines(lock_path) or []:
+        line = line.split('#')[0].strip()
+
+        # Skip options such as -r other.txt and continuation lines such as --hash=...
+        if not line or line.startswith('-'):
+            continue
+
+        match = _REQUIREMENT_REGEX.match(line)
+
+        if match:
+            names[normalize_distribution_name(match.group(1))] = match.group(1)
+
+    return names
+
+
+def _add_dependent(dependents, name, comment):
+    """Record the distribution named in a '# via' comment of a lock file as a dependent of name."""
+    match = _REQUIREMENT_REGEX.match(comment)
+
+    # Requirement files such as '-r requirements.in' are not distributions.
+    if match and not comment.startswith('-'):
+        dependents.setdefault(name, set()).add(normalize_distribution_name(match.group(1)))
+
+
+def _split_requirement(code):
+    """Split a line of a lock file into the specifier, if any, and options such as --hash."""
+    tokens = code.rstrip('\\').split()
+    first_option = next((i for i, token in enumerate(tokens) if token.startswith('--')),
+                        len(tokens))
+    specifier = ' '.join(tokens[:first_option])
+
+    return ([specifier] if specifier else []) + tokens[first_option:]
+
+
+def read_pinned_requirements(lock_path):
+    """Read the pinned requirements of a lock file and the dependencies between them.
+
+    Dependencies are read from the '# via' comments written by pip-compile, in both the single-line
+    form ('# via foo') and the multi-line form ('# via' followed by one '#   foo' line per name).
+
+    Args:
+        lock_path (str): Path to a requirements file, e.g. one generated by pip-compile.
+
+    Returns:
+        pins (dict): Mapping from normalized distribution names to the requirement split into the
+            specifier and its options, e.g. ['numpy==1.16.0', '--hash=sha256:...'].
+        dependents (dict): Mapping from normalized distribution names to the set of normalized
+            names of the pinned distributions that require them.
+    """
+    pins, dependents = {}, {}
+    current, in_via, continued = None, False, False
+
+    for line in _read_lines(lock_path) or []:
+        code, _, comment = line.partition('#')
+        code, comment = code.strip(), comment.strip()
+
+        if code and continued and current:
+            pins[current] += _split_requirement(code)
+        elif code.startswith('-'):
+            current = None  # Options such as -r other.txt.
+        elif code:
+            match = _REQUIREMENT_REGEX.match(code)
+            current = normalize_distribution_name(match.group(1)) if match else None
+
+            if current:
+                pins[current] = _split_requirement(code)
+
+        if code:
+            continued = code.endswith('\\')
+
+        if comment.startswith('via'):
+            in_via = not comment[len('via'):].strip()
+
+            if current and not in_via:
+                _add_dependent(dependents, current, comment[len('via'):].strip())
+        elif in_via and not code and comment and current:
+            _add_dependent(dependents, current, comment)
+        else:
+            in_via = False
+
+    return pins, dependents
+
+
+def get_environment_fingerprint(search_paths, lock_path=None):
+    """Fingerprint the installed distributions by the modification times of their directories.
+
+    Installing or removing a distribution changes the modification time of the directory that
+    contains it, so the fingerprint changes whenever the index needs to be rebuilt. Modification
+    times are compared in integer nanoseconds where available, otherwise in whole seconds together
+    with the size, so that they do not depend on the precision of floats.
+    """
+    fingerprint = hashlib.md5()
+
+    for path in search_paths + ([lock_path] if lock_path else []):
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            key = None
+        else:
+            key = (getattr(path_stat, 'st_mtime_ns', int(path_stat.st_mtime)), path_stat.st_size)
+
+        fingerprint.update(('%s:%r\n' % (path, key)).encode('utf-8'))
+
+    return fingerprint.hexdigest()
+
+
+def get_distribution_index(search_paths=None, lock_path=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Get the mapping from import names to distribution names, using an on-disk cache.
+
+    Args:
+        search_paths (list of str): Directories that contain installed distributions. Defaults to
+            the directories on the path of the current interpreter.
+        lock_path (str): Optional requirements lock file. Only the distributions pinned in it are
+            indexed and they are named as in the lock file.
+        cache_dir (str): Directory for the cached index. None disables caching.
+
+    Returns:
+        import_name_to_pip_name (dict): Mapping from import names to distribution names.
+    """
+    if search_paths is None:
+        search_paths = get_search_paths()
+
+    fingerprint = get_environment_fingerprint(search_paths, lock_path)
+    cache_path = None
+
+    if cache_dir:
+        environment = '\n'.join([sys.executable] + search_paths + [os.path.abspath(lock_path)
+                                                                   if lock_path else ''])
+        environment_key = hashlib.md5(environment.encode('utf-8')).hexdigest()
+        cache_path = os.path.join(cache_dir, 'distributions-%s.json' % environment_key)
+
+        try:
+            with open(cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+
+            if cached.get('version') == DISTRIBUTION_INDEX_VERSION and \
+                    cached.get('fingerprint') == fingerprint:
+                return cached['index']
+        except (IOError, OSError, ValueError):
+            pass
+
+    allowed_names = read_lock_file(lock_path) if lock_path else None
+    import_name_to_pip_name = build_distribution_index(search_paths, allowed_names)
+
+    if cache_path:
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+
+            # Write atomically so that concurrent runs never read a partially written cache.
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+
+            with os.fdopen(file_descriptor, 'w') as cache_file:
+                json.dump({'version': DISTRIBUTION_INDEX_VERSION, 'fingerprint': fingerprint,
+                           'index': import_name_to_pip_name}, cache_file, sort_keys=True,
+                          separators=(',', ':'))
+
+            getattr(os, 'replace', os.rename)(temporary_path, cache_path)
+        except (IOError, OSError):
+            pass    # The cache is only an optimization.
+
+    return import_name_to_pip_name
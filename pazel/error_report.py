@@ -0,0 +1,193 @@
+"""Collect per-file failures so that a run can keep going past files pazel cannot handle."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import signal
+import sys
+import traceback
+
+# Seconds spent on a single file before giving up on it with --keep-going.
+DEFAULT_FILE_TIME_BUDGET = 60.0
+
+# Phases of generating rules, named after the innermost pazel function that was running.
+PHASES = {
+    'parse_script': 'reading the script',
+    'get_imports': 'parsing imports',
+    'infer_import_type': 'resolving imports',
+    'infer_bazel_rule_type': 'inferring the rule type',
+    'count_test_cases': 'counting test methods',
+    'read_build_file': 'reading the BUILD file',
+    'is_ignored': 'matching ignored rules',
+    'format_build_file': 'formatting the BUILD file',
+    'output_build_file': 'writing the BUILD file',
+}
+
+
+class FileTimeoutError(RuntimeError):
+    """Raised when handling a file takes longer than its time budget."""
+
+
+class FileError(object):
+    """A failure to generate the rules of a file."""
+
+    __slots__ = ('path', 'phase', 'error')
+
+    def __init__(self, path, phase, error):
+        """Instantiate.
+
+        Args:
+            path (str): Path to the Python script or BUILD file that could not be handled.
+            phase (str): What pazel was doing, e.g. 'parsing imports'.
+            error (str): Type and message of the exception.
+        """
+        self.path = path
+        self.phase = phase
+        self.error = error
+
+
+class FileFailure(Exception):
+    """Raised by ErrorCollector.abandon_if_failed() to abandon a directory with failed files."""
+
+
+def get_phase(error_traceback):
+    """Name the phase in which an exception was raised from the innermost known pazel function.
+
+    Args:
+        error_traceback (traceback): Traceback of the exception.
+
+    Returns:
+        phase (str): Name of the phase, or 'generating rules' if no known function was running.
+    """
+    phase = 'generating rules'
+
+    for _, _, function_name, _ in traceback.extract_tb(error_traceback):
+        phase = PHASES.get(function_name, phase)
+
+    return phase
+
+
+def _format_error(error):
+    """Format the type and message of an exception on a single line."""
+    message = str(error).strip().splitlines()
+    name = type(error).__name__
+
+    return '%s: %s' % (name, message[0]) if message else name
+
+
+class ErrorCollector(object):
+    """Attribute failures to files and collect them instead of aborting the run.
+
+    The rules of a directory are generated inside collect() and the rules of each of its files
+    inside check(). If keep_going is set, an exception raised inside check() is recorded as a
+    FileError with the path, the phase, and the error, the rest of the check is skipped, and the
+    other files of the directory are handled as usual so that all of their failures are reported.
+    abandon_if_failed() then skips the rest of collect(), e.g. writing the BUILD file, so that the
+    existing BUILD file of the directory is kept. Otherwise, exceptions propagate as is.
+    """
+
+    def __init__(self, keep_going=False, file_time_budget=None):
+        """Instantiate.
+
+        Args:
+            keep_going (bool): Whether failures are collected instead of propagated.
+            file_time_budget (float): Seconds after which handling a file raises FileTimeoutError.
+                None or 0 disables the budget. The budget is enforced only where timers are
+                available, i.e. in the main thread on POSIX systems.
+        """
+        self.keep_going = keep_going
+        self.file_time_budget = file_time_budget
+        self.errors = []
+        self._failed = False
+        self._timing = False
+
+    @contextlib.contextmanager
+    def check(self, path, timed=True):
+        """Run the enclosed code on behalf of a file and record its failure, if any.
+
+        Args:
+            path (str): Path to the Python script or BUILD file that is being handled.
+            timed (bool): Whether the time budget applies. Checks of single files can be nested
+                in an untimed check of their directory; only one timer runs at a time.
+        """
+        timer = timed and bool(self.file_time_budget) and not self._timing and \
+            hasattr(signal, 'setitimer')
+
+        if timer:
+            def on_timeout(signal_number, frame):
+                raise FileTimeoutError("Exceeded the time budget of %g seconds." %
+                                       self.file_time_budget)
+
+            try:
+                previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+            except ValueError:  # Signals can only be handled in the main thread.
+                timer = False
+
+        if timer:
+            self._timing = True
+            signal.setitimer(signal.ITIMER_REAL, self.file_time_budget)
+
+        try:
+            yield
+        except FileFailure:
+            raise
+        except Exception as error:
+            if not self.keep_going:
+                raise
+
+            self.errors.append(FileError(path, get_phase(sys.exc_info()[2]),
+                                         _format_error(error)))
+            self._failed = True
+        finally:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous_handler)
+                self._timing = False
+
+    def abandon_if_failed(self):
+        """Skip the rest of collect() if a file of the directory has failed so far."""
+        if self._failed:
+            raise FileFailure()
+
+    @contextlib.contextmanager
+    def collect(self, path):
+        """Run the enclosed code for a directory and record the failures of its files.
+
+        The rest of the enclosed code is skipped after a failure outside the checks of single files
+        and by abandon_if_failed() after a failure of any file, so its BUILD file is not written.
+
+        Args:
+            path (str): Path to the BUILD file of the directory. Failures outside the checks of
+                single files are attributed to it.
+        """
+        self._failed = False
+
+        try:
+            with self.check(path, timed=False):
+                yield
+        except FileFailure:
+            pass
+        finally:
+            self._failed = False
+
+
+def format_errors(errors):
+    """Format a report of failures, one line per file.
+
+    Args:
+        errors (list of FileError): Failures collected by ErrorCollector.
+
+    Returns:
+        report (str): The report, or an empty string if nothing failed.
+    """
+    if not errors:
+        return ''
+
+    lines = ['%d file(s) failed. The BUILD files of their directories were left unchanged:'
+             % len(errors)]
+    lines += ['  %s: %s while %s' % (file_error.path, file_error.error, file_error.phase)
+              for file_error in sorted(errors, key=lambda file_error: file_error.path)]
+
+    return '\n'.join(lines)
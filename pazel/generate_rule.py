@@ -6,11 +6,26 @@ from __future__ import print_function
 
 import os
 
+from pazel.bazel_rules import count_test_cases
+from pazel.bazel_rules import get_shard_count
 from pazel.bazel_rules import infer_bazel_rule_type
+from pazel.bazel_rules import PY_BINARY_TEMPLATE
+from pazel.bazel_rules import PY_LIBRARY_AGGREGATE_TEMPLATE
+from pazel.bazel_rules import PyBinaryRule
+from pazel.error_report import ErrorCollector
+from pazel.granularity import get_aggregate_label
+from pazel.granularity import get_aggregate_name
+from pazel.granularity import is_aggregated
 from pazel.parse_build import find_existing_data_deps
+from pazel.parse_build import find_existing_data_deps_by_name
+from pazel.parse_build import find_existing_shard_count
 from pazel.parse_build import find_existing_test_size
 from pazel.parse_imports import get_imports
 from pazel.parse_imports import infer_import_type
+from pazel.sharding import get_relative_directory
+from pazel.split_binaries import LIBRARY_SUFFIX
+from pazel.split_binaries import parse_main_block
+from pazel.timing_index import get_test_size_and_timeout
 
 
 def _walk_modules(current_dir, modules):
@@ -74,8 +89,113 @@ def sort_module_names(module_names):
     return sorted_module_names
 
 
+def _module_name_to_label(module_name):
+    """Convert a dotted module name to a Bazel label, e.g. "foo.abc" to "//foo:abc"."""
+    # Import from the same directory as the script resides.
+    if '.' not in module_name:
+        return ':' + module_name
+
+    # Format the dotted module name to the Bazel format with slashes.
+    label = '//' + module_name.replace('.', '/')
+
+    # Replace the last slash with :.
+    last_slash_idx = label.rfind('/')
+
+    return label[:last_slash_idx] + ':' + label[last_slash_idx + 1:]
+
+
+def get_dep_labels(package_names, module_names, import_name_to_pip_name, local_import_name_to_dep,
+                   module_labels=None, own_label=None):
+    """Get the Bazel dependencies of imported packages and modules in the order they are listed.
+
+    Args:
+        package_names (set of str): Set of imported packages names in dotted notation (pkg1.pkg2).
+        module_names (set of str): Set of imported module names in dotted notation (pkg.module)
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+        module_labels (dict): Optional mapping from module name to the label of the target that
+            owns the module, e.g. an aggregate target of a directory.
+        own_label (str): Label of the rule being generated. Dependencies on it are left out.
+
+    Returns:
+        deps (list of str): Quoted labels and requirement(...) calls without duplicates.
+    """
+    deps = []
+    seen = set([own_label])
+
+    for module_name in sort_module_names(list(module_names)):
+        label = module_labels.get(module_name) if module_labels is not None else None
+
+        if label is None:
+            label = _module_name_to_label(module_name)
+
+        if label not in seen:
+            seen.add(label)
+            deps.append('\"' + label + '\"')
+
+    # Even if a submodule of a local or external package is required, install the whole package.
+    package_names = set([p.split('.')[0] for p in package_names])
+
+    # Split packages to local and external.
+    local_packages = [p for p in package_names if p in local_import_name_to_dep]
+    external_packages = [p for p in package_names if p not in local_import_name_to_dep]
+
+    for package_set in (local_packages, external_packages):     # List local packages first.
+        for package_name in sorted(list(package_set)):
+            if package_name in local_import_name_to_dep:    # Local package.
+                dep = '\"' + local_import_name_to_dep[package_name] + '\"'
+            else:   # External/pip installable package.
+                package_name = import_name_to_pip_name.get(package_name, package_name)
+                dep = 'requirement(\"%s\")' % package_name
+
+            if dep not in seen:
+                seen.add(dep)
+                deps.append(dep)
+
+    return deps
+
+
+def format_list_attribute(attribute, items):
+    """Format a list-valued rule attribute such as 'deps'.
+
+    Formatting with one item:
+    deps = ["//my_dep1/foo:abc"],
+    Formatting with multiple items:
+    deps = [
+          "//my_dep1/foo:abc",
+          "//my_dep2/bar:xyz",
+      ],
+
+    Args:
+        attribute (str): Name of the attribute.
+        items (list of str): Items formatted as Starlark expressions, e.g. quoted strings.
+
+    Returns:
+        formatted (str): The formatted attribute or an empty string if there are no items.
+    """
+    tab = '    '
+
+    if not items:
+        return ''
+
+    if len(items) == 1:
+        return '{attribute} = [{item}],'.format(attribute=attribute, item=items[0])
+
+    formatted_items = ''.join(2*tab + item + ',\n' for item in items)
+
+    return '{attribute} = [\n{items}{tab}],'.format(attribute=attribute, items=formatted_items,
+                                                    tab=tab)
+
+
+def _strip_blank_lines(rule):
+    """If e.g. 'data' is missing, then remove blank lines."""
+    return "\n".join([s for s in rule.splitlines() if s.strip()])
+
+
 def generate_rule(script_path, template, package_names, module_names, data_deps, test_size,
-                  import_name_to_pip_name, local_import_name_to_dep):
+                  import_name_to_pip_name, local_import_name_to_dep, module_labels=None,
+                  test_timeout=None, shard_count=None):
     """Generate a Bazel Python rule given the type of the Python file and imports in it.
 
     Args:
@@ -88,129 +208,407 @@ def generate_rule(script_path, template, package_names, module_names, data_deps,
         import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
         local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
             dependency.
+        module_labels (dict): Optional mapping from module name to the label of the target that
+            owns the module.
+        test_timeout (str): Test timeout inferred from recorded durations. Left out if None.
+        shard_count (int): Number of test shards. Left out if None.
 
     Returns:
         rule (str): Bazel rule generated for the current Python script.
     """
     script_name = os.path.basename(script_path).replace('.py', '')
-    deps = ''
-    tab = '    '
 
-    num_deps = len(module_names) + len(package_names)
-    multiple_deps = num_deps > 1
+    deps = format_list_attribute('deps', get_dep_labels(package_names, module_names,
+                                                        import_name_to_pip_name,
+                                                        local_import_name_to_dep, module_labels))
 
-    # Formatting with one dependency:
-    # deps = ["//my_dep1/foo:abc"]
-    # Formatting with multiple dependencies:
-    # deps = [
-    #       "//my_dep1/foo:abc",
-    #       "//my_dep2/bar:xyz",
-    #   ]
+    data = data_deps + ',' if data_deps is not None else ''
+    size = test_size if test_size is not None else 'small'  # If size not given, assume small.
+    timeout = 'timeout = "%s",' % test_timeout if test_timeout is not None else ''
+    shards = 'shard_count = %d,' % shard_count if shard_count is not None else ''
 
-    if multiple_deps:
-        deps += '\n'
+    rule = template.format(name=script_name, deps=deps, data=data, size=size, timeout=timeout,
+                           shard_count=shards)
 
-    for module_name in sort_module_names(list(module_names)):
-        # Import from the same directory as the script resides.
-        if '.' not in module_name:
-            module_name = ':' + module_name
-        else:
-            # Format the dotted module name to the Bazel format with slashes.
-            module_name = '//' + module_name.replace('.', '/')
+    return _strip_blank_lines(rule)
 
-            # Replace the last slash with :.
-            last_slash_idx = module_name.rfind('/')
-            module_name = module_name[:last_slash_idx] + ':' + module_name[last_slash_idx + 1:]
 
-        if multiple_deps:
-            deps += 2*tab
+def generate_aggregate_rule(aggregate_name, own_label, script_paths, package_names, module_names,
+                            data_deps, import_name_to_pip_name, local_import_name_to_dep,
+                            module_labels):
+    """Generate a single py_library for multiple Python scripts in a directory.
 
-        deps += '\"' + module_name + '\"'
+    Args:
+        aggregate_name (str): Name of the py_library.
+        own_label (str): Label of the py_library. Imports between the scripts are not listed as
+            deps.
+        script_paths (list of str): Paths to the Python scripts in the same directory.
+        package_names (set of str): Union of imported packages names of the scripts.
+        module_names (set of str): Union of imported module names of the scripts.
+        data_deps (str): Data dependencies parsed from an existing BUILD file.
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+        module_labels (dict): Mapping from module name to the label of the target that owns it.
 
-        if multiple_deps:
-            deps += ',\n'
+    Returns:
+        rule (str): Bazel rule generated for the scripts.
+    """
+    srcs = ['\"' + os.path.basename(path) + '\"' for path in sorted(script_paths)]
+    deps = get_dep_labels(package_names, module_names, import_name_to_pip_name,
+                          local_import_name_to_dep, module_labels, own_label)
 
-    # Even if a submodule of a local or external package is required, install the whole package.
-    package_names = set([p.split('.')[0] for p in package_names])
+    data = data_deps + ',' if data_deps is not None else ''
 
-    # Split packages to local and external.
-    local_packages = [p for p in package_names if p in local_import_name_to_dep]
-    external_packages = [p for p in package_names if p not in local_import_name_to_dep]
+    rule = PY_LIBRARY_AGGREGATE_TEMPLATE.format(name=aggregate_name,
+                                                srcs=format_list_attribute('srcs', srcs),
+                                                deps=format_list_attribute('deps', deps),
+                                                data=data)
 
-    for package_set in (local_packages, external_packages):     # List local packages first.
-        for package_name in sorted(list(package_set)):
-            if multiple_deps:
-                deps += 2*tab
+    return _strip_blank_lines(rule)
 
-            if package_name in local_import_name_to_dep:    # Local package.
-                package_name = local_import_name_to_dep[package_name]
-                deps += '\"' + package_name + '\"'
-            else:   # External/pip installable package.
-                package_name = import_name_to_pip_name.get(package_name, package_name)
-                package_name = 'requirement(\"%s\")' % package_name
-                deps += package_name
 
-            if multiple_deps:
-                deps += ',\n'
+def generate_split_binary_rules(script_path, package_names, module_names, main_package_names,
+                                main_module_names, import_name_to_pip_name,
+                                local_import_name_to_dep, module_labels=None):
+    """Generate a py_library for the importable code of a script and a py_binary wrapping it.
 
-    if multiple_deps:
-        deps += tab
+    The py_binary depends on the py_library and on the imports of the main block that the rest of
+    the script does not import. Existing data dependencies are kept on the rule that has them.
 
-    if deps:
-        deps = 'deps = [{deps}],'.format(deps=deps)
+    Args:
+        script_path (str): Path to a Python script.
+        package_names (set of str): Package names imported outside the main block.
+        module_names (set of str): Module names imported outside the main block.
+        main_package_names (set of str): Package names imported in the main block.
+        main_module_names (set of str): Module names imported in the main block.
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+        module_labels (dict): Optional mapping from module name to the label of the target that
+            owns the module.
 
-    data = data_deps + ',' if data_deps is not None else ''
-    size = test_size if test_size is not None else 'small'  # If size not given, assume small.
+    Returns:
+        rules (str): The py_library and the py_binary separated by a blank line.
+    """
+    script_name = os.path.basename(script_path).replace('.py', '')
+    library_name = script_name + LIBRARY_SUFFIX
+    build_file_path = os.path.join(os.path.dirname(script_path), 'BUILD')
 
-    rule = template.format(name=script_name, deps=deps, data=data, size=size)
-    # If e.g. 'data' is missing, then remove blank lines.
-    rule = "\n".join([s for s in rule.splitlines() if s.strip()])
+    library_deps = get_dep_labels(package_names, module_names, import_name_to_pip_name,
+                                  local_import_name_to_dep, module_labels)
+    library_data_deps = find_existing_data_deps_by_name(build_file_path, library_name)
 
-    return rule
+    library_rule = PY_LIBRARY_AGGREGATE_TEMPLATE.format(
+        name=library_name, srcs=format_list_attribute('srcs', ['\"%s.py\"' % script_name]),
+        deps=format_list_attribute('deps', library_deps),
+        data=library_data_deps + ',' if library_data_deps is not None else '')
 
+    binary_deps = ['\":%s\"' % library_name]
+    binary_deps += [dep for dep in get_dep_labels(main_package_names - set(package_names),
+                                                  main_module_names - set(module_names),
+                                                  import_name_to_pip_name,
+                                                  local_import_name_to_dep, module_labels)
+                    if dep not in library_deps]
+    binary_data_deps = find_existing_data_deps_by_name(build_file_path, script_name)
 
-def parse_script_and_generate_rule(script_path, project_root, contains_pre_installed_packages,
-                                   custom_bazel_rules, custom_import_inference_rules,
-                                   import_name_to_pip_name, local_import_name_to_dep):
-    """Generate Bazel Python rule for a Python script.
+    binary_rule = PY_BINARY_TEMPLATE.format(
+        name=script_name, deps=format_list_attribute('deps', binary_deps),
+        data=binary_data_deps + ',' if binary_data_deps is not None else '')
+
+    return _strip_blank_lines(library_rule) + 2*'\n' + _strip_blank_lines(binary_rule)
+
+
+def _generate_split_binary_rules_if_needed(split_binaries, script_path, bazel_rule_type,
+                                           package_names, module_names, project_root,
+                                           contains_pre_installed_packages,
+                                           custom_import_inference_rules, import_name_to_pip_name,
+                                           local_import_name_to_dep, module_labels):
+    """Generate the rules of a split binary, or return None if the script is not split."""
+    if not split_binaries or bazel_rule_type is not PyBinaryRule:
+        return None
+
+    main_package_names, main_module_names = parse_main_block(script_path, project_root,
+                                                             contains_pre_installed_packages,
+                                                             custom_import_inference_rules)
+
+    if main_package_names is None:
+        return None
+
+    return generate_split_binary_rules(script_path, package_names, module_names,
+                                       main_package_names, main_module_names,
+                                       import_name_to_pip_name, local_import_name_to_dep,
+                                       module_labels)
+
+
+def _find_test_attributes(script_path, bazel_rule_type, project_root, test_timings,
+                          num_test_methods, tests_per_shard):
+    """Find the size, timeout, and number of shards of a test.
+
+    Recorded durations take precedence over the size in an existing BUILD file. The number of shards
+    in an existing BUILD file takes precedence over the number inferred from the test methods.
+
+    Returns:
+        test_size (str): Size of the test or None if it is unknown.
+        test_timeout (str): Timeout of the test or None if it is unknown.
+        shard_count (int): Number of shards or None if the test is not sharded.
+    """
+    if not bazel_rule_type.is_test_rule:
+        return None, None, None
+
+    test_size, test_timeout = get_test_size_and_timeout(test_timings, script_path, project_root)
+
+    if test_size is None:
+        test_size = find_existing_test_size(script_path, bazel_rule_type)
+
+    shard_count = find_existing_shard_count(script_path, bazel_rule_type)
+
+    if shard_count is None:
+        shard_count = get_shard_count(num_test_methods, tests_per_shard)
+
+    return test_size, test_timeout, shard_count
+
+
+class ParsedScript(object):
+    """The rule type and the imports of a Python script, as inferred by parse_script."""
+
+    __slots__ = ('bazel_rule_type', 'package_names', 'module_names', 'num_test_methods')
+
+    def __init__(self, bazel_rule_type, package_names, module_names, num_test_methods):
+        """Instantiate.
+
+        Args:
+            bazel_rule_type (BazelRule class): Rule type of the script.
+            package_names (set of str): Imported package names.
+            module_names (set of str): Imported module names.
+            num_test_methods (int): Number of test methods if the script is a test, otherwise None.
+        """
+        self.bazel_rule_type = bazel_rule_type
+        self.package_names = package_names
+        self.module_names = module_names
+        self.num_test_methods = num_test_methods
+
+
+def parse_script(script_path, project_root, contains_pre_installed_packages, custom_bazel_rules,
+                 custom_import_inference_rules, import_scan_budget=None):
+    """Infer the Bazel rule type of a Python script and what it imports.
 
     Args:
-        script_path (str): Path to a Python file for which the Bazel rule is generated.
+        script_path (str): Path to a Python file.
         project_root (str): Imports in the Python script are assumed to be relative to this path.
         contains_pre_installed_packages (bool): Environment contains pre-installed packages (true)
             or only the standard library (false).
         custom_bazel_rules (list of BazelRule classes): Custom rule classes implementing BazelRule.
         custom_import_inference_rules (list of ImportInferenceRule classes): Custom rule classes
             implementing ImportInferenceRule.
-        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
-        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
-            dependency.
+        import_scan_budget (int): If given, imports are first scanned from the import preamble of
+            the script and the whole script is parsed only if needed. See get_imports.
 
     Returns:
-        rule (str): Bazel rule generated for the Python script.
+        parsed_script (ParsedScript): Rule type and imports of the script.
     """
     with open(script_path, 'r') as script_file:
         script_source = script_file.read()
 
     # Get all imports in the script.
-    package_names, from_imports = get_imports(script_source)
+    package_names, from_imports = get_imports(script_source, import_scan_budget)
     all_imports = package_names + from_imports
 
     # Infer the import type: Is a package, module, or an object being imported.
     package_names, module_names = infer_import_type(all_imports, project_root,
                                                     contains_pre_installed_packages,
-                                                    custom_import_inference_rules)
+                                                    custom_import_inference_rules, script_path)
+
+    # Infer the Bazel rule type for the script. The imported names are used for prefiltering rules.
+    # For "from X import Y", both X and X.Y are considered imported because Y may be a module.
+    imported_names = set()
+
+    for base, unknown in all_imports:
+        if base is not None:
+            imported_names.add(base)
+
+            if unknown is not None:
+                imported_names.add(base + '.' + unknown)
+
+    bazel_rule_type = infer_bazel_rule_type(script_path, script_source, custom_bazel_rules,
+                                            imported_names)
+
+    num_test_methods = None
 
-    # Infer the Bazel rule type for the script.
-    bazel_rule_type = infer_bazel_rule_type(script_path, script_source, custom_bazel_rules)
+    if bazel_rule_type.is_test_rule:
+        _, num_test_methods = count_test_cases(script_source)
+
+    return ParsedScript(bazel_rule_type, package_names, module_names, num_test_methods)
+
+
+def parse_script_and_generate_rule(script_path, project_root, contains_pre_installed_packages,
+                                   custom_bazel_rules, custom_import_inference_rules,
+                                   import_name_to_pip_name, local_import_name_to_dep,
+                                   import_scan_budget=None, module_labels=None, test_timings=None,
+                                   tests_per_shard=None, dependency_reducer=None,
+                                   split_binaries=False):
+    """Generate Bazel Python rule for a Python script.
+
+    Args:
+        script_path (str): Path to a Python file for which the Bazel rule is generated.
+        project_root (str): Imports in the Python script are assumed to be relative to this path.
+        contains_pre_installed_packages (bool): Environment contains pre-installed packages (true)
+            or only the standard library (false).
+        custom_bazel_rules (list of BazelRule classes): Custom rule classes implementing BazelRule.
+        custom_import_inference_rules (list of ImportInferenceRule classes): Custom rule classes
+            implementing ImportInferenceRule.
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+        import_scan_budget (int): If given, imports are first scanned from the import preamble of
+            the script and the whole script is parsed only if needed. See get_imports.
+        module_labels (dict): Optional mapping from module name to the label of the target that
+            owns the module.
+        test_timings (TimingIndex): Recorded test durations for inferring test size and timeout.
+        tests_per_shard (int): Tests with more test methods than this are sharded.
+        dependency_reducer (DependencyReducer): If given, dependencies that are reachable through
+            other dependencies are left out.
+        split_binaries (bool): Whether binaries with a main block are split into a py_library and
+            a py_binary. See generate_split_binary_rules.
+
+    Returns:
+        rule (str): Bazel rule generated for the Python script, or two rules for split binaries.
+    """
+    parsed_script = parse_script(script_path, project_root, contains_pre_installed_packages,
+                                 custom_bazel_rules, custom_import_inference_rules,
+                                 import_scan_budget)
+    bazel_rule_type = parsed_script.bazel_rule_type
+    package_names, module_names = parsed_script.package_names, parsed_script.module_names
+    num_test_methods = parsed_script.num_test_methods
+
+    if dependency_reducer is not None:
+        package_names, module_names = dependency_reducer.reduce(script_path, package_names,
+                                                                module_names)
+
+    split_rules = _generate_split_binary_rules_if_needed(
+        split_binaries, script_path, bazel_rule_type, package_names, module_names, project_root,
+        contains_pre_installed_packages, custom_import_inference_rules, import_name_to_pip_name,
+        local_import_name_to_dep, module_labels)
+
+    if split_rules is not None:
+        return split_rules
 
     # Data dependencies or test size cannot be inferred from the script source code currently.
-    # Use information in any existing BUILD files.
+    # Use information in any existing BUILD files and recorded test durations.
     data_deps = find_existing_data_deps(script_path, bazel_rule_type)
-    test_size = find_existing_test_size(script_path, bazel_rule_type)
+    test_size, test_timeout, shard_count = _find_test_attributes(script_path, bazel_rule_type,
+                                                                 project_root, test_timings,
+                                                                 num_test_methods, tests_per_shard)
 
     # Generate the Bazel Python rule based on the gathered information.
     rule = generate_rule(script_path, bazel_rule_type.template, package_names, module_names,
-                         data_deps, test_size, import_name_to_pip_name, local_import_name_to_dep)
+                         data_deps, test_size, import_name_to_pip_name, local_import_name_to_dep,
+                         module_labels, test_timeout, shard_count)
 
     return rule
+
+
+def parse_directory_and_generate_rules(directory, script_paths, project_root,
+                                       contains_pre_installed_packages, custom_bazel_rules,
+                                       custom_import_inference_rules, import_name_to_pip_name,
+                                       local_import_name_to_dep, module_labels,
+                                       import_scan_budget=None, test_timings=None,
+                                       tests_per_shard=None, dependency_reducer=None,
+                                       error_collector=None, split_binaries=False):
+    """Generate Bazel Python rules for a directory with 'directory' granularity.
+
+    All libraries in the directory are aggregated to a single py_library named after the directory.
+    Tests, binaries, and custom rules get their own rules that depend on the aggregate py_library.
+    If the directory has no aggregate name, e.g. at the project root, the libraries get their own
+    rules as with 'file' granularity. See get_aggregate_name.
+
+    Args:
+        directory (str): Path to the directory.
+        script_paths (list of str): Paths to the Python files in the directory for which rules are
+            generated.
+        project_root (str): Imports in the Python scripts are assumed to be relative to this path.
+        contains_pre_installed_packages (bool): Environment contains pre-installed packages (true)
+            or only the standard library (false).
+        custom_bazel_rules (list of BazelRule classes): Custom rule classes implementing BazelRule.
+        custom_import_inference_rules (list of ImportInferenceRule classes): Custom rule classes
+            implementing ImportInferenceRule.
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+        module_labels (AggregatedModuleLabels): Mapping from module name to the label of the
+            aggregate target that owns the module.
+        import_scan_budget (int): If given, imports are first scanned from the import preamble of
+            each script. See get_imports.
+        test_timings (TimingIndex): Recorded test durations for inferring test size and timeout.
+        tests_per_shard (int): Tests with more test methods than this are sharded.
+        dependency_reducer (DependencyReducer): If given, dependencies that are reachable through
+            other dependencies are left out.
+        error_collector (ErrorCollector): If given, failures to parse a script are attributed to
+            the script.
+        split_binaries (bool): Whether binaries with a main block are split into a py_library and
+            a py_binary. See generate_split_binary_rules.
+
+    Returns:
+        rules (list of str): Bazel rules generated for the directory. The aggregate py_library is
+            the first rule if the directory contains libraries.
+    """
+    aggregate_name = get_aggregate_name(directory, project_root, custom_bazel_rules,
+                                        split_binaries)
+    own_label = None
+
+    if aggregate_name is not None:
+        own_label = get_aggregate_label(get_relative_directory(directory, project_root),
+                                        aggregate_name)
+
+    aggregated_paths, aggregated_packages, aggregated_modules = [], set(), set()
+    rules = []
+    error_collector = error_collector or ErrorCollector()
+
+    for script_path in script_paths:
+        # With keep_going, a file that fails is left out and the other files are handled as usual.
+        with error_collector.check(script_path):
+            parsed_script = parse_script(script_path, project_root,
+                                         contains_pre_installed_packages, custom_bazel_rules,
+                                         custom_import_inference_rules, import_scan_budget)
+            bazel_rule_type = parsed_script.bazel_rule_type
+            package_names, module_names = parsed_script.package_names, parsed_script.module_names
+
+            if dependency_reducer is not None:
+                package_names, module_names = dependency_reducer.reduce(script_path, package_names,
+                                                                        module_names)
+
+            if aggregate_name is not None and is_aggregated(bazel_rule_type):
+                aggregated_paths.append(script_path)
+                aggregated_packages.update(package_names)
+                aggregated_modules.update(module_names)
+                continue
+
+            split_rules = _generate_split_binary_rules_if_needed(
+                split_binaries, script_path, bazel_rule_type, package_names, module_names,
+                project_root, contains_pre_installed_packages, custom_import_inference_rules,
+                import_name_to_pip_name, local_import_name_to_dep, module_labels)
+
+            if split_rules is not None:
+                rules.append(split_rules)
+                continue
+
+            data_deps = find_existing_data_deps(script_path, bazel_rule_type)
+            test_size, test_timeout, shard_count = _find_test_attributes(
+                script_path, bazel_rule_type, project_root, test_timings,
+                parsed_script.num_test_methods, tests_per_shard)
+
+            rules.append(generate_rule(script_path, bazel_rule_type.template, package_names,
+                                       module_names, data_deps, test_size, import_name_to_pip_name,
+                                       local_import_name_to_dep, module_labels, test_timeout,
+                                       shard_count))
+
+    if aggregated_paths:
+        data_deps = find_existing_data_deps_by_name(os.path.join(directory, 'BUILD'),
+                                                    aggregate_name)
+
+        rules.insert(0, generate_aggregate_rule(aggregate_name, own_label, aggregated_paths,
+                                                aggregated_packages, aggregated_modules, data_deps,
+                                                import_name_to_pip_name, local_import_name_to_dep,
+                                                module_labels))
+
+    return rules
@@ -0,0 +1,227 @@
+"""Aggregate the libraries of a directory to a single Bazel target."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from pazel.bazel_rules import infer_bazel_rule_type
+from pazel.bazel_rules import PyLibraryRule
+from pazel.helpers import intern_string
+from pazel.helpers import is_ignored
+from pazel.parse_build import get_ignored_rules
+from pazel.parse_build import read_build_file
+from pazel.split_binaries import is_split_binary
+from pazel.split_binaries import LIBRARY_SUFFIX
+
+FILE_GRANULARITY = 'file'
+DIRECTORY_GRANULARITY = 'directory'
+
+
+def get_granularity(relative_directory, granularity, directory_granularity):
+    """Get the granularity of the rules of a directory.
+
+    Args:
+        relative_directory (str): Directory relative to the project root using forward slashes.
+        granularity (str): Default granularity.
+        directory_granularity (dict): Mapping from a directory relative to the project root to its
+            granularity. The granularity of the longest matching parent directory is used.
+
+    Returns:
+        granularity (str): 'file' or 'directory'.
+    """
+    directory = relative_directory
+
+    while True:
+        if directory in directory_granularity:
+            return directory_granularity[directory]
+
+        if directory in ('', '.'):
+            return granularity
+
+        directory = os.path.dirname(directory) or '.'
+
+
+def _get_rule_type(script_path, custom_bazel_rules):
+    """Get the rule type and the source of a script, or (None, None) if it has no generated rule."""
+    build_file_path = os.path.join(os.path.dirname(script_path), 'BUILD')
+
+    try:
+        with open(script_path, 'r') as script_file:
+            script_source = script_file.read()
+    except IOError:
+        return None, None
+
+    if is_ignored(script_path, get_ignored_rules(build_file_path)):
+        return None, None
+
+    return infer_bazel_rule_type(script_path, script_source, custom_bazel_rules), script_source
+
+
+def get_aggregate_name(directory, project_root, custom_bazel_rules, split_binaries=False):
+    """Get the name of the aggregate py_library of a directory, i.e., the name of the directory.
+
+    The name must not clash with the other rules of the directory, e.g. with the py_binary of
+    foo/foo.py or with a hand-written rule named foo. The project root has no name of its own
+    because the name of its directory depends on the checkout. Such directories fall back to
+    'file' granularity.
+
+    Args:
+        directory (str): Path to the directory.
+        project_root (str): Imports in the Python files are relative to this path.
+        custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+        split_binaries (bool): Whether binaries with a main block get a py_library named
+            '<script>_lib'.
+
+    Returns:
+        aggregate_name (str): Name of the aggregate py_library, or None if the libraries of the
+            directory get their own rules.
+    """
+    directory = os.path.abspath(directory)
+
+    if directory == os.path.abspath(project_root):
+        return None
+
+    aggregate_name = os.path.basename(directory)
+    build_file = read_build_file(os.path.join(directory, 'BUILD'))
+
+    if build_file is not None:
+        rule = build_file.find_rule_by_name(aggregate_name)
+
+        if rule is not None and rule.ignored:
+            return None
+
+    try:
+        # Scripts that are not aggregated get rules named after them.
+        bazel_rule_type, _ = _get_rule_type(os.path.join(directory, aggregate_name + '.py'),
+                                            custom_bazel_rules)
+
+        if bazel_rule_type is not None and not is_aggregated(bazel_rule_type):
+            return None
+
+        # Split binaries also get a py_library named after them.
+        if split_binaries and aggregate_name.endswith(LIBRARY_SUFFIX):
+            script_path = os.path.join(directory, aggregate_name[:-len(LIBRARY_SUFFIX)] + '.py')
+            bazel_rule_type, script_source = _get_rule_type(script_path, custom_bazel_rules)
+
+            if bazel_rule_type is not None and is_split_binary(bazel_rule_type, script_source):
+                return None
+    except (RuntimeError, SyntaxError):
+        return None     # The rule names of the directory are not known.
+
+    return aggregate_name
+
+
+def get_aggregate_label(relative_directory, aggregate_name):
+    """Get the Bazel label of the aggregate py_library of a directory.
+
+    Args:
+        relative_directory (str): Directory relative to the project root using forward slashes.
+        aggregate_name (str): Name of the aggregate py_library.
+
+    Returns:
+        label (str): Label of the form //foo/bar:bar.
+    """
+    package = '' if relative_directory == '.' else relative_directory
+
+    return '//%s:%s' % (package, aggregate_name)
+
+
+def is_aggregated(bazel_rule_type):
+    """Check whether a script of the given rule type is part of the aggregate py_library."""
+    return bazel_rule_type is PyLibraryRule
+
+
+class AggregatedModuleLabels(object):
+    """Map module names to the labels of the aggregate targets that own them.
+
+    Instances behave like a read-only dictionary from dotted module names to labels. Modules in
+    directories with 'file' granularity or without an aggregate name (see get_aggregate_name) and
+    modules that are not libraries (e.g. binaries) map to None so that the default label is used
+    for them.
+    """
+
+    def __init__(self, project_root, granularity, directory_granularity, custom_bazel_rules,
+                 split_binaries=False):
+        """Instantiate.
+
+        Args:
+            project_root (str): Imports in the Python files are relative to this path.
+            granularity (str): Default granularity.
+            directory_granularity (dict): Mapping from a relative directory to its granularity.
+            custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+            split_binaries (bool): Whether binaries with a main block are split. See
+                get_aggregate_name.
+        """
+        self.project_root = project_root
+        self.granularity = granularity
+        self.directory_granularity = directory_granularity
+        self.custom_bazel_rules = custom_bazel_rules
+        self.split_binaries = split_binaries
+        self._labels = dict()
+        self._aggregate_names = dict()
+
+    def get(self, module_name, default=None):
+        """Get the aggregate label of a module.
+
+        Args:
+            module_name (str): Module name in dotted notation relative to the project root.
+            default (str): Value returned if the module is not part of an aggregate target.
+
+        Returns:
+            label (str): Label of the aggregate target or default.
+        """
+        if module_name not in self._labels:
+            self._labels[intern_string(module_name)] = intern_string(self._find_label(module_name))
+
+        label = self._labels[module_name]
+
+        return label if label is not None else default
+
+    def release(self):
+        """Forget the memoized labels to bound memory use. They are looked up again when needed."""
+        self._labels = dict()
+        self._aggregate_names = dict()
+
+    def _find_label(self, module_name):
+        """Find the aggregate label of a module, or None if the module is not aggregated."""
+        parts = module_name.split('.')
+        relative_directory = '/'.join(parts[:-1]) or '.'
+
+        if get_granularity(relative_directory, self.granularity,
+                           self.directory_granularity) != DIRECTORY_GRANULARITY:
+            return None
+
+        directory = os.path.join(self.project_root, *parts[:-1])
+        script_path = os.path.join(directory, parts[-1] + '.py')
+
+        try:
+            with open(script_path, 'r') as script_file:
+                script_source = script_file.read()
+        except IOError:
+            return None
+
+        # Ignored scripts keep their hand-written rules.
+        if is_ignored(script_path, get_ignored_rules(os.path.join(directory, 'BUILD'))):
+            return None
+
+        try:
+            bazel_rule_type = infer_bazel_rule_type(script_path, script_source,
+                                                    self.custom_bazel_rules)
+        except RuntimeError:
+            return None
+
+        if not is_aggregated(bazel_rule_type):
+            return None
+
+        if relative_directory not in self._aggregate_names:
+            self._aggregate_names[relative_directory] = get_aggregate_name(
+                directory, self.project_root, self.custom_bazel_rules, self.split_binaries)
+
+        aggregate_name = self._aggregate_names[relative_directory]
+
+        if aggregate_name is None:
+            return None
+
+        return get_aggregate_label(relative_directory, aggregate_name)
@@ -0,0 +1,229 @@
+"""Compute fan-in, fan-out, and closure statistics of the targets in the import graph."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from pazel.import_cycles import find_strongly_connected_components
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import MODULE
+
+
+def _count_bits(bits):
+    """Count the set bits of a non-negative integer."""
+    return bin(bits).count('1')
+
+
+def _iterate_bits(bits):
+    """Yield the indices of the set bits of a non-negative integer."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def compute_closures(graph):
+    """Compute the transitive successors and predecessors of every node as integer bitsets.
+
+    The closures are computed incrementally over the strongly connected components of the graph:
+    the closure of a component is the union of the closures of the components it imports, so every
+    edge is processed once per direction.
+
+    Args:
+        graph (ImportGraph): Import graph.
+
+    Returns:
+        successors (list of int): Bitset of the nodes reachable from each node via one or more
+            edges.
+        predecessors (list of int): Bitset of the nodes that reach each node via one or more
+            edges.
+    """
+    components = find_strongly_connected_components(graph)     # Reverse topological order.
+    component_of = [0] * graph.num_nodes
+
+    for i, component in enumerate(components):
+        for node_id in component:
+            component_of[node_id] = i
+
+    def close(ordered_components, neighbors):
+        # Nodes reachable from each component including the component itself.
+        reach = [0] * len(components)
+        closures = [0] * graph.num_nodes
+
+        for i in ordered_components:
+            members = 0
+
+            for node_id in components[i]:
+                members |= 1 << node_id
+
+            reach[i] = members
+
+            for node_id in components[i]:
+                for neighbor in neighbors(node_id):
+                    closures[node_id] |= reach[component_of[neighbor]]
+
+            for node_id in components[i]:
+                reach[i] |= closures[node_id]
+
+            # The modules of an import cycle reach each other and everything any of them reaches.
+            if len(components[i]) > 1:
+                for node_id in components[i]:
+                    closures[node_id] = reach[i]
+
+        return closures
+
+    # Components reachable from a component come before it in Tarjan's order.
+    successors = close(range(len(components)), graph.successors)
+    predecessors = close(range(len(components) - 1, -1, -1), graph.predecessors)
+
+    return successors, predecessors
+
+
+class TargetStats(object):
+    """Fan-in, fan-out, and closure statistics of a module's target."""
+
+    __slots__ = ('node_id', 'name', 'rule', 'fan_in', 'fan_out', 'transitive_fan_in',
+                 'transitive_fan_out', 'transitive_bytes', 'external_packages')
+
+    def __init__(self, node_id, name, rule, fan_in, fan_out, transitive_fan_in, transitive_fan_out,
+                 transitive_bytes, external_packages):
+        """Instantiate.
+
+        Args:
+            node_id (int): ID of the module in the import graph.
+            name (str): Dotted module name.
+            rule (str): Rule type, e.g. 'py_library'.
+            fan_in (int): Number of modules that import the module.
+            fan_out (int): Number of modules and packages the module imports.
+            transitive_fan_in (int): Number of modules that import the module directly or
+                indirectly, i.e. that are affected when the module changes.
+            transitive_fan_out (int): Number of modules and packages the module imports directly or
+                indirectly.
+            transitive_bytes (int): Size in bytes of the module and the local modules it imports
+                directly or indirectly.
+            external_packages (list of str): External packages the module imports directly or
+                indirectly.
+        """
+        self.node_id = node_id
+        self.name = name
+        self.rule = rule
+        self.fan_in = fan_in
+        self.fan_out = fan_out
+        self.transitive_fan_in = transitive_fan_in
+        self.transitive_fan_out = transitive_fan_out
+        self.transitive_bytes = transitive_bytes
+        self.external_packages = external_packages
+
+    def to_dict(self):
+        """Return the statistics as a dictionary, e.g. for JSON output."""
+        return dict((key, getattr(self, key)) for key in self.__slots__ if key != 'node_id')
+
+
+def compute_target_stats(graph):
+    """Compute the statistics of every module that has a script in the graph.
+
+    Args:
+        graph (ImportGraph): Import graph built by build_import_graph.
+
+    Returns:
+        stats (list of TargetStats): Statistics ordered by module name.
+    """
+    successors, predecessors = compute_closures(graph)
+    stats = []
+
+    for node_id in range(graph.num_nodes):
+        if graph.get_kind(node_id) != MODULE or graph.get_rule(node_id) is None:
+            continue
+
+        own = 1 << node_id
+        transitive_bytes = graph.get_size(node_id)
+        external_packages = []
+
+        for reached in _iterate_bits(successors[node_id] & ~own):
+            if graph.get_kind(reached) == MODULE:
+                transitive_bytes += graph.get_size(reached)
+            elif graph.get_kind(reached) == EXTERNAL_PACKAGE:
+                external_packages.append(graph.get_name(reached))
+
+        stats.append(TargetStats(node_id, graph.get_name(node_id), graph.get_rule(node_id),
+                                 len(graph.predecessors(node_id)), len(graph.successors(node_id)),
+                                 _count_bits(predecessors[node_id] & ~own),
+                                 _count_bits(successors[node_id] & ~own), transitive_bytes,
+                                 sorted(external_packages)))
+
+    return sorted(stats, key=lambda target: target.name)
+
+
+def get_histogram(values):
+    """Count values in power-of-two buckets [0, 0], [1, 1], [2, 3], [4, 7], and so on.
+
+    Args:
+        values (list of int): Non-negative values.
+
+    Returns:
+        histogram (list of tuple): (lowest value, highest value, count) of each non-empty bucket.
+    """
+    counts = dict()
+
+    for value in values:
+        bucket = value.bit_length()
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    return [(0 if bucket == 0 else 1 << (bucket - 1), 0 if bucket == 0 else (1 << bucket) - 1,
+             counts[bucket]) for bucket in sorted(counts)]
+
+
+def get_package_fan_in(stats):
+    """Count the targets that reach each external package, the most widely reached first."""
+    counts = dict()
+
+    for target in stats:
+        for package in target.external_packages:
+            counts[package] = counts.get(package, 0) + 1
+
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+# Statistics shown in histograms and top-N lists with their descriptions.
+REPORTED_STATS = [
+    ('transitive_fan_in', 'Targets affected when the target changes (transitive fan-in)'),
+    ('transitive_fan_out', 'Modules and packages in the closure (transitive fan-out)'),
+    ('transitive_bytes', 'Bytes of local source code in the closure'),
+    ('fan_in', 'Direct fan-in'),
+    ('fan_out', 'Direct fan-out'),
+]
+
+
+def format_target_stats(stats, top=10):
+    """Format a human-readable report with histograms and top-N lists.
+
+    Args:
+        stats (list of TargetStats): Statistics returned by compute_target_stats.
+        top (int): Number of targets listed for each statistic.
+
+    Returns:
+        report (str): The report.
+    """
+    paragraphs = ['%d targets.' % len(stats)]
+
+    for key, description in REPORTED_STATS:
+        values = [getattr(target, key) for target in stats]
+        lines = [description + ':']
+
+        for low, high, count in get_histogram(values):
+            bucket = str(low) if low == high else '%d-%d' % (low, high)
+            lines.append('  %12s: %d' % (bucket, count))
+
+        lines.append('  Top %d:' % top)
+        ranked = sorted(stats, key=lambda target: (-getattr(target, key), target.name))
+
+        for target in ranked[:top]:
+            lines.append('  %12d  %s (%s)' % (getattr(target, key), target.name, target.rule))
+
+        paragraphs.append('\n'.join(lines))
+
+    lines = ['External packages by the number of targets that reach them:']
+    lines += ['  %12d  %s' % (count, package) for package, count in get_package_fan_in(stats)[:top]]
+    paragraphs.append('\n'.join(lines))
+
+    return '\n\n'.join(paragraphs)
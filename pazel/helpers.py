@@ -11,6 +11,14 @@ import platform
 import sys
 import traceback
 
+from pazel.starlark import OP
+from pazel.starlark import tokenize
+
+try:
+    _intern = sys.intern
+except AttributeError:  # Python 2.
+    _intern = intern    # noqa: F821
+
 
 def contains_python_file(directory):
     """Check if the given directory contains at least one .py/.pyc file.
@@ -71,17 +79,15 @@ def is_ignored(script_path, ignored_rules):
         assert len(node.body) == 1, "Unsupported rule type %s." % ignored_rule
 
         # Check keyword arguments in the rule. If the 'srcs' argument contains the script file name,
-        # then the script should be ignored.
+        # then the script should be ignored. A rule such as a hand-written py_library may list
+        # several scripts.
         func_call = node.body[0].value
 
         for keyword in func_call.keywords:
             if keyword.arg == 'srcs':
                 elements = keyword.value.elts
 
-                assert len(elements) == 1, \
-                    "Multiple source files not supported in %s." % ignored_rule
-
-                if elements[0].s == script_file_name:
+                if any(getattr(element, 's', None) == script_file_name for element in elements):
                     ignored = True
                     break
 
@@ -111,6 +117,31 @@ def is_python_file(path):
     return valid
 
 
+def intern_string(string):
+    """Return the canonical copy of a string such as a module name or a label.
+
+    Module names and labels recur in the imports of many scripts. Interning the copies that are
+    kept for the whole run stores each distinct string only once.
+
+    Args:
+        string (str): String to intern. None is returned as is.
+
+    Returns:
+        string (str): An equal string shared by all callers. On Python 2, unicode strings, e.g.
+            from json.load, are interned as str if they are ASCII and returned as is otherwise.
+    """
+    if string is None:
+        return None
+
+    if not isinstance(string, str):     # Python 2 unicode.
+        try:
+            string = str(string)
+        except UnicodeEncodeError:
+            return string
+
+    return _intern(string)
+
+
 def _is_in_stdlib(module, some_object):
     """Check if a given module is part of the Python standard library."""
     # Clear PYTHONPATH temporarily and try importing the given module.
@@ -135,8 +166,9 @@ def _is_in_stdlib(module, some_object):
         in_stdlib = True
     except (ImportError, AttributeError):
         pass
-
-    sys.path = original_sys_path
+    finally:
+        # Restore the path also if the import is interrupted, e.g. by a time budget.
+        sys.path = original_sys_path
 
     return in_stdlib
 
@@ -193,21 +225,24 @@ def parse_enclosed_expression(source, start, opening_token):
     else:
         raise NotImplementedError("No closing token defined for %s." % opening_token)
 
-    start2 = source.find(opening_token, start)
-    assert start2 > start, "Could not locate the opening token %s." % opening_token
+    # Tokenize the source so that brackets inside string literals and comments are skipped.
     open_tokens = 0
     end = None
 
-    for end_idx, char in enumerate(source[start2:], start2):
-        if char == opening_token:
+    for token in tokenize(source, start):
+        if token.kind != OP:
+            continue
+
+        if token.value == opening_token:
             open_tokens += 1
-        elif char == closing_token:
+        elif token.value == closing_token and open_tokens > 0:
             open_tokens -= 1
 
-        if open_tokens == 0:
-            end = end_idx + 1
-            break
+            if open_tokens == 0:
+                end = token.end
+                break
 
+    assert open_tokens > 0 or end, "Could not locate the opening token %s." % opening_token
     assert end, "Could not locate the closing token %s." % closing_token
 
     expression = source[start:end]
@@ -0,0 +1,72 @@
+"""Count calls to user-extensible hooks and measure the time spent in them."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+
+class HookStats(object):
+    """Call counts and cumulative time of hooks such as BazelRule.applies_to."""
+
+    def __init__(self):
+        """Instantiate with empty statistics."""
+        self._calls = dict()
+        self._skipped = dict()
+        self._seconds = dict()
+
+    def call(self, hook_name, function, *args):
+        """Call a hook and record the call and the time spent in it.
+
+        Args:
+            hook_name (str): Name of the hook, e.g. 'PyTestRule.applies_to'.
+            function (callable): The hook.
+            *args: Arguments passed to the hook.
+
+        Returns:
+            result: The return value of the hook.
+        """
+        start = time.time()
+
+        try:
+            return function(*args)
+        finally:
+            self._calls[hook_name] = self._calls.get(hook_name, 0) + 1
+            self._seconds[hook_name] = self._seconds.get(hook_name, 0.0) + time.time() - start
+
+    def skip(self, hook_name):
+        """Record that a prefilter made calling a hook unnecessary."""
+        self._skipped[hook_name] = self._skipped.get(hook_name, 0) + 1
+
+    def get(self, hook_name):
+        """Return a tuple (calls, skipped calls, seconds) for a hook."""
+        return (self._calls.get(hook_name, 0), self._skipped.get(hook_name, 0),
+                self._seconds.get(hook_name, 0.0))
+
+    def reset(self):
+        """Clear all statistics."""
+        self._calls.clear()
+        self._skipped.clear()
+        self._seconds.clear()
+
+    def report(self):
+        """Format the statistics as a table sorted by the time spent in each hook.
+
+        Returns:
+            report (str): One line per hook with its calls, skipped calls, and time in seconds.
+        """
+        hook_names = set(self._calls) | set(self._skipped)
+        hook_names = sorted(hook_names, key=lambda name: (-self._seconds.get(name, 0.0), name))
+
+        lines = ['%-50s %10s %10s %10s' % ('Hook', 'Calls', 'Skipped', 'Time (s)')]
+
+        for hook_name in hook_names:
+            calls, skipped, seconds = self.get(hook_name)
+            lines.append('%-50s %10d %10d %10.3f' % (hook_name, calls, skipped, seconds))
+
+        return '\n'.join(lines)
+
+
+# Statistics of all hooks called in this process.
+HOOK_STATS = HookStats()
@@ -0,0 +1,226 @@
+"""Find import cycles, which Bazel rejects as dependency cycles, in the import graph."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+class ImportCycle(object):
+    """Modules that import each other directly or indirectly."""
+
+    def __init__(self, node_ids, edges_to_break):
+        """Instantiate.
+
+        Args:
+            node_ids (list of int): IDs of the modules of a strongly connected component.
+            edges_to_break (list of tuple): (source ID, target ID) edges whose removal makes the
+                modules acyclic.
+        """
+        self.node_ids = node_ids
+        self.edges_to_break = edges_to_break
+
+
+def find_strongly_connected_components(graph):
+    """Find the strongly connected components of a graph in linear time (Tarjan's algorithm).
+
+    The algorithm is iterative so that long import chains do not exceed the recursion limit.
+
+    Args:
+        graph (ImportGraph): Import graph.
+
+    Returns:
+        components (list of list of int): Node IDs of each component, in reverse topological order.
+    """
+    num_nodes = graph.num_nodes
+    index = [-1] * num_nodes
+    low_link = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    stack = []
+    components = []
+    next_index = 0
+
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+
+        # Each frame is (node ID, position of the next successor to visit).
+        frames = [(root, 0)]
+        index[root] = low_link[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while frames:
+            node_id, position = frames[-1]
+            successors = graph.successors(node_id)
+
+            if position < len(successors):
+                frames[-1] = (node_id, position + 1)
+                successor = successors[position]
+
+                if index[successor] == -1:
+                    index[successor] = low_link[successor] = next_index
+                    next_index += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    frames.append((successor, 0))
+                elif on_stack[successor]:
+                    low_link[node_id] = min(low_link[node_id], index[successor])
+
+                continue
+
+            frames.pop()
+
+            if frames:
+                parent = frames[-1][0]
+                low_link[parent] = min(low_link[parent], low_link[node_id])
+
+            if low_link[node_id] == index[node_id]:
+                component = []
+
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+
+                    if member == node_id:
+                        break
+
+                components.append(sorted(component))
+
+    return components
+
+
+def _is_reachable(graph, members, removed_edges, source, target):
+    """Check if target is reachable from source inside a component without the removed edges."""
+    visited = set([source])
+    pending = [source]
+
+    while pending:
+        node_id = pending.pop()
+
+        for successor in graph.successors(node_id):
+            if successor == target and (node_id, successor) not in removed_edges:
+                return True
+
+            if successor in members and successor not in visited and \
+                    (node_id, successor) not in removed_edges:
+                visited.add(successor)
+                pending.append(successor)
+
+    return False
+
+
+def find_edges_to_break(graph, component):
+    """Find a small set of edges whose removal makes a strongly connected component acyclic.
+
+    Finding the smallest such set is NP-hard. The modules are first ordered greedily so that few
+    edges point backwards (the heuristic of Eades, Lin, and Smyth) and the backward edges are
+    removed. Then each removed edge is restored if it does not close a cycle, so the result is
+    minimal: every remaining edge is needed.
+
+    Args:
+        graph (ImportGraph): Import graph.
+        component (list of int): Node IDs of a strongly connected component.
+
+    Returns:
+        edges (list of tuple): Sorted (source ID, target ID) edges to remove.
+    """
+    members = set(component)
+    out_edges = dict((node_id, set(s for s in graph.successors(node_id) if s in members))
+                     for node_id in component)
+    in_edges = dict((node_id, set()) for node_id in component)
+
+    for node_id in component:
+        for successor in out_edges[node_id]:
+            in_edges[successor].add(node_id)
+
+    # Order the modules: sinks go last, sources first, otherwise the module with the largest
+    # difference between outgoing and incoming edges goes first.
+    remaining = set(component)
+    head, tail = [], []
+
+    while remaining:
+        changed = True
+
+        while changed:
+            changed = False
+
+            for node_id in sorted(remaining):
+                if not out_edges[node_id] & remaining:
+                    tail.append(node_id)
+                elif not in_edges[node_id] & remaining:
+                    head.append(node_id)
+                else:
+                    continue
+
+                remaining.discard(node_id)
+                changed = True
+
+        if remaining:
+            node_id = max(sorted(remaining), key=lambda n: len(out_edges[n] & remaining) -
+                          len(in_edges[n] & remaining))
+            head.append(node_id)
+            remaining.discard(node_id)
+
+    position = dict((node_id, i) for i, node_id in enumerate(head + tail[::-1]))
+    removed_edges = set((node_id, successor) for node_id in component
+                        for successor in out_edges[node_id]
+                        if position[successor] <= position[node_id])
+
+    # Restore the edges that do not close a cycle.
+    for edge in sorted(removed_edges):
+        removed_edges.discard(edge)
+
+        if _is_reachable(graph, members, removed_edges, edge[1], edge[0]):
+            removed_edges.add(edge)
+
+    return sorted(removed_edges)
+
+
+def find_import_cycles(graph):
+    """Find all import cycles of the local modules in a graph.
+
+    Args:
+        graph (ImportGraph): Import graph.
+
+    Returns:
+        cycles (list of ImportCycle): One entry per group of modules that import each other,
+            including modules that import themselves.
+    """
+    cycles = []
+
+    for component in find_strongly_connected_components(graph):
+        if len(component) == 1 and component[0] not in graph.successors(component[0]):
+            continue
+
+        cycles.append(ImportCycle(component, find_edges_to_break(graph, component)))
+
+    # Report the cycles in a stable order.
+    return sorted(cycles, key=lambda cycle: [graph.get_name(n) for n in cycle.node_ids])
+
+
+def format_import_cycles(graph, cycles):
+    """Format a human-readable report of import cycles.
+
+    Args:
+        graph (ImportGraph): Import graph.
+        cycles (list of ImportCycle): Cycles returned by find_import_cycles.
+
+    Returns:
+        report (str): One paragraph per cycle listing the modules and the imports to remove.
+    """
+    if not cycles:
+        return 'No import cycles found.'
+
+    paragraphs = ['Found %d import cycle(s).' % len(cycles)]
+
+    for i, cycle in enumerate(cycles):
+        names = sorted(graph.get_name(node_id) for node_id in cycle.node_ids)
+        lines = ['Cycle %d: %s' % (i + 1, ', '.join(names)),
+                 '  Remove %d import(s) to break it:' % len(cycle.edges_to_break)]
+        lines += ['    %s -> %s' % (graph.get_name(source), graph.get_name(target))
+                  for source, target in cycle.edges_to_break]
+        paragraphs.append('\n'.join(lines))
+
+    return '\n\n'.join(paragraphs)
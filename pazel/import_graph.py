@@ -0,0 +1,393 @@
+"""Build and export the import graph of a whole Python project."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from array import array
+import json
+import os
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+
+from pazel.generate_rule import parse_script
+from pazel.helpers import get_build_file_path
+from pazel.helpers import intern_string
+from pazel.helpers import is_ignored
+from pazel.helpers import is_python_file
+from pazel.module_trie import refresh_module_tries
+from pazel.parse_build import get_ignored_rules
+from pazel.pazel_extensions import parse_pazel_extensions
+
+# Node kinds. Local modules are Python files in the project, external packages are installed with
+# pip, and local packages are mapped to Bazel dependencies in .pazelrc.
+MODULE = 0
+EXTERNAL_PACKAGE = 1
+LOCAL_PACKAGE = 2
+
+KIND_NAMES = ['module', 'external_package', 'local_package']
+
+GRAPH_FORMATS = ['json', 'dot', 'graphml']
+
+
+def get_module_name(script_path, project_root):
+    """Get the dotted module name of a script relative to the project root, e.g. 'foo.bar1'."""
+    relative_path = os.path.relpath(os.path.abspath(script_path), os.path.abspath(project_root))
+
+    return os.path.splitext(relative_path)[0].replace(os.sep, '.')
+
+
+class ImportGraph(object):
+    """A directed graph of imports with interned integer node IDs.
+
+    Nodes are identified by their kind and name, e.g. (MODULE, 'foo.bar1'), and numbered
+    consecutively from 0 in the order they are added. Edges are collected in two flat integer arrays
+    and compressed to sorted adjacency arrays without duplicates (compressed sparse rows) when they
+    are first queried. Node attributes are stored in parallel arrays.
+    """
+
+    def __init__(self):
+        """Instantiate an empty graph."""
+        self._ids = dict()
+        self._names = []
+        self._kinds = bytearray()
+        self._sizes = array('l')
+        self._rules = []
+
+        # Edges added since the last compression.
+        self._edge_sources = array('l')
+        self._edge_targets = array('l')
+
+        # Compressed adjacency: the successors of node i are _targets[_offsets[i]:_offsets[i + 1]].
+        self._offsets = array('l', [0])
+        self._targets = array('l')
+
+        # Compressed reverse adjacency, built on demand.
+        self._reverse_offsets = None
+        self._reverse_targets = None
+
+    @property
+    def num_nodes(self):
+        """Number of nodes."""
+        return len(self._names)
+
+    @property
+    def num_edges(self):
+        """Number of distinct edges."""
+        self._compress()
+        return len(self._targets)
+
+    def add_node(self, name, kind=MODULE):
+        """Add a node unless it already exists.
+
+        Args:
+            name (str): Dotted module name, pip name, or Bazel label of a local package.
+            kind (int): MODULE, EXTERNAL_PACKAGE, or LOCAL_PACKAGE.
+
+        Returns:
+            node_id (int): ID of the node.
+        """
+        key = (kind, name)
+        node_id = self._ids.get(key)
+
+        if node_id is None:
+            name = intern_string(name)
+            key = (kind, name)
+            node_id = len(self._names)
+            self._ids[key] = node_id
+            self._names.append(name)
+            self._kinds.append(kind)
+            self._sizes.append(0)
+            self._rules.append(None)
+
+        return node_id
+
+    def get_id(self, name, kind=MODULE):
+        """Return the ID of a node, or None if the graph does not contain it."""
+        return self._ids.get((kind, name))
+
+    def set_script(self, node_id, rule, size):
+        """Record the rule type (e.g. 'py_library') and the size in bytes of a module's script."""
+        self._rules[node_id] = rule
+        self._sizes[node_id] = size
+
+    def add_edge(self, source, target):
+        """Add an edge from the node importing to the node being imported."""
+        self._edge_sources.append(source)
+        self._edge_targets.append(target)
+
+    def get_name(self, node_id):
+        """Return the name of a node."""
+        return self._names[node_id]
+
+    def get_kind(self, node_id):
+        """Return the kind of a node."""
+        return self._kinds[node_id]
+
+    def get_size(self, node_id):
+        """Return the size of a module's script in bytes, or 0 if it is not known."""
+        return self._sizes[node_id]
+
+    def get_rule(self, node_id):
+        """Return the rule type of a module's script, or None if it is not known."""
+        return self._rules[node_id]
+
+    def successors(self, node_id):
+        """Return the IDs of the nodes a node imports, sorted by ID."""
+        self._compress()
+        return self._targets[self._offsets[node_id]:self._offsets[node_id + 1]]
+
+    def predecessors(self, node_id):
+        """Return the IDs of the nodes that import a node, sorted by ID."""
+        self._compress()
+
+        if self._reverse_offsets is None:
+            self._reverse_offsets, self._reverse_targets = _build_rows(
+                self.num_nodes, self._targets, _expand_sources(self._offsets))
+
+        return self._reverse_targets[self._reverse_offsets[node_id]:
+                                     self._reverse_offsets[node_id + 1]]
+
+    def edges(self):
+        """Yield all edges as (source ID, target ID) tuples, sorted."""
+        self._compress()
+
+        for source in range(self.num_nodes):
+            for target in self._targets[self._offsets[source]:self._offsets[source + 1]]:
+                yield source, target
+
+    def _compress(self):
+        """Merge the edges added since the last call into the compressed adjacency arrays."""
+        if not self._edge_sources and len(self._offsets) == self.num_nodes + 1:
+            return
+
+        sources = _expand_sources(self._offsets)
+        sources.extend(self._edge_sources)
+        targets = self._targets
+        targets.extend(self._edge_targets)
+
+        self._offsets, self._targets = _build_rows(self.num_nodes, sources, targets)
+        self._edge_sources = array('l')
+        self._edge_targets = array('l')
+        self._reverse_offsets = None
+        self._reverse_targets = None
+
+
+def _expand_sources(offsets):
+    """Expand compressed row offsets back to the source node of each edge."""
+    sources = array('l')
+
+    for node_id in range(len(offsets) - 1):
+        sources.extend([node_id] * (offsets[node_id + 1] - offsets[node_id]))
+
+    return sources
+
+
+def _build_rows(num_nodes, sources, targets):
+    """Build compressed adjacency rows from edge lists by counting sort, dropping duplicates."""
+    offsets = array('l', [0]) * (num_nodes + 1)
+
+    for source in sources:
+        offsets[source + 1] += 1
+
+    for node_id in range(num_nodes):
+        offsets[node_id + 1] += offsets[node_id]
+
+    positions = array('l', offsets)
+    rows = array('l', [0]) * len(sources)
+
+    for source, target in zip(sources, targets):
+        rows[positions[source]] = target
+        positions[source] += 1
+
+    # Sort each row and drop duplicate edges.
+    compressed_offsets = array('l', [0]) * (num_nodes + 1)
+    compressed_rows = array('l')
+
+    for node_id in range(num_nodes):
+        row = sorted(set(rows[offsets[node_id]:offsets[node_id + 1]]))
+        compressed_rows.extend(row)
+        compressed_offsets[node_id + 1] = len(compressed_rows)
+
+    return compressed_offsets, compressed_rows
+
+
+def add_script_to_graph(graph, script_path, project_root, rule, package_names, module_names,
+                        import_name_to_pip_name, local_import_name_to_dep):
+    """Add a parsed script and its imports to the graph.
+
+    Args:
+        graph (ImportGraph): Graph to which the script is added.
+        script_path (str): Path to the script.
+        project_root (str): Imports in the script are relative to this path.
+        rule (str): Name of the Bazel rule generated for the script, e.g. 'py_library'.
+        package_names (set of str): Imported package names.
+        module_names (set of str): Imported module names.
+        import_name_to_pip_name (dict): Mapping from Python package import name to its pip name.
+        local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+            dependency.
+
+    Returns:
+        node_id (int): ID of the script's node.
+    """
+    node_id = graph.add_node(get_module_name(script_path, project_root))
+    graph.set_script(node_id, rule, os.path.getsize(script_path))
+
+    for module_name in module_names:
+        graph.add_edge(node_id, graph.add_node(module_name))
+
+    # Like in the generated rules, a submodule of a package depends on the whole package.
+    for package_name in set(p.split('.')[0] for p in package_names):
+        if package_name in local_import_name_to_dep:
+            target = graph.add_node(local_import_name_to_dep[package_name], LOCAL_PACKAGE)
+        else:
+            target = graph.add_node(import_name_to_pip_name.get(package_name, package_name),
+                                    EXTERNAL_PACKAGE)
+
+        graph.add_edge(node_id, target)
+
+    return node_id
+
+
+def iterate_scripts(input_path):
+    """Yield the Python scripts under input_path for which pazel generates rules, in order.
+
+    Args:
+        input_path (str): Path to a Python file or to a directory containing Python files.
+
+    Yields:
+        script_path (str): Path to a Python script that is not covered by an ignored rule.
+    """
+    if os.path.isdir(input_path):
+        for dirpath, dirnames, filenames in os.walk(input_path):
+            dirnames.sort()
+            ignored_rules = get_ignored_rules(get_build_file_path(dirpath))
+
+            for filename in sorted(filenames):
+                script_path = os.path.join(dirpath, filename)
+
+                if is_python_file(script_path) and not is_ignored(script_path, ignored_rules):
+                    yield script_path
+    elif is_python_file(input_path):
+        build_file_path = os.path.join(os.path.dirname(input_path), 'BUILD')
+
+        if not is_ignored(input_path, get_ignored_rules(build_file_path)):
+            yield input_path
+    else:
+        raise RuntimeError("Invalid input path %s." % input_path)
+
+
+def build_import_graph(input_path, project_root, contains_pre_installed_packages, pazelrc_path,
+                       import_scan_budget=None):
+    """Build the import graph of the Python scripts under input_path without writing BUILD files.
+
+    Args:
+        input_path (str): Path to a Python file or to a directory containing Python files.
+        project_root (str): Imports in the Python files are relative to this path.
+        contains_pre_installed_packages (bool): Whether the environment is allowed to contain
+            pre-installed packages or whether only the Python standard library is available.
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+        import_scan_budget (int): If given, imports are scanned from the import preamble of each
+            script. See get_imports.
+
+    Returns:
+        graph (ImportGraph): Graph of the scripts and the modules and packages they import.
+    """
+    _, custom_bazel_rules, custom_import_inference_rules, import_name_to_pip_name, \
+        local_import_name_to_dep, _ = parse_pazel_extensions(pazelrc_path)
+
+    graph = ImportGraph()
+    refresh_module_tries()
+
+    for script_path in iterate_scripts(input_path):
+        parsed_script = parse_script(script_path, project_root, contains_pre_installed_packages,
+                                     custom_bazel_rules, custom_import_inference_rules,
+                                     import_scan_budget)
+
+        add_script_to_graph(graph, script_path, project_root,
+                            _get_rule_name(parsed_script.bazel_rule_type),
+                            parsed_script.package_names, parsed_script.module_names,
+                            import_name_to_pip_name, local_import_name_to_dep)
+
+    return graph
+
+
+def _get_rule_name(bazel_rule_type):
+    """Get the rule name such as 'py_test' from the template of a BazelRule class."""
+    return bazel_rule_type.template.strip().split('(')[0]
+
+
+def _get_node_attributes(graph, node_id):
+    """Get the exported attributes of a node."""
+    attributes = [('name', graph.get_name(node_id)), ('kind', KIND_NAMES[graph.get_kind(node_id)])]
+
+    if graph.get_rule(node_id) is not None:
+        attributes += [('rule', graph.get_rule(node_id)), ('size', graph.get_size(node_id))]
+
+    return attributes
+
+
+def write_json(graph, output):
+    """Write the graph as JSON with a list of nodes and a list of [source, target] edges."""
+    output.write('{"nodes": [')
+
+    for node_id in range(graph.num_nodes):
+        node = dict([('id', node_id)] + _get_node_attributes(graph, node_id))
+        output.write((',\n' if node_id else '\n') + json.dumps(node, sort_keys=True))
+
+    output.write('\n], "edges": [')
+
+    for i, edge in enumerate(graph.edges()):
+        output.write((',\n' if i else '\n') + json.dumps(list(edge)))
+
+    output.write('\n]}\n')
+
+
+def write_dot(graph, output):
+    """Write the graph in the DOT language of Graphviz."""
+    output.write('digraph imports {\n')
+
+    for node_id in range(graph.num_nodes):
+        attributes = ', '.join('%s=%s' % (key, json.dumps(value))
+                               for key, value in _get_node_attributes(graph, node_id))
+        output.write('  n%d [%s];\n' % (node_id, attributes.replace('name=', 'label=', 1)))
+
+    for source, target in graph.edges():
+        output.write('  n%d -> n%d;\n' % (source, target))
+
+    output.write('}\n')
+
+
+def write_graphml(graph, output):
+    """Write the graph in the GraphML format."""
+    output.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                 '  <key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+                 '  <key id="kind" for="node" attr.name="kind" attr.type="string"/>\n'
+                 '  <key id="rule" for="node" attr.name="rule" attr.type="string"/>\n'
+                 '  <key id="size" for="node" attr.name="size" attr.type="long"/>\n'
+                 '  <graph id="imports" edgedefault="directed">\n')
+
+    for node_id in range(graph.num_nodes):
+        output.write('    <node id="n%d">\n' % node_id)
+
+        for key, value in _get_node_attributes(graph, node_id):
+            output.write('      <data key=%s>%s</data>\n' % (quoteattr(key), escape(str(value))))
+
+        output.write('    </node>\n')
+
+    for source, target in graph.edges():
+        output.write('    <edge source="n%d" target="n%d"/>\n' % (source, target))
+
+    output.write('  </graph>\n</graphml>\n')
+
+
+def write_graph(graph, output, graph_format):
+    """Write the graph in one of GRAPH_FORMATS."""
+    writers = {'json': write_json, 'dot': write_dot, 'graphml': write_graphml}
+
+    if graph_format not in writers:
+        raise ValueError("Unknown graph format %s. Use one of %s." %
+                         (graph_format, ', '.join(GRAPH_FORMATS)))
+
+    writers[graph_format](graph, output)
@@ -11,6 +11,11 @@ class ImportInferenceRule(object):
     Custom classes define how a Python import is mapped to Bazel dependencies.
     """
 
+    # Optional prefilters that pazel checks before calling holds. If a prefilter is not None, then
+    # holds is called only for imports that match at least one of its entries.
+    base_prefixes = None    # Packages or modules, e.g. ['foo'] matches 'foo' and 'foo.bar'.
+    unknown_names = None    # Imported objects, e.g. ['*'] for "from X import *" imports.
+
     @staticmethod
     def holds(project_root, base, unknown):
         """If this import inference rule holds, then return imported packages and/or modules.
@@ -27,3 +32,28 @@ class ImportInferenceRule(object):
                 if the rule does not match the import.
         """
         raise NotImplementedError()
+
+
+def passes_prefilters(inference_rule, base, unknown):
+    """Check the cheap prefilters of an import inference rule before calling its holds.
+
+    Args:
+        inference_rule (ImportInferenceRule class): A registered import inference rule.
+        base (str): Name of a package or a module.
+        unknown (str): Can package, module, function or any other object.
+
+    Returns:
+        passes (bool): False if the rule certainly does not hold for the import.
+    """
+    base_prefixes = getattr(inference_rule, 'base_prefixes', None)
+
+    if base_prefixes is not None and not any(base == prefix or base.startswith(prefix + '.')
+                                             for prefix in base_prefixes):
+        return False
+
+    unknown_names = getattr(inference_rule, 'unknown_names', None)
+
+    if unknown_names is not None and unknown not in unknown_names:
+        return False
+
+    return True
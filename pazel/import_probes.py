@@ -0,0 +1,294 @@
+"""Answer and memoize whether imported modules are installed in the target environment."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from pazel.distribution_index import get_environment_fingerprint
+from pazel.distribution_index import get_search_paths
+from pazel.helpers import intern_string
+from pazel.helpers import is_installed
+from pazel.probe_worker import get_identity
+
+PROBE_CACHE_VERSION = 1
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'probe_worker.py')
+
+
+class ProbeWorker(object):
+    """A long-lived subprocess that answers probes in another Python interpreter."""
+
+    def __init__(self, python):
+        """Start the worker.
+
+        Args:
+            python (str): Path to the Python interpreter of the target environment.
+
+        Raises:
+            RuntimeError: If the worker cannot be started.
+        """
+        self.python = python
+        self._num_unread = 0    # Batches whose answers were not read, e.g. due to a time budget.
+
+        try:
+            self._process = subprocess.Popen([python, WORKER_PATH], stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE, universal_newlines=True)
+        except OSError as error:
+            raise RuntimeError("Cannot start Python interpreter %s: %s." % (python, error))
+
+        # The worker first describes its interpreter.
+        self.identity = self._read_line()
+
+    def _read_line(self):
+        """Read and decode the next line written by the worker."""
+        line = self._process.stdout.readline()
+
+        if not line:
+            self.close()
+            raise RuntimeError("Python interpreter %s stopped answering probes." % self.python)
+
+        return json.loads(line)
+
+    def probe(self, probes):
+        """Check whether modules are installed in the target environment.
+
+        Args:
+            probes (list of tuple): List of (module, some object, contains_pre_installed_packages)
+                tuples.
+
+        Returns:
+            answers (list of bool): Whether each module is installed, in the order of probes.
+        """
+        while self._num_unread:
+            self._read_line()
+            self._num_unread -= 1
+
+        self._process.stdin.write(json.dumps(probes) + '\n')
+        self._process.stdin.flush()
+        self._num_unread += 1
+
+        answers = self._read_line()
+        self._num_unread -= 1
+
+        return answers
+
+    def close(self):
+        """Stop the worker."""
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+
+        self._process.stdout.close()
+
+
+class ImportProbes(object):
+    """Whether modules are installed, memoized for the run.
+
+    By default, the modules are probed by importing them into pazel's own interpreter. After
+    start_worker(), they are probed in batches by a worker running in another interpreter. After
+    load_cache(), the answers are also persisted across runs.
+
+    If low_memory is set, the top-level package of each import is probed first. Importing a module
+    imports its top-level package, so the imports of a package that is not installed, such as the
+    local packages of the project, are answered without memoizing an answer for each of them.
+    """
+
+    def __init__(self):
+        """Instantiate without a worker."""
+        self.low_memory = False
+        self._answers = dict()
+        self._worker = None
+        self._cache_path = None
+        self._fingerprint = None
+        self._modified = False
+
+    def start_worker(self, python):
+        """Probe modules in the given Python interpreter from now on."""
+        self.stop_worker()
+        self._worker = ProbeWorker(python)
+        self._reset()
+
+    def stop_worker(self):
+        """Stop the worker, if any, and probe modules in pazel's own interpreter from now on."""
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+            self._reset()
+
+    def _reset(self):
+        """Forget all answers, which are valid only for the interpreter that gave them."""
+        self._answers = dict()
+        self._cache_path = None
+        self._fingerprint = None
+        self._modified = False
+
+    def load_cache(self, cache_dir):
+        """Load the answers of earlier runs and persist new answers to the cache with save_cache().
+
+        The cache is specific to the interpreter (its version, prefix, executable, and import
+        path). Its answers are used only if no directory on the import path has been modified
+        since they were saved, i.e. no packages have been installed or removed.
+
+        Args:
+            cache_dir (str): Directory in which the cache files are stored.
+        """
+        identity = self._worker.identity if self._worker is not None else get_identity()
+        environment = json.dumps([identity['version'], identity['prefix'], identity['executable'],
+                                  identity['path']])
+        environment_key = hashlib.md5(environment.encode('utf-8')).hexdigest()
+
+        self._cache_path = os.path.join(cache_dir, 'probes-%s.json' % environment_key)
+        self._fingerprint = get_environment_fingerprint(identity['path'])
+
+        try:
+            with open(self._cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return
+
+        if cached.get('version') != PROBE_CACHE_VERSION or \
+                cached.get('fingerprint') != self._fingerprint:
+            return
+
+        for module, some_object, contains_pre_installed_packages, answer in cached['answers']:
+            probe = (intern_string(module), intern_string(some_object),
+                     contains_pre_installed_packages)
+            self._answers.setdefault(probe, answer)
+
+    def save_cache(self):
+        """Persist the answers to the cache loaded by load_cache(), if there are new answers."""
+        if self._cache_path is None or not self._modified:
+            return
+
+        answers = sorted([list(probe) + [answer] for probe, answer in self._answers.items()
+                          if answer is not None], key=str)
+        cache_dir = os.path.dirname(self._cache_path)
+
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+
+            # Write atomically so that concurrent runs never read a partially written cache.
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+
+            with os.fdopen(file_descriptor, 'w') as cache_file:
+                json.dump({'version': PROBE_CACHE_VERSION, 'fingerprint': self._fingerprint,
+                           'answers': answers}, cache_file, separators=(',', ':'))
+
+            getattr(os, 'replace', os.rename)(temporary_path, self._cache_path)
+        except (IOError, OSError):
+            return  # The cache is only an optimization.
+
+        self._modified = False
+
+    def _is_missing_package(self, module, contains_pre_installed_packages):
+        """Check if the top-level package of a module is known not to be installed."""
+        if not module:
+            return False
+
+        package = module.split('.')[0]
+
+        return self._answers.get((package, None, contains_pre_installed_packages)) is False
+
+    def prefetch(self, imports, contains_pre_installed_packages):
+        """Probe all given imports that have not been probed yet in a single batch.
+
+        Args:
+            imports (list of tuple): List of (package/module, some object) tuples.
+            contains_pre_installed_packages (bool): Whether the environment contains external
+                packages.
+        """
+        if self.low_memory:
+            packages = set((module.split('.')[0], None) for module, _ in imports if module)
+            self._probe(sorted(packages), contains_pre_installed_packages)
+
+            imports = [(module, some_object) for module, some_object in imports
+                       if not self._is_missing_package(module, contains_pre_installed_packages)]
+
+        self._probe(imports, contains_pre_installed_packages)
+
+    def _probe(self, imports, contains_pre_installed_packages):
+        """Probe the imports that have not been probed yet in a single batch."""
+        probes = []
+
+        for module, some_object in imports:
+            probe = (module, some_object, contains_pre_installed_packages)
+
+            if probe not in self._answers:
+                probe = (intern_string(module), intern_string(some_object),
+                         contains_pre_installed_packages)
+                self._answers[probe] = None     # Reserve the slot to skip duplicates.
+                probes.append(probe)
+
+        if not probes:
+            return
+
+        try:
+            if self._worker is not None:
+                answers = self._worker.probe(probes)
+            else:
+                answers = [is_installed(*probe) for probe in probes]
+        except BaseException:
+            for probe in probes:
+                del self._answers[probe]
+            raise
+
+        self._answers.update(zip(probes, answers))
+        self._modified = True
+
+    def get_search_paths(self):
+        """Get the directories in which distributions are installed for the target interpreter.
+
+        Returns:
+            search_paths (list of str): Existing directories on the import path of the worker's
+                interpreter, or of pazel's own interpreter if there is no worker.
+        """
+        if self._worker is None:
+            return get_search_paths()
+
+        return [path for path in self._worker.identity['path'] if os.path.isdir(path)]
+
+    def get_environment_key(self):
+        """Identify the interpreter and its installed packages, or None before load_cache()."""
+        if self._cache_path is None:
+            return None
+
+        return '%s:%s' % (os.path.basename(self._cache_path), self._fingerprint)
+
+    def get_num_answers(self):
+        """Return the number of memoized answers."""
+        return len(self._answers)
+
+    def is_installed(self, module, some_object=None, contains_pre_installed_packages=False):
+        """Check if a given module is installed and whether some_object is found in it.
+
+        Args:
+            module (str): Name of a module.
+            some_object (str): Name of some object in the module. Can be None.
+            contains_pre_installed_packages (bool): Whether the environment contains external
+                packages.
+
+        Returns:
+            installed (bool): The module is installed in the target environment.
+        """
+        probe = (module, some_object, contains_pre_installed_packages)
+
+        if probe not in self._answers:
+            self.prefetch([(module, some_object)], contains_pre_installed_packages)
+
+            # Imports of packages that are not installed are not memoized in low-memory mode.
+            if self.low_memory and self._is_missing_package(module,
+                                                            contains_pre_installed_packages):
+                return False
+
+        return self._answers[probe]
+
+
+# Probes shared by all modules of a run.
+PROBES = ImportProbes()
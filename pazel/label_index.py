@@ -0,0 +1,197 @@
+"""Index the labels of the existing rules that own the Python files of a project."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import tempfile
+
+from pazel.helpers import intern_string
+from pazel.parse_build import read_build_file
+
+LABEL_INDEX_VERSION = 1
+
+
+def index_build_file(build_file_path):
+    """Find the Python files owned by the ignored rules of a BUILD file.
+
+    Only rules tagged with '# pazel-ignore' are indexed because pazel replaces the other rules.
+
+    Args:
+        build_file_path (str): Path to a BUILD file.
+
+    Returns:
+        owners (dict): Mapping from the path of a Python file relative to the directory of the
+            BUILD file to a list of (rule name, rule kind) tuples of the rules listing it.
+    """
+    build_file = read_build_file(build_file_path)
+    owners = dict()
+
+    if build_file is None:
+        return owners
+
+    for rule in build_file.rules:
+        name_argument = rule.kwargs.get('name')
+
+        if not rule.ignored or name_argument is None or not isinstance(name_argument.value, str):
+            continue
+
+        for src in rule.get_srcs():
+            # Labels such as ':generated' or '//foo:bar.py' do not name files of this package.
+            if src.endswith('.py') and ':' not in src:
+                owners.setdefault(os.path.normpath(src), []).append([name_argument.value,
+                                                                     rule.kind])
+
+    return owners
+
+
+def _get_owner(rules):
+    """Choose the owner of a file from the rules listing it, or None if it is ambiguous."""
+    names = set(name for name, _ in rules)
+
+    if len(names) > 1:
+        # Tests and binaries may list the library sources they use.
+        names = set(name for name, kind in rules if kind == 'py_library')
+
+    return names.pop() if len(names) == 1 else None
+
+
+class LabelIndex(object):
+    """Map module names to the labels of the existing rules that own their files.
+
+    Instances behave like a read-only dictionary from dotted module names to labels, like
+    AggregatedModuleLabels. All BUILD files of the project are scanned once, on the first lookup.
+    With a cache directory, BUILD files are parsed again only if they have changed since the
+    previous run.
+    """
+
+    def __init__(self, project_root, cache_dir=None, fallback=None):
+        """Instantiate.
+
+        Args:
+            project_root (str): Path to the root of the project. Labels are relative to it.
+            cache_dir (str): Directory in which the index is cached across runs. None disables
+                caching.
+            fallback (dict): Optional mapping consulted for modules that have no owner in the
+                index, e.g. AggregatedModuleLabels.
+        """
+        self.project_root = project_root
+        self.cache_dir = cache_dir
+        self.fallback = fallback
+        self._labels = None
+
+    def _get_cache_path(self):
+        """Get the path of the cache file of the project."""
+        project_key = hashlib.md5(os.path.abspath(self.project_root).encode('utf-8')).hexdigest()
+
+        return os.path.join(self.cache_dir, 'labels-%s.json' % project_key)
+
+    def _load_cache(self):
+        """Load the indexed BUILD files of the previous run, or an empty dict."""
+        try:
+            with open(self._get_cache_path(), 'r') as cache_file:
+                cached = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return dict()
+
+        if cached.get('version') != LABEL_INDEX_VERSION:
+            return dict()
+
+        return cached['build_files']
+
+    def _save_cache(self, build_files):
+        """Save the indexed BUILD files atomically."""
+        cache_path = self._get_cache_path()
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+
+            with os.fdopen(file_descriptor, 'w') as cache_file:
+                json.dump({'version': LABEL_INDEX_VERSION, 'build_files': build_files}, cache_file,
+                          separators=(',', ':'), sort_keys=True)
+
+            getattr(os, 'replace', os.rename)(temporary_path, cache_path)
+        except (IOError, OSError):
+            pass    # The cache is only an optimization.
+
+    def scan(self):
+        """Scan the BUILD files of the project and index the owners of the Python files."""
+        cached = self._load_cache() if self.cache_dir else dict()
+        build_files = dict()
+
+        for dirpath, dirnames, filenames in os.walk(self.project_root):
+            dirnames.sort()
+
+            if 'BUILD' not in filenames:
+                continue
+
+            build_file_path = os.path.join(dirpath, 'BUILD')
+            relative_path = os.path.relpath(build_file_path, self.project_root).replace(os.sep, '/')
+            stat = os.stat(build_file_path)
+            key = [stat.st_mtime, stat.st_size]
+
+            entry = cached.get(relative_path)
+
+            if entry is None or entry[0] != key:
+                entry = [key, index_build_file(build_file_path)]
+
+            build_files[relative_path] = entry
+
+        if self.cache_dir and build_files != cached:
+            self._save_cache(build_files)
+
+        self._labels = dict()
+
+        for relative_path, (_, owners) in build_files.items():
+            package = os.path.dirname(relative_path)
+
+            for src, rules in owners.items():
+                owner = _get_owner(rules)
+
+                if owner is None:
+                    continue
+
+                module_path = os.path.normpath(os.path.join(package, src))[:-len('.py')]
+                module_name = intern_string(module_path.replace(os.sep, '.').replace('/', '.'))
+                self._labels[module_name] = intern_string('//%s:%s' % (package, owner))
+
+    def get(self, module_name, default=None):
+        """Get the label of the rule that owns a module.
+
+        Modules are looked up strictly by their files, e.g. 'foo.bar' by 'foo/bar.py' and
+        'foo.__init__' by 'foo/__init__.py'. Packages imported as 'foo.foo', i.e. assumed to have
+        a rule //foo:foo, are owned by the rule of 'foo/__init__.py' if 'foo/foo.py' does not
+        exist.
+
+        Args:
+            module_name (str): Module name in dotted notation relative to the project root.
+            default (str): Value returned if no existing rule owns the module.
+
+        Returns:
+            label (str): Label of the owning rule, the label given by the fallback, or default.
+        """
+        if self._labels is None:
+            self.scan()
+
+        label = self._labels.get(module_name)
+        parts = module_name.split('.')
+
+        if label is None and len(parts) > 1 and parts[-1] == parts[-2] and \
+                not os.path.isfile(os.path.join(self.project_root, *parts) + '.py'):
+            label = self._labels.get('.'.join(parts[:-1] + ['__init__']))
+
+        if label is None and self.fallback is not None:
+            label = self.fallback.get(module_name)
+
+        return label if label is not None else default
+
+    def release(self):
+        """Forget the memoized labels of the fallback to bound memory use. The index is kept."""
+        if self.fallback is not None:
+            self.fallback.release()
@@ -0,0 +1,140 @@
+"""Resolve dotted import names against the modules and packages of the project tree."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+# Kinds of the prefixes found by ModuleTrie.find_longest_prefix.
+MODULE = 'module'
+PACKAGE = 'package'
+
+# Module tries of the project roots handled in this process.
+_module_tries = dict()
+
+
+class _TrieNode(object):
+    """A directory of the project with the names of its Python modules and subdirectories."""
+
+    __slots__ = ('mtime', 'generation', 'modules', 'subdirectories', 'contains_python_file')
+
+    def __init__(self, directory, generation):
+        """List a directory.
+
+        Args:
+            directory (str): Path to the directory.
+            generation (int): Generation of the trie in which the directory is listed.
+        """
+        self.mtime = os.stat(directory).st_mtime
+        self.generation = generation
+        self.modules = set()
+        self.subdirectories = dict()    # Name to _TrieNode, or None until visited.
+        self.contains_python_file = False
+
+        for name in os.listdir(directory):
+            if name.endswith('.py') or name.endswith('.pyc'):
+                self.contains_python_file = True
+
+            if name.endswith('.py'):
+                self.modules.add(name[:-len('.py')])
+            elif os.path.isdir(os.path.join(directory, name)):
+                self.subdirectories[name] = None
+
+
+class ModuleTrie(object):
+    """A trie of the modules and packages of a project, one level per directory.
+
+    Directories are listed when an import first reaches them, so resolving a dotted name takes a
+    single walk down the tree and each directory is listed only once. After refresh(), e.g. at the
+    start of a run, each directory is checked once more when an import reaches it and listed again
+    if its modification time has changed, i.e. if entries were added to it or removed from it.
+    """
+
+    def __init__(self, project_root):
+        """Instantiate.
+
+        Args:
+            project_root (str): Path to the root of the project. Imports are relative to it.
+        """
+        self.project_root = project_root
+        self._root = None
+        self._generation = 0
+
+    def refresh(self):
+        """Check each directory for changes once more when an import next reaches it."""
+        self._generation += 1
+
+    def _get_node(self, node, directory):
+        """Get the node of a directory, listing the directory if it has changed since."""
+        if node is not None and node.generation == self._generation:
+            return node
+
+        try:
+            if node is None or os.stat(directory).st_mtime != node.mtime:
+                return _TrieNode(directory, self._generation)
+        except OSError:
+            return None
+
+        node.generation = self._generation
+
+        return node
+
+    def find_longest_prefix(self, parts):
+        """Find the longest prefix of a dotted name that is a module or a package of the project.
+
+        At the same depth, a package takes precedence over a module of the same name. Directories
+        without Python files are walked through, e.g. for namespace packages, but do not match.
+
+        Args:
+            parts (list of str): Dotted name split at the dots, e.g. ['a', 'b', 'c'].
+
+        Returns:
+            depth (int): Number of parts in the longest prefix, or 0 if no prefix matches.
+            kind (str): MODULE or PACKAGE, or None if no prefix matches.
+        """
+        self._root = node = self._get_node(self._root, self.project_root)
+        directory = self.project_root
+        depth, kind = 0, None
+
+        for i, part in enumerate(parts):
+            if node is None:
+                break
+
+            is_module = part in node.modules
+            child = None
+
+            if part in node.subdirectories:
+                directory = os.path.join(directory, part)
+                child = node.subdirectories[part] = self._get_node(node.subdirectories[part],
+                                                                   directory)
+
+            if child is not None and child.contains_python_file:
+                depth, kind = i + 1, PACKAGE
+            elif is_module:
+                depth, kind = i + 1, MODULE
+
+            node = child
+
+        return depth, kind
+
+
+def get_module_trie(project_root):
+    """Get the module trie of a project, shared by all imports of the run."""
+    key = os.path.abspath(project_root)
+
+    if key not in _module_tries:
+        _module_tries[key] = ModuleTrie(project_root)
+
+    return _module_tries[key]
+
+
+def refresh_module_tries():
+    """Check the module tries for changes to the project trees, e.g. at the start of a run."""
+    for module_trie in _module_tries.values():
+        module_trie.refresh()
+
+
+def release_module_tries():
+    """Forget all module tries, e.g. to keep memory use flat. They are rebuilt when needed."""
+    _module_tries.clear()
@@ -4,7 +4,18 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import os
 import re
+import tempfile
+
+from pazel.starlark import parse_rules
+
+# Kinds of the rules that pazel generates in addition to the rules of custom BazelRule classes.
+NATIVE_RULE_KINDS = ['py_binary', 'py_library', 'py_test']
+
+# os.replace overwrites an existing file atomically also on Windows but it is missing in Python 2.
+_replace = getattr(os, 'replace', os.rename)
 
 
 def _append_newline(source):
@@ -12,8 +23,88 @@ def _append_newline(source):
     return source if source.endswith('\n') else source + '\n'
 
 
+class BuildFileWriter(object):
+    """Write BUILD files atomically.
+
+    Each BUILD file is first written to a temporary file in the same directory and then renamed over
+    the BUILD file so that readers never see a partially written BUILD file. BUILD files whose
+    content does not change are not rewritten. In all-or-nothing mode, the temporary files are kept
+    until commit() renames all of them, so an interrupted run leaves every BUILD file untouched.
+    """
+
+    def __init__(self, all_or_nothing=False):
+        """Instantiate.
+
+        Args:
+            all_or_nothing (bool): Stage all BUILD files until commit() instead of writing each of
+                them immediately.
+        """
+        self.all_or_nothing = all_or_nothing
+        self._staged = []   # List of (temporary path, BUILD file path) tuples.
+
+    def write(self, build_file_path, output):
+        """Write or stage the contents of a BUILD file.
+
+        Args:
+            build_file_path (str): Path to the BUILD file.
+            output (str): The full contents of the BUILD file.
+        """
+        try:
+            with open(build_file_path, 'r') as build_file:
+                if build_file.read() == output:
+                    return
+        except IOError:
+            pass
+
+        directory = os.path.dirname(os.path.abspath(build_file_path))
+        file_descriptor, temporary_path = tempfile.mkstemp(prefix='.BUILD.', suffix='.pazel-tmp',
+                                                           dir=directory)
+
+        try:
+            with os.fdopen(file_descriptor, 'w') as temporary_file:
+                temporary_file.write(output)
+
+            # Keep the permissions of an existing BUILD file. mkstemp creates files readable only
+            # by the owner.
+            try:
+                mode = os.stat(build_file_path).st_mode & 0o777
+            except OSError:
+                mode = 0o644
+
+            os.chmod(temporary_path, mode)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        self._staged.append((temporary_path, build_file_path))
+
+        if not self.all_or_nothing:
+            self.commit()
+
+    def commit(self):
+        """Move all staged BUILD files into place."""
+        while self._staged:
+            temporary_path, build_file_path = self._staged.pop(0)
+            _replace(temporary_path, build_file_path)
+
+    def rollback(self):
+        """Remove all staged BUILD files without touching the existing BUILD files."""
+        while self._staged:
+            temporary_path, _ = self._staged.pop()
+
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+    @property
+    def num_staged(self):
+        """Number of BUILD files waiting for commit()."""
+        return len(self._staged)
+
+
 def output_build_file(build_source, ignored_rules, output_extension, custom_bazel_rules,
-                      build_file_path, requirement_load):
+                      build_file_path, requirement_load, writer=None, incremental=False):
     """Output a BUILD file.
 
     Args:
@@ -23,6 +114,44 @@ def output_build_file(build_source, ignored_rules, output_extension, custom_baze
         custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
         build_file_path (str): Path to the BUILD file in which build_source is written.
         requirement_load (str): Statement for loading the 'requirement' rule.
+        writer (BuildFileWriter): Writer used for writing the BUILD file. If None, the file is
+            written atomically right away.
+        incremental (bool): Whether only the changed rules of an existing BUILD file are patched.
+            See patch_build_file. The whole file is formatted if it cannot be patched.
+    """
+    output = None
+
+    if incremental:
+        try:
+            with open(build_file_path, 'r') as build_file:
+                output = patch_build_file(build_file.read(), build_source, custom_bazel_rules,
+                                          requirement_load)
+        except IOError:
+            pass
+
+    if output is None:
+        output = format_build_file(build_source, ignored_rules, output_extension,
+                                   custom_bazel_rules, requirement_load)
+
+    if writer is None:
+        writer = BuildFileWriter()
+
+    writer.write(build_file_path, output)
+
+
+def format_build_file(build_source, ignored_rules, output_extension, custom_bazel_rules,
+                      requirement_load):
+    """Format the full contents of a BUILD file.
+
+    Args:
+        build_source (str): The generated rules of the BUILD file.
+        ignored_rules (list of str): Rules the user wants to keep as is.
+        output_extension (OutputExtension): User-defined header and footer.
+        custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+        requirement_load (str): Statement for loading the 'requirement' rule.
+
+    Returns:
+        output (str): The contents of the BUILD file.
     """
     header = ''
 
@@ -80,10 +209,130 @@ def output_build_file(build_source, ignored_rules, output_extension, custom_baze
     if output_extension.footer:
         output += 2*'\n' + _append_newline(output_extension.footer)
 
-    with open(build_file_path, 'w') as build_file:
-        output = _append_newline(output)
+    output = _append_newline(output)
+
+    # Remove possible duplicate newlines (the user may have added such accidentally).
+    output = re.sub('\n\n\n*', '\n\n', output)
+
+    return output
+
+
+def get_named_rules(rules):
+    """Map the names of rules to the rules, or return None if some names are missing or repeated."""
+    named_rules = collections.OrderedDict((rule.get_name(), rule) for rule in rules)
+
+    if None in named_rules or len(named_rules) != len(rules):
+        return None
+
+    return named_rules
+
+
+def get_generated_rules(rules, custom_bazel_rules):
+    """Select the rules of a BUILD file that pazel generates, i.e., replaces on every run.
+
+    Args:
+        rules (list of BuildRule): Rules of a parsed BUILD file.
+        custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+
+    Returns:
+        generated_rules (OrderedDict): Mapping from names to the rules of pazel-generated kinds
+            that are not ignored, in the order of the BUILD file. None if some names are missing or
+            repeated.
+    """
+    kinds = set(NATIVE_RULE_KINDS + [rule.rule_identifier for rule in custom_bazel_rules])
+
+    return get_named_rules([rule for rule in rules if rule.kind in kinds and not rule.ignored])
+
+
+def _has_load_statements(existing_rules, build_source, custom_bazel_rules, requirement_load):
+    """Check whether an existing BUILD file loads everything the generated rules use."""
+    loads = [rule.text for rule in existing_rules if rule.kind == 'load']
+
+    if 'requirement("' in build_source and \
+            not any(requirement_load.strip() == load or '"requirement"' in load for load in loads):
+        return False
+
+    return all(any(custom_rule.rule_identifier in load for load in loads)
+               for custom_rule in custom_bazel_rules
+               if custom_rule.rule_identifier in build_source and
+               custom_rule.get_load_statement() is not None)
+
+
+def patch_build_file(existing_source, build_source, custom_bazel_rules, requirement_load):
+    """Update only the generated rules of an existing BUILD file that have changed.
+
+    Rules are matched by name. A changed rule is replaced in place, a rule that is no longer
+    generated is removed, and a new rule is inserted after the rule that precedes it in the
+    generated rules. All other bytes, e.g. the order of the rules, comments, the header and the
+    footer, and ignored rules, are kept as is, so the diff and the targets Bazel has to reanalyze
+    are limited to the changed rules.
+
+    Args:
+        existing_source (str): Contents of the existing BUILD file.
+        build_source (str): The generated rules of the BUILD file.
+        custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+        requirement_load (str): Statement for loading the 'requirement' rule.
+
+    Returns:
+        output (str): The patched contents of the BUILD file, or None if the file cannot be patched,
+            e.g. because it does not load a rule the generated rules use or none of its rules is
+            generated anymore. It has to be formatted as a whole then.
+    """
+    try:
+        existing_rules = parse_rules(existing_source)
+        new_rules = get_named_rules(parse_rules(build_source))
+    except SyntaxError:
+        return None
+
+    old_rules = get_generated_rules(existing_rules, custom_bazel_rules)
+
+    if old_rules is None or new_rules is None or not set(old_rules) & set(new_rules) or \
+            not _has_load_statements(existing_rules, build_source, custom_bazel_rules,
+                                     requirement_load):
+        return None
+
+    # New rules follow the closest preceding rule that exists already, or precede the first one.
+    anchor = None
+    inserted = collections.defaultdict(list)
+
+    for name in new_rules:
+        if name in old_rules:
+            anchor = name
+        else:
+            inserted[anchor].append(new_rules[name].text)
+
+    edits = []
+    first = True
+
+    for name, rule in old_rules.items():
+        if name not in new_rules:
+            # Remove the rule and the blank lines up to the next statement.
+            end = rule.end
+
+            while end < len(existing_source) and existing_source[end].isspace():
+                end += 1
+
+            edits.append((rule.start, end, ''))
+            continue
+
+        text = new_rules[name].text
+
+        if first:
+            text = ''.join(rule_text + 2*'\n' for rule_text in inserted[None]) + text
+            first = False
+
+        text += ''.join(2*'\n' + rule_text for rule_text in inserted[name])
+
+        if text != rule.text:
+            edits.append((rule.start, rule.end, text))
+
+    output = existing_source
+
+    for start, end, text in reversed(edits):
+        output = output[:start] + text + output[end:]
 
-        # Remove possible duplicate newlines (the user may have added such accidentally).
-        output = re.sub('\n\n\n*', '\n\n', output)
+    # Removing the last rule leaves the blank lines that separated it from the previous rule.
+    if edits and edits[-1][1] == len(existing_source):
+        output = _append_newline(output.rstrip())
 
-        build_file.write(output)
+    return output
@@ -4,51 +4,180 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import bisect
+import collections
 import os
-import re
 
-from pazel.helpers import parse_enclosed_expression
+from pazel.bazel_rules import BazelRule
+from pazel.starlark import COMMENT
+from pazel.starlark import decode_string
+from pazel.starlark import NAME
+from pazel.starlark import NEWLINE
+from pazel.starlark import parse_rules
+from pazel.starlark import STRING
+from pazel.starlark import tokenize
 
+# Parsed BUILD files are cached so that each BUILD file is tokenized only once even though it is
+# queried for every script in its directory.
+_MAX_CACHED_BUILD_FILES = 16
+_build_file_cache = collections.OrderedDict()
 
-def find_existing_rule(build_file_path, script_filename, bazel_rule_type):
-    """Find Bazel rule for a given Python script in a BUILD file.
+
+class BuildFile(object):
+    """An existing BUILD file parsed to a list of rules with their spans."""
+
+    def __init__(self, source):
+        """Instantiate.
+
+        Args:
+            source (str): Source code of the BUILD file.
+        """
+        self.source = source
+        self.rules = parse_rules(source)
+        self._rule_starts = [rule.start for rule in self.rules]
+        self._rules_by_src = dict()
+        self._rules_by_name = dict()
+
+        for rule in self.rules:
+            name_argument = rule.kwargs.get('name')
+
+            if name_argument is not None and isinstance(name_argument.value, str):
+                self._rules_by_name.setdefault(name_argument.value, rule)
+
+        # Index rules by their only source file. If multiple rules have the same source file, the
+        # first one wins.
+        for rule in self.rules:
+            srcs_argument = rule.kwargs.get('srcs')
+
+            if srcs_argument is None or not isinstance(srcs_argument.value, list):
+                continue
+
+            if len(srcs_argument.value) == 1:
+                self._rules_by_src.setdefault(srcs_argument.value[0], rule)
+
+    def find_rule_by_src(self, script_filename):
+        """Find the rule whose 'srcs' consists of the given script.
+
+        Args:
+            script_filename (str): File name of a Python script.
+
+        Returns:
+            rule (BuildRule): Rule for the script or None if there is no such rule.
+        """
+        return self._rules_by_src.get(script_filename)
+
+    def find_rule_by_name(self, rule_name):
+        """Find the rule with the given name.
+
+        Args:
+            rule_name (str): Value of the 'name' attribute of a rule.
+
+        Returns:
+            rule (BuildRule): Rule with the name or None if there is no such rule.
+        """
+        return self._rules_by_name.get(rule_name)
+
+    def find_rule_at(self, index):
+        """Find the rule that contains the given index of the BUILD source.
+
+        Args:
+            index (int): Index in the BUILD source.
+
+        Returns:
+            rule (BuildRule): Rule whose span contains the index or None if there is no such rule.
+        """
+        rule_idx = bisect.bisect_right(self._rule_starts, index) - 1
+
+        if rule_idx < 0:
+            return None
+
+        rule = self.rules[rule_idx]
+
+        return rule if index < rule.end else None
+
+
+def read_build_file(build_file_path):
+    """Read and parse an existing BUILD file.
 
     Args:
-        build_file_path (str): Path to an existing BUILD file that may contain a rule for a given
-            Python script.
-        script_filename (str): File name of the Python script.
-        bazel_rule_type (Rule class): pazel-native or a custom class implementing BazelRule.
+        build_file_path (str): Path to a BUILD file.
 
     Returns:
-        rule (str): Existing Bazel rule for the Python script. If there is no rule, then None.
+        build_file (BuildFile): The parsed BUILD file or None if the file does not exist.
     """
-    # Read the existing BUILD file if there is one.
+    try:
+        stat = os.stat(build_file_path)
+    except OSError:
+        return None
+
+    key = (stat.st_mtime, stat.st_size)
+    cached = _build_file_cache.get(build_file_path)
+
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
     try:
         with open(build_file_path, 'r') as build_file:
             build_source = build_file.read()
     except IOError:
         return None
 
-    # Find existing rules for the current script.
-    match = bazel_rule_type.find_existing(build_source, script_filename)
+    build_file = BuildFile(build_source)
+
+    _build_file_cache.pop(build_file_path, None)
+    _build_file_cache[build_file_path] = (key, build_file)
+
+    if len(_build_file_cache) > _MAX_CACHED_BUILD_FILES:
+        _build_file_cache.popitem(last=False)
+
+    return build_file
+
+
+def find_existing_build_rule(build_file_path, script_filename, bazel_rule_type):
+    """Find the parsed Bazel rule for a given Python script in a BUILD file.
+
+    Args:
+        build_file_path (str): Path to an existing BUILD file that may contain a rule for a given
+            Python script.
+        script_filename (str): File name of the Python script.
+        bazel_rule_type (Rule class): pazel-native or a custom class implementing BazelRule.
+
+    Returns:
+        rule (BuildRule): Existing Bazel rule for the Python script. If there is no rule, then None.
+    """
+    build_file = read_build_file(build_file_path)
+
+    if build_file is None:
+        return None
+
+    # Rules using the default lookup are found from the index of source files. Custom lookups
+    # return a match that is mapped to the rule containing it.
+    if bazel_rule_type.find_existing is BazelRule.find_existing:
+        return build_file.find_rule_by_src(script_filename)
+
+    match = bazel_rule_type.find_existing(build_file.source, script_filename)
 
     if match is None:
         return None
 
-    # Find the start of the rule.
-    rule_identifier = bazel_rule_type.rule_identifier
-    start = match.start()
+    return build_file.find_rule_at(match.start())
 
-    # If the match is not the beginning of the rule, then go backwards to the start of the rule.
-    if build_source[start:start + len(rule_identifier)] != rule_identifier:
-        start = build_source.rfind(bazel_rule_type.rule_identifier, 0, start)
 
-    assert start != -1, "The start of the Bazel Python rule for %s not located." % script_filename
+def find_existing_rule(build_file_path, script_filename, bazel_rule_type):
+    """Find Bazel rule for a given Python script in a BUILD file.
 
-    # Find the rule by matching opening and closing parentheses.
-    rule = parse_enclosed_expression(build_source, start, '(')
+    Args:
+        build_file_path (str): Path to an existing BUILD file that may contain a rule for a given
+            Python script.
+        script_filename (str): File name of the Python script.
+        bazel_rule_type (Rule class): pazel-native or a custom class implementing BazelRule.
 
-    return rule
+    Returns:
+        rule (str): Existing Bazel rule for the Python script. If there is no rule, then None.
+    """
+    rule = find_existing_build_rule(build_file_path, script_filename, bazel_rule_type)
+
+    return rule.text if rule is not None else None
 
 
 def find_existing_test_size(script_path, bazel_rule_type):
@@ -69,24 +198,50 @@ def find_existing_test_size(script_path, bazel_rule_type):
     script_filename = os.path.basename(script_path)
     build_file_path = os.path.join(script_dir, 'BUILD')
 
-    rule = find_existing_rule(build_file_path, script_filename, bazel_rule_type)
+    rule = find_existing_build_rule(build_file_path, script_filename, bazel_rule_type)
 
     # No existing Bazel rules for the given Python file.
     if rule is None:
         return None
 
-    # Search for the test size.
-    matches = re.findall('size\s*=\s*\"(small|medium|large|enormous)\"', rule)
-
-    num_matches = len(matches)
+    size = rule.kwargs.get('size')
 
-    if num_matches > 0:
-        assert num_matches == 1, "Found multiple test size matches in %s." % rule
-        return matches[0]
+    if size is not None and size.value in ('small', 'medium', 'large', 'enormous'):
+        return size.value
 
     return None
 
 
+def find_existing_shard_count(script_path, bazel_rule_type):
+    """Check if the existing Bazel rule for a Python test contains the number of shards.
+
+    Args:
+        script_path (str): Path to a Python file that is a test.
+        bazel_rule_type (Rule class): pazel-native or a custom class implementing BazelRule.
+
+    Returns:
+        shard_count (int): Value of 'shard_count' in the existing BUILD file. If not found or if the
+            value is not an integer literal, then None is returned.
+    """
+    if not bazel_rule_type.is_test_rule:
+        return None
+
+    script_dir = os.path.dirname(script_path)
+    script_filename = os.path.basename(script_path)
+    build_file_path = os.path.join(script_dir, 'BUILD')
+
+    rule = find_existing_build_rule(build_file_path, script_filename, bazel_rule_type)
+
+    if rule is None or 'shard_count' not in rule.kwargs:
+        return None
+
+    shard_count = rule.kwargs['shard_count']
+    offset = rule.start
+    value = rule.text[shard_count.value_start - offset:shard_count.end - offset]
+
+    return int(value) if value.isdigit() else None
+
+
 def find_existing_data_deps(script_path, bazel_rule_type):
     """Check if the existing Bazel Python rule in a BUILD file contains data dependencies.
 
@@ -101,28 +256,88 @@ def find_existing_data_deps(script_path, bazel_rule_type):
     script_filename = os.path.basename(script_path)
     build_file_path = os.path.join(script_dir, 'BUILD')
 
-    rule = find_existing_rule(build_file_path, script_filename, bazel_rule_type)
+    rule = find_existing_build_rule(build_file_path, script_filename, bazel_rule_type)
+
+    return _get_data_deps(rule)
+
+
+def find_existing_data_deps_by_name(build_file_path, rule_name):
+    """Check if an existing rule with the given name contains data dependencies.
+
+    Args:
+        build_file_path (str): Path to an existing BUILD file.
+        rule_name (str): Name of the rule, e.g. the name of an aggregate py_library.
 
+    Returns:
+        data (str): Data dependencies in the existing rule.
+    """
+    build_file = read_build_file(build_file_path)
+
+    if build_file is None:
+        return None
+
+    return _get_data_deps(build_file.find_rule_by_name(rule_name))
+
+
+def _get_data_deps(rule):
+    """Return the 'data' attribute of a parsed rule exactly as written, or None."""
     # No matches, no data deps.
     if rule is None:
         return None
 
-    # Search for data deps.
-    data = None
+    data = rule.kwargs.get('data')
 
-    # Data deps are a list.
-    match = re.search('data\s*=\s*\[', rule)
+    if data is None:
+        return None
 
-    if match:
-        data = parse_enclosed_expression(rule, match.start(), '[')
+    # Keep the data deps exactly as written, e.g. a list or a call to 'glob'.
+    offset = rule.start
 
-    # Data deps defined by a call to 'glob'.
-    match = re.search('data\s*=\s*glob\(', rule)
+    return rule.text[data.start - offset:data.end - offset]
 
-    if match:
-        data = parse_enclosed_expression(rule, match.start(), '(')
 
-    return data
+def get_rule_deps(rule):
+    """Return the entries of the 'deps' attribute of a parsed rule.
+
+    Args:
+        rule (BuildRule): A rule of a parsed BUILD file.
+
+    Returns:
+        deps (list of str): Labels such as '//foo:bar' and calls such as 'requirement("x")' with
+            normalized quotes. None if 'deps' is not a list of such entries, e.g. if it uses select.
+    """
+    deps_argument = rule.kwargs.get('deps')
+
+    if deps_argument is None:
+        return []
+
+    offset = rule.start
+    tokens = [token for token in tokenize(rule.text[deps_argument.value_start - offset:
+                                                    deps_argument.end - offset])
+              if token.kind not in (COMMENT, NEWLINE)]
+
+    if len(tokens) < 2 or tokens[0].value != '[' or tokens[-1].value != ']':
+        return None
+
+    deps = []
+    entry = []
+
+    for token in tokens[1:-1] + [None]:
+        if token is not None and token.value != ',':
+            entry.append(token)
+            continue
+
+        if len(entry) == 1 and entry[0].kind == STRING:
+            deps.append(decode_string(entry[0].value))
+        elif len(entry) == 4 and entry[0].kind == NAME and entry[1].value == '(' and \
+                entry[2].kind == STRING and entry[3].value == ')':
+            deps.append('%s("%s")' % (entry[0].value, decode_string(entry[2].value)))
+        elif entry:
+            return None
+
+        entry = []
+
+    return deps
 
 
 def get_ignored_rules(build_file_path):
@@ -135,20 +350,17 @@ def get_ignored_rules(build_file_path):
         ignored_rules (list of str): Ignored Bazel rule(s). Empty list if no ignored rules were
             found or if the Bazel BUILD does not exist.
     """
-    try:
-        with open(build_file_path, 'r') as build_file:
-            build_source = build_file.read()
-    except IOError:
+    build_file = read_build_file(build_file_path)
+
+    if build_file is None:
         return []
 
     ignored_rules = []
 
     # pazel ignores rules following the tag "# pazel-ignore". Spaces are ignored within the tag but
-    # the line must start with #.
-    for match in re.finditer('\n#\s+pazel-ignore\s+', build_source):
-        start = match.start()
-
-        rule = parse_enclosed_expression(build_source, start, '(')
-        ignored_rules.append(rule)
+    # the line must start with #. The tag is kept together with the rule.
+    for rule in build_file.rules:
+        if rule.ignored:
+            ignored_rules.append('\n' + build_file.source[rule.ignore_tag_start:rule.end])
 
     return ignored_rules
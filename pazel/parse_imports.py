@@ -6,22 +6,222 @@ from __future__ import print_function
 
 import ast
 import os
+import re
+import tokenize
 
-from pazel.helpers import contains_python_file
-from pazel.helpers import is_installed
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
+from pazel.directory_fingerprints import IMPORT_DIRECTORIES
+from pazel.hook_stats import HOOK_STATS
+from pazel.import_probes import PROBES
+from pazel.import_inference_rules import passes_prefilters
+from pazel.module_trie import get_module_trie
+from pazel.module_trie import MODULE
+from pazel.module_trie import PACKAGE
 
-def get_imports(script_source):
+# By default, the fast import scanner gives up if the import preamble is longer than this.
+DEFAULT_IMPORT_SCAN_BUDGET = 64 * 1024
+
+# Top-level imports after the import preamble. Matches in strings only cause an unnecessary
+# fallback.
+_LATE_IMPORT_REGEX = re.compile(r'(?:^|;[ \t]*)(?:import|from)[ \t\\(.]', re.MULTILINE)
+
+
+def _parse_import_statement(tokens):
+    """Parse the tokens of an import statement like ast.parse would.
+
+    Args:
+        tokens (list of str): Tokens of a single import statement without comments and newlines.
+
+    Returns:
+        packages (list of tuple): List of (package name, None) tuples.
+        from_imports (list of tuple): List of (package/module name, some object) tuples.
+
+    Raises:
+        ValueError: If the statement is not a valid import statement.
+    """
+    packages = []
+    from_imports = []
+
+    if tokens[0] == 'import':
+        for part in _split_names(tokens[1:]):
+            packages.append((_dotted_name(part), None))
+    else:
+        import_idx = tokens.index('import')
+        module_tokens = tokens[1:import_idx]
+
+        # Keep the leading dots of relative imports like get_import_from_module does.
+        dots = ''
+
+        while module_tokens and not module_tokens[0].strip('.'):
+            dots += module_tokens[0]
+            module_tokens = module_tokens[1:]
+
+        module = dots + _dotted_name(module_tokens) if module_tokens else dots or None
+        names = tokens[import_idx + 1:]
+
+        if names == ['*']:
+            from_imports.append((module, '*'))
+            return packages, from_imports
+
+        if names and names[0] == '(':
+            if names[-1] != ')':
+                raise ValueError("Unbalanced parentheses in %s." % tokens)
+
+            names = names[1:-1]
+
+            if names and names[-1] == ',':
+                names = names[:-1]
+
+        for part in _split_names(names):
+            name = _dotted_name(part)
+
+            if '.' in name:
+                raise ValueError("Invalid name %s in %s." % (name, tokens))
+
+            from_imports.append((module, name))
+
+    return packages, from_imports
+
+
+def _split_names(tokens):
+    """Split comma-separated names and drop 'as' aliases."""
+    parts = [[]]
+
+    for token in tokens:
+        if token == ',':
+            parts.append([])
+        else:
+            parts[-1].append(token)
+
+    for part in parts:
+        if len(part) > 2 and part[-2] == 'as':
+            part = part[:-2]
+
+        yield part
+
+
+def _dotted_name(tokens):
+    """Join the tokens of a dotted name such as ['a', '.', 'b'] to 'a.b'."""
+    if not tokens or len(tokens) % 2 == 0 or tokens[1::2] != ['.'] * (len(tokens) // 2):
+        raise ValueError("Invalid dotted name %s." % tokens)
+
+    name = ''.join(tokens)
+
+    if not all(part and (part[0].isalpha() or part[0] == '_') for part in name.split('.')):
+        raise ValueError("Invalid dotted name %s." % name)
+
+    return name
+
+
+def scan_imports(script_source, max_bytes=DEFAULT_IMPORT_SCAN_BUDGET):
+    """Parse imports in the import preamble of a script without building its AST.
+
+    Top-level statements are tokenized one by one until the first statement that is neither an
+    import nor a string (e.g. the module docstring). The rest of the source is only searched for
+    top-level import statements. If there are any, or if the preamble is longer than max_bytes, then
+    the script needs to be parsed fully.
+
+    Args:
+        script_source (str): The source code of a Python script.
+        max_bytes (int): Maximum number of characters to tokenize.
+
+    Returns:
+        imports (tuple or None): Tuple (packages, from_imports) as returned by get_imports. None if
+            the imports could not be determined without parsing the full script.
+    """
+    lines = StringIO(script_source)
+    line_starts = []
+    consumed = [0]
+
+    def readline():
+        line_starts.append(consumed[0])
+        line = lines.readline()
+        consumed[0] += len(line)
+
+        return line
+
+    packages = []
+    from_imports = []
+    statement = []
+    skipped_types = (tokenize.COMMENT, tokenize.NL)
+
+    try:
+        for token_type, value, (row, column), _, _ in tokenize.generate_tokens(readline):
+            if token_type in skipped_types:
+                continue
+
+            if token_type in (tokenize.NEWLINE, tokenize.ENDMARKER) or value == ';':
+                if statement and statement[0] in ('import', 'from'):
+                    new_packages, new_from_imports = _parse_import_statement(statement)
+                    packages.extend(new_packages)
+                    from_imports.extend(new_from_imports)
+
+                statement = []
+
+                if token_type == tokenize.ENDMARKER:
+                    return packages, from_imports
+
+                if consumed[0] > max_bytes:
+                    return None
+
+                continue
+
+            # The import preamble ends at the first statement that is not an import or a string.
+            in_preamble = token_type == tokenize.STRING or \
+                (token_type == tokenize.NAME and value in ('import', 'from'))
+
+            if not statement and not in_preamble:
+                rest_of_source = script_source[line_starts[row - 1] + column:]
+
+                if _LATE_IMPORT_REGEX.search(rest_of_source):
+                    return None
+
+                return packages, from_imports
+
+            statement.append(value)
+    except (tokenize.TokenError, IndentationError, ValueError):
+        # Let the full parse decide whether the script is valid.
+        return None
+
+    return packages, from_imports
+
+
+def get_import_from_module(node):
+    """Get the module of "from X import Y" with the leading dots of a relative import.
+
+    Args:
+        node (ast.ImportFrom): Import statement.
+
+    Returns:
+        module (str): Module name such as 'foo.bar', '.foo', or '..' for "from .. import x".
+    """
+    return '.' * (node.level or 0) + (node.module or '')
+
+
+def get_imports(script_source, import_scan_budget=None):
     """Parse imported packages and objects imported from packages.
 
     Args:
         script_source (str): The source code of a Python script.
+        import_scan_budget (int): If given, try scan_imports with this many bytes before parsing the
+            whole script. Note that the scanner does not detect syntax errors after the imports.
 
     Returns:
         packages (list of tuple): List of (package name, None) tuples.
         from_imports (list of tuple): List of (package/module name, some object) tuples. Note that
-            some object can be a function, object, module, or package.
+            some object can be a function, object, module, or package. The module names of
+            relative imports start with dots, e.g. '.' for "from . import x".
     """
+    if import_scan_budget is not None:
+        imports = scan_imports(script_source, import_scan_budget)
+
+        if imports is not None:
+            return imports
+
     packages = []
     from_imports = []
     ast_of_source = ast.parse(script_source)
@@ -29,7 +229,7 @@ def get_imports(script_source):
     for node in ast_of_source.body:
         # Parse expressions of the form "from X import Y".
         if isinstance(node, ast.ImportFrom):
-            module = node.module
+            module = get_import_from_module(node)
 
             for name in node.names:
                 from_imports.append((module, name.name))
@@ -41,16 +241,56 @@ def get_imports(script_source):
     return packages, from_imports
 
 
-def infer_import_type(all_imports, project_root, contains_pre_installed_packages, custom_rules):
+def _resolve_relative_import(base, unknown, script_path, project_root):
+    """Resolve a relative import against the package of the script that contains it.
+
+    Args:
+        base (str): Module of a relative import with its leading dots, e.g. '..foo'.
+        unknown (str): Object imported from it.
+        script_path (str): Path to the script containing the import.
+        project_root (str): Imports are relative to this path.
+
+    Returns:
+        base (str): Absolute module name, e.g. 'a.foo' for a script in a/b, or None if the import
+            goes beyond the project root.
+        unknown (str): Object imported from it. For "from . import x" in a script at the project
+            root, the import is resolved to ('x', None).
+    """
+    relative_directory = os.path.relpath(os.path.dirname(os.path.abspath(script_path)),
+                                         os.path.abspath(project_root))
+    package_parts = [] if relative_directory == '.' else relative_directory.split(os.sep)
+    level = len(base) - len(base.lstrip('.'))
+
+    if '..' in package_parts or level - 1 > len(package_parts):
+        return None, None
+
+    parts = package_parts[:len(package_parts) - (level - 1)]
+    parts += base[level:].split('.') if base[level:] else []
+
+    if not parts:
+        return (unknown, None) if unknown != '*' else (None, None)
+
+    return '.'.join(parts), unknown
+
+
+def infer_import_type(all_imports, project_root, contains_pre_installed_packages, custom_rules,
+                      script_path=None):
     """Infer what is being imported.
 
     Given a list of tuples (package/module, some object) infer whether the first element is a
     package or a module and whether it is installed. Also, infer the type of the second element.
 
+    Local imports are resolved to the longest prefix of the dotted name that is a module or a
+    package of the project, e.g. 'a.b' for "import a.b.c" if a/b.py exists.
+
     Args:
         all_imports (list of tuple): All imports in a Python script.
         project_root (str): Local imports are assumed to be relative to this path.
         contains_pre_installed_packages (bool): Whether the environment contains external packages.
+        custom_rules (list of ImportInferenceRule classes): Custom rule classes implementing
+            ImportInferenceRule.
+        script_path (str): Path to the script containing the imports. Relative imports are
+            resolved against its package and left out if it is not given.
 
     Returns:
         packages: Set of package names that are imported.
@@ -58,19 +298,46 @@ def infer_import_type(all_imports, project_root, contains_pre_installed_packages
     """
     modules = []
     packages = []
+    module_trie = get_module_trie(project_root)
+
+    # Resolve relative imports to absolute ones. They are never installed packages.
+    resolved_imports = []
 
-    # Base is package/module and the type of unknown is inferred below.
     for base, unknown in all_imports:
-        # Early exit if base is in the installed modules of the current environment.
-        if is_installed(base, unknown, contains_pre_installed_packages):
+        is_relative = base is None or base.startswith('.')
+
+        if is_relative and base is not None and script_path is not None:
+            base, unknown = _resolve_relative_import(base, unknown, script_path, project_root)
+
+        if base is not None and not base.startswith('.'):
+            resolved_imports.append((base, unknown, is_relative))
+
+    # Probe all imports of the script at once. The answers are memoized for the whole run.
+    PROBES.prefetch([(base, unknown) for base, unknown, is_relative in resolved_imports
+                     if not is_relative], contains_pre_installed_packages)
+
+    # Base is package/module and the type of unknown is inferred below.
+    for base, unknown, is_relative in resolved_imports:
+        # Early exit if base is in the installed modules of the target environment.
+        if not is_relative and PROBES.is_installed(base, unknown, contains_pre_installed_packages):
             continue
 
+        # Local imports depend on the project tree along their path, e.g. with --skip-unchanged.
+        IMPORT_DIRECTORIES.record(base, unknown)
+
         # Prioritize custom inference rules used for parsing imports that pazel does not support.
         # These custom rules define how a Python import is mapped to Bazel dependencies.
         custom_rule_matches = False
 
         for inference_rule in custom_rules:
-            new_packages, new_modules = inference_rule.holds(project_root, base, unknown)
+            hook_name = inference_rule.__name__ + '.holds'
+
+            if not passes_prefilters(inference_rule, base, unknown):
+                HOOK_STATS.skip(hook_name)
+                continue
+
+            new_packages, new_modules = HOOK_STATS.call(hook_name, inference_rule.holds,
+                                                        project_root, base, unknown)
 
             # If the rule holds, then add to the list of packages and/or modules.
             if new_packages is not None:
@@ -87,80 +354,43 @@ def infer_import_type(all_imports, project_root, contains_pre_installed_packages
         if custom_rule_matches:
             continue
 
-        # Then, assume that 'base' is a module and 'unknown' is function, variable or any
+        # Find the longest prefix of base.unknown that is a module or a package in a single walk
+        # down the module trie. If it is a module, then the rest is a function, variable, or any
         # other object in that module.
-        module_path = os.path.join(project_root, base.replace('.', '/') + '.py')
-        if os.path.exists(module_path):
-            modules.append(base)
-            continue
-
-        # Check if 'unknown' is actually a package or a module.
-        dotted_path = base + '.%s' % unknown
-        package_path = os.path.join(project_root, dotted_path.replace('.', '/'))
-        module_path = os.path.join(project_root, dotted_path.replace('.', '/') + '.py')
+        base_parts = base.split('.')
+        parts = base_parts + ([unknown] if unknown is not None else [])
+        depth, kind = module_trie.find_longest_prefix(parts)
+        prefix = '.'.join(parts[:depth])
 
-        unknown_is_package = os.path.isdir(package_path) and contains_python_file(package_path)
-        unknown_is_module = os.path.isfile(module_path)
+        if kind == MODULE:
+            modules.append(prefix)
+            continue
 
-        if unknown_is_package:
-            # Assume that for package //foo, there exists rule //foo:foo.
-            # TODO: Relax this assumption.
-            dotted_path += '.%s' % unknown
-            modules.append(dotted_path)
+        if kind == PACKAGE and depth == len(parts) and unknown is not None:
+            # Assume that for package //foo, there exists rule //foo:foo. With LABEL_INDEX, the
+            # rule of foo/__init__.py is used instead if it has another name.
+            modules.append(prefix + '.' + parts[-1])
             continue
 
-        if unknown_is_module:
-            modules.append(dotted_path)
+        # The rest of a local package is defined in its __init__.py, e.g. "import foo" or objects
+        # imported from foo. Local packages are never pip packages, so namespace packages without
+        # an __init__.py are left out.
+        if kind == PACKAGE:
+            if os.path.isfile(os.path.join(project_root, *(parts[:depth] + ['__init__.py']))):
+                modules.append(prefix + '.__init__')
+
             continue
 
-        # Check if 'base' is a package and 'unknown' is part of its "public" interface
-        # as declared in __all__ of the __init__.py file.
-        package_path = os.path.join(project_root, base.replace('.', '/'))
-        if os.path.isdir(package_path) and _in_public_interface(package_path, unknown):
-            modules.append(base + '.__init__')
+        # Relative imports are never pip packages, e.g. of objects defined in the __init__.py of
+        # the own package.
+        if is_relative:
             continue
 
-        # Finally, assume that base is either a pip installable or a local package.
+        # Finally, assume that base is a pip installable or a local package outside of the tree.
         packages.append(base)
 
-    return set(packages), set(modules)
-
-
-def _in_public_interface(package_path, unknown):
-    """Check if 'unknown' is part of the public interface of a package.
-
-    Args:
-        package_path (str): Path to a Python package.
-        unknown (str): Some object in the package.
-
-    Returns:
-        public (bool): Whether 'unknown' if part of the public interface.
-    """
-    public = False
-    init_path = os.path.join(package_path, '__init__.py')
+    # Custom inference rules may resolve imports to modules elsewhere in the project.
+    for module in modules:
+        IMPORT_DIRECTORIES.record(module)
 
-    # Try parsing the __init__.py file of the package.
-    try:
-        with open(init_path, 'r') as init_file:
-            init_source = init_file.read()
-    except IOError:
-        return public
-
-    try:
-        top_node = ast.parse(init_source)
-    except SyntaxError:
-        return public
-
-    for node in top_node.body:
-        # Check assigning to __all__.
-        if isinstance(node, ast.Assign):
-            # The number of variables on the left side should be 1.
-            if len(node.targets) == 1:
-                left_side = node.targets[0].id
-
-                if left_side == '__all__':
-                    for element in node.value.elts:
-                        if element.s == unknown:
-                            return True
-
-    return False
+    return set(packages), set(modules)
@@ -7,6 +7,9 @@ from __future__ import print_function
 import ast
 import imp
 
+# Loaded .pazelrc modules by path so that settings can be read without executing a file twice.
+_loaded_pazelrcs = dict()
+
 
 class OutputExtension(object):
     """A class representing pazel extension to outputting BUILD files."""
@@ -22,6 +25,39 @@ class OutputExtension(object):
         self.footer = footer
 
 
+def _load_pazelrc(pazelrc_path):
+    """Load a .pazelrc file as a Python module. Each file is loaded only once.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        pazelrc (module or dict): The loaded module or an empty dict if the file does not exist.
+
+    Raises:
+        SyntaxError: If the .pazelrc contains invalid Python syntax.
+    """
+    if pazelrc_path in _loaded_pazelrcs:
+        return _loaded_pazelrcs[pazelrc_path]
+
+    # Try parsing the .pazelrc to check that it contains valid Python syntax.
+    try:
+        with open(pazelrc_path, 'r') as pazelrc_file:
+            pazelrc_source = pazelrc_file.read()
+            ast.parse(pazelrc_source)
+
+        pazelrc = imp.load_source('pazelrc', pazelrc_path)
+    except IOError:
+        # The file does not exist. Use a dummy pazelrc that contains nothing.
+        pazelrc = dict()
+    except SyntaxError:
+        raise SyntaxError("Invalid syntax in %s. Run the file with an interpreter." % pazelrc_path)
+
+    _loaded_pazelrcs[pazelrc_path] = pazelrc
+
+    return pazelrc
+
+
 def parse_pazel_extensions(pazelrc_path):
     """Parse pazel extensions from a .pazelrc file.
 
@@ -46,18 +82,7 @@ def parse_pazel_extensions(pazelrc_path):
     Raises:
         SyntaxError: If the .pazelrc contains invalid Python syntax.
     """
-    # Try parsing the .pazelrc to check that it contains valid Python syntax.
-    try:
-        with open(pazelrc_path, 'r') as pazelrc_file:
-            pazelrc_source = pazelrc_file.read()
-            ast.parse(pazelrc_source)
-
-        pazelrc = imp.load_source('pazelrc', pazelrc_path)
-    except IOError:
-        # The file does not exist. Use a dummy pazelrc that contains nothing.
-        pazelrc = dict()
-    except SyntaxError:
-        raise SyntaxError("Invalid syntax in %s. Run the file with an interpreter." % pazelrc_path)
+    pazelrc = _load_pazelrc(pazelrc_path)
 
     # Read user-defined header and footer.
     header = getattr(pazelrc, 'HEADER', '')
@@ -94,3 +119,115 @@ def parse_pazel_extensions(pazelrc_path):
 
     return output_extension, custom_bazel_rules, custom_import_inference_rules, \
         import_name_to_pip_name, local_import_name_to_dep, requirement_load
+
+
+def parse_granularity(pazelrc_path):
+    """Parse the granularity of the generated rules from a .pazelrc file.
+
+    With 'file' granularity, each Python file gets its own rule. With 'directory' granularity, the
+    libraries in a directory are aggregated to a single py_library named after the directory.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        granularity (str): Default granularity, 'file' or 'directory'.
+        directory_granularity (dict): Mapping from a directory relative to the project root to its
+            granularity. The granularity also applies to the subdirectories.
+    """
+    pazelrc = _load_pazelrc(pazelrc_path)
+    valid_granularities = ('file', 'directory')
+
+    granularity = getattr(pazelrc, 'GRANULARITY', 'file')
+    assert granularity in valid_granularities, "GRANULARITY must be 'file' or 'directory'."
+
+    directory_granularity = getattr(pazelrc, 'DIRECTORY_GRANULARITY', dict())
+    assert isinstance(directory_granularity, dict), "DIRECTORY_GRANULARITY must be a dictionary."
+    assert all(value in valid_granularities for value in directory_granularity.values()), \
+        "DIRECTORY_GRANULARITY values must be 'file' or 'directory'."
+
+    return granularity, directory_granularity
+
+
+def parse_tests_per_shard(pazelrc_path):
+    """Parse the maximum number of test methods per shard from a .pazelrc file.
+
+    Tests with more test methods than this get a 'shard_count' so that Bazel runs the shards in
+    parallel. Note that the test runner needs to support sharding, e.g. by reading the
+    TEST_SHARD_INDEX and TEST_TOTAL_SHARDS environment variables.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        tests_per_shard (int): Maximum number of test methods per shard. None disables sharding.
+    """
+    pazelrc = _load_pazelrc(pazelrc_path)
+
+    tests_per_shard = getattr(pazelrc, 'TESTS_PER_SHARD', None)
+    assert tests_per_shard is None or (isinstance(tests_per_shard, int) and tests_per_shard > 0), \
+        "TESTS_PER_SHARD must be a positive integer or None."
+
+    return tests_per_shard
+
+
+def parse_reduce_deps(pazelrc_path):
+    """Parse from a .pazelrc file whether the dependencies of the generated rules are reduced.
+
+    If REDUCE_DEPS is True, a dependency is left out of a rule if it is reachable transitively
+    through another dependency of the rule.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        reduce_deps (bool): Whether to reduce the dependencies.
+    """
+    pazelrc = _load_pazelrc(pazelrc_path)
+
+    reduce_deps = getattr(pazelrc, 'REDUCE_DEPS', False)
+    assert isinstance(reduce_deps, bool), "REDUCE_DEPS must be a boolean."
+
+    return reduce_deps
+
+
+def parse_label_index(pazelrc_path):
+    """Parse from a .pazelrc file whether dependencies point at the existing rules owning modules.
+
+    If LABEL_INDEX is True, the existing BUILD files of the project are indexed and a dependency on
+    a module listed in the srcs of an ignored rule, e.g. a hand-written py_library aggregating
+    several files, points at that rule instead of the default label of the module.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        label_index (bool): Whether to index the labels of existing rules.
+    """
+    pazelrc = _load_pazelrc(pazelrc_path)
+
+    label_index = getattr(pazelrc, 'LABEL_INDEX', False)
+    assert isinstance(label_index, bool), "LABEL_INDEX must be a boolean."
+
+    return label_index
+
+
+def parse_split_binaries(pazelrc_path):
+    """Parse from a .pazelrc file whether binaries are split into a library and a binary.
+
+    If SPLIT_BINARIES is True, a binary with an "if __name__ == '__main__':" block gets a py_library
+    named '<script>_lib' for its importable code and a thin py_binary that depends on it. Code that
+    imports the script depends on the py_library.
+
+    Args:
+        pazelrc_path (str): Path to .pazelrc config file for customizing pazel.
+
+    Returns:
+        split_binaries (bool): Whether to split binaries.
+    """
+    pazelrc = _load_pazelrc(pazelrc_path)
+
+    split_binaries = getattr(pazelrc, 'SPLIT_BINARIES', False)
+    assert isinstance(split_binaries, bool), "SPLIT_BINARIES must be a boolean."
+
+    return split_binaries
@@ -0,0 +1,90 @@
+"""Answer import probes of pazel inside the interpreter of the target environment.
+
+pazel runs this file as a script with the interpreter given by its --python flag. The worker reads
+batches of probes as JSON lines from stdin and writes one JSON line of answers per batch to stdout.
+The file must not import pazel because pazel is usually not installed for the target interpreter.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import importlib
+import json
+import os
+import platform
+import sys
+import traceback
+
+
+def _import(module, some_object):
+    """Check if a module can be imported and whether some_object is found in it."""
+    try:
+        module = importlib.import_module(module)
+
+        if some_object:
+            getattr(module, some_object)
+
+        return True
+    except Exception:   # Modules may raise anything on import. They are treated as not found.
+        return False
+
+
+def _is_in_stdlib(module, some_object):
+    """Check if a given module is part of the Python standard library."""
+    original_sys_path = sys.path
+    lib_path = os.path.dirname(traceback.__file__)
+    sys.path = [lib_path]
+
+    # On Mac, some extra library paths are required.
+    if 'darwin' in platform.system().lower():
+        for path in original_sys_path:
+            if 'site-packages' not in path:
+                sys.path.append(path)
+
+    try:
+        return _import(module, some_object)
+    finally:
+        sys.path = original_sys_path
+
+
+def is_installed(module, some_object, contains_pre_installed_packages):
+    """Check if a module is installed like pazel.helpers.is_installed does."""
+    if contains_pre_installed_packages:
+        return _import(module, some_object)
+
+    return _is_in_stdlib(module, some_object)
+
+
+def get_identity():
+    """Describe the interpreter and the directories it imports from."""
+    return {'version': sys.version, 'prefix': sys.prefix, 'executable': sys.executable,
+            'path': [path for path in sys.path if path]}
+
+
+def main():
+    """Answer batches of probes until stdin is closed."""
+    # The directory of this script is not part of the target environment.
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if sys.path and os.path.abspath(sys.path[0] or '.') == script_dir:
+        del sys.path[0]
+
+    # Imported modules may print. Keep stdout for the answers only.
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    output.write(json.dumps(get_identity()) + '\n')
+    output.flush()
+
+    for line in iter(sys.stdin.readline, ''):
+        probes = json.loads(line)
+        answers = [is_installed(module, some_object, contains_pre_installed_packages)
+                   for module, some_object, contains_pre_installed_packages in probes]
+
+        output.write(json.dumps(answers) + '\n')
+        output.flush()
+
+
+if __name__ == '__main__':
+    main()
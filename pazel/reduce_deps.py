@@ -0,0 +1,184 @@
+"""Drop dependencies that are already reachable through other dependencies of the same rule."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from pazel.generate_rule import parse_script
+from pazel.helpers import is_ignored
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import get_module_name
+from pazel.import_graph import ImportGraph
+from pazel.import_graph import LOCAL_PACKAGE
+from pazel.import_graph import MODULE
+from pazel.parse_build import get_ignored_rules
+
+
+class DependencyReducer(object):
+    """Compute the transitive reduction of the dependencies of each script.
+
+    The import graph of the project is built lazily: a module is parsed only when the closure of
+    some dependency reaches it. Scripts whose rules are ignored, modules whose file is not found,
+    and packages are treated as having no dependencies, which can only keep more dependencies.
+    """
+
+    def __init__(self, project_root, contains_pre_installed_packages, custom_bazel_rules,
+                 custom_import_inference_rules, local_import_name_to_dep, import_scan_budget=None):
+        """Instantiate.
+
+        Args:
+            project_root (str): Imports in the Python files are relative to this path.
+            contains_pre_installed_packages (bool): Whether the environment contains external
+                packages.
+            custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+            custom_import_inference_rules (list of ImportInferenceRule classes): User-defined
+                classes for inferring import types.
+            local_import_name_to_dep (dict): Mapping from local package import name to its Bazel
+                dependency.
+            import_scan_budget (int): If given, imports are scanned from the import preamble of
+                each script. See get_imports.
+        """
+        self.project_root = project_root
+        self.contains_pre_installed_packages = contains_pre_installed_packages
+        self.custom_bazel_rules = custom_bazel_rules
+        self.custom_import_inference_rules = custom_import_inference_rules
+        self.local_import_name_to_dep = local_import_name_to_dep
+        self.import_scan_budget = import_scan_budget
+
+        self.graph = ImportGraph()
+        self._expanded = set()
+        self._closures = dict()
+
+    def _get_package_node(self, package_name):
+        """Get the node of the top-level package of an imported package."""
+        package_name = package_name.split('.')[0]
+
+        if package_name in self.local_import_name_to_dep:
+            return self.graph.add_node(self.local_import_name_to_dep[package_name], LOCAL_PACKAGE)
+
+        return self.graph.add_node(package_name, EXTERNAL_PACKAGE)
+
+    def _add_imports(self, node_id, package_names, module_names):
+        """Add the imports of a module to the graph."""
+        self._expanded.add(node_id)
+
+        for module_name in module_names:
+            self.graph.add_edge(node_id, self.graph.add_node(module_name))
+
+        for package_name in package_names:
+            self.graph.add_edge(node_id, self._get_package_node(package_name))
+
+    def _find_script(self, module_name):
+        """Find the script of a module, or None if there is no script with a generated rule."""
+        base_path = os.path.join(self.project_root, *module_name.split('.'))
+
+        for script_path in (base_path + '.py', os.path.join(base_path, '__init__.py')):
+            if os.path.isfile(script_path):
+                build_file_path = os.path.join(os.path.dirname(script_path), 'BUILD')
+
+                if is_ignored(script_path, get_ignored_rules(build_file_path)):
+                    return None
+
+                return script_path
+
+        return None
+
+    def _expand(self, node_id):
+        """Parse the imports of a module node unless they are already known."""
+        if node_id in self._expanded:
+            return
+
+        self._expanded.add(node_id)
+
+        if self.graph.get_kind(node_id) != MODULE:
+            return
+
+        script_path = self._find_script(self.graph.get_name(node_id))
+
+        if script_path is None:
+            return
+
+        parsed_script = parse_script(script_path, self.project_root,
+                                     self.contains_pre_installed_packages, self.custom_bazel_rules,
+                                     self.custom_import_inference_rules, self.import_scan_budget)
+
+        self._add_imports(node_id, parsed_script.package_names, parsed_script.module_names)
+
+    def _get_closure(self, node_id):
+        """Get the set of nodes reachable from a node by following one or more imports."""
+        closure = self._closures.get(node_id)
+
+        if closure is not None:
+            return closure
+
+        closure = set()
+        pending = [node_id]
+
+        while pending:
+            current = pending.pop()
+            self._expand(current)
+
+            for successor in self.graph.successors(current):
+                if successor not in closure:
+                    closure.add(successor)
+                    pending.append(successor)
+
+        self._closures[node_id] = closure
+
+        return closure
+
+    def release_closures(self):
+        """Forget the memoized closures to bound memory use. The import graph itself is kept."""
+        self._closures = dict()
+
+    def reduce(self, script_path, package_names, module_names):
+        """Drop the imports of a script that are reachable through its other imports.
+
+        A dependency is dropped if another dependency reaches it but it does not reach back. Of
+        dependencies that reach each other (an import cycle), only the first in sorted order is
+        kept. The transitive closure of the dependencies thus stays the same.
+
+        Args:
+            script_path (str): Path to the script.
+            package_names (set of str): Imported package names.
+            module_names (set of str): Imported module names.
+
+        Returns:
+            package_names (set of str): Package names that are not reachable transitively.
+            module_names (set of str): Module names that are not reachable transitively.
+        """
+        own_node = self.graph.add_node(get_module_name(script_path, self.project_root))
+
+        if own_node not in self._expanded:
+            self._add_imports(own_node, package_names, module_names)
+
+        # Several package names such as 'foo.a' and 'foo.b' map to the same node.
+        deps = [(self.graph.add_node(name), name) for name in sorted(module_names)]
+        deps += [(self._get_package_node(name), name) for name in sorted(package_names)]
+
+        dep_nodes = []
+
+        for node_id, _ in deps:
+            if node_id != own_node and node_id not in dep_nodes:
+                dep_nodes.append(node_id)
+
+        redundant = set()
+
+        for i, node_id in enumerate(dep_nodes):
+            for j, other_id in enumerate(dep_nodes):
+                if other_id == node_id or node_id not in self._get_closure(other_id):
+                    continue
+
+                # Of two dependencies in the same cycle, keep the first one.
+                if other_id not in self._get_closure(node_id) or j < i:
+                    redundant.add(node_id)
+                    break
+
+        reduced_packages = set(name for node_id, name in deps
+                               if name in package_names and node_id not in redundant)
+        reduced_modules = set(name for node_id, name in deps
+                              if name in module_names and node_id not in redundant)
+
+        return reduced_packages, reduced_modules
@@ -0,0 +1,228 @@
+"""Compute the minimal pinned requirements of every binary from the import graph."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from pazel.distribution_index import normalize_distribution_name
+from pazel.import_cycles import find_strongly_connected_components
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import MODULE
+
+
+def compute_package_closures(graph):
+    """Compute the external packages that every node imports directly or indirectly.
+
+    Like compute_closures, the closures are computed in a single pass over the strongly connected
+    components of the graph, but only over the external packages. The closure of a node is a
+    bitset over the external packages, which are few compared to the modules, so the closures of
+    all nodes stay small even in large projects.
+
+    Args:
+        graph (ImportGraph): Import graph.
+
+    Returns:
+        packages (list of str): Names of the external packages. Bit i of a closure is packages[i].
+        closures (list of int): Bitset of the external packages reached from each node, including
+            the node itself if it is an external package.
+    """
+    packages = []
+    package_bits = [0] * graph.num_nodes
+
+    for node_id in range(graph.num_nodes):
+        if graph.get_kind(node_id) == EXTERNAL_PACKAGE:
+            package_bits[node_id] = 1 << len(packages)
+            packages.append(graph.get_name(node_id))
+
+    closures = [0] * graph.num_nodes
+
+    # Components reachable from a component come before it in Tarjan's order.
+    for component in find_strongly_connected_components(graph):
+        reach = 0
+
+        for node_id in component:
+            reach |= package_bits[node_id]
+
+            for successor in graph.successors(node_id):
+                reach |= closures[successor]
+
+        for node_id in component:
+            closures[node_id] = reach
+
+    return packages, closures
+
+
+class RequirementSet(object):
+    """The pinned requirements a binary needs to run."""
+
+    __slots__ = ('label', 'name', 'rule', 'requirements', 'unpinned')
+
+    def __init__(self, label, name, rule, requirements, unpinned):
+        """Instantiate.
+
+        Args:
+            label (str): Label of the binary, e.g. '//foo:bar'.
+            name (str): Dotted module name of the binary.
+            rule (str): Rule type, e.g. 'py_binary'.
+            requirements (list of list of str): Requirements split into the specifier and options
+                such as --hash, ordered by the normalized name of the distribution.
+            unpinned (list of str): Distributions the binary imports that are not pinned.
+        """
+        self.label = label
+        self.name = name
+        self.rule = rule
+        self.requirements = requirements
+        self.unpinned = unpinned
+
+    def to_dict(self):
+        """Return the requirements as a dictionary with one requirement per line, e.g. for JSON."""
+        return {'label': self.label, 'rule': self.rule, 'unpinned': self.unpinned,
+                'requirements': [' '.join(requirement) for requirement in self.requirements]}
+
+
+def get_module_label(module_name):
+    """Get the label of the rule of a module, e.g. '//foo:bar' for 'foo.bar'."""
+    parts = module_name.split('.')
+
+    return '//%s:%s' % ('/'.join(parts[:-1]), parts[-1])
+
+
+class LockDependencies(object):
+    """Expand requirements with the pinned distributions they require, memoizing the closures."""
+
+    def __init__(self, dependents):
+        """Instantiate.
+
+        Args:
+            dependents (dict): Mapping from normalized distribution names to the set of names of the
+                distributions that require them, as returned by read_pinned_requirements.
+        """
+        self.dependencies = dict()
+
+        for name, names in dependents.items():
+            for dependent in names:
+                self.dependencies.setdefault(dependent, set()).add(name)
+
+        self._closures = dict()
+
+    def get_closure(self, name):
+        """Get a distribution and the distributions it requires directly or indirectly."""
+        closure = self._closures.get(name)
+
+        if closure is None:
+            closure = set([name])
+            stack = [name]
+
+            while stack:
+                for dependency in self.dependencies.get(stack.pop(), ()):
+                    if dependency not in closure:
+                        closure.add(dependency)
+                        stack.append(dependency)
+
+            closure = self._closures[name] = frozenset(closure)
+
+        return closure
+
+
+def compute_requirement_sets(graph, pins=None, dependents=None, import_name_to_pip_name=None,
+                             rules=('py_binary',)):
+    """Compute the minimal requirements of every binary in the graph.
+
+    The external packages reached by each binary are computed for all binaries in one traversal
+    of the graph, and binaries that reach the same packages share the pinned requirements.
+
+    Args:
+        graph (ImportGraph): Import graph built by build_import_graph.
+        pins (dict): Pinned requirements from read_pinned_requirements. If None, requirements are
+            the bare distribution names.
+        dependents (dict): Dependencies between the pinned distributions from
+            read_pinned_requirements. The distributions a binary imports are expanded with the
+            distributions they require.
+        import_name_to_pip_name (dict): Mapping from the names of the external packages in the
+            graph to pip names, e.g. from get_distribution_index.
+        rules (tuple of str): Rule types for which requirements are computed.
+
+    Returns:
+        requirement_sets (list of RequirementSet): Requirements ordered by label.
+    """
+    packages, closures = compute_package_closures(graph)
+    import_name_to_pip_name = import_name_to_pip_name or dict()
+    lock_dependencies = LockDependencies(dependents or dict())
+    distributions = [normalize_distribution_name(import_name_to_pip_name.get(package, package))
+                     for package in packages]
+
+    resolved = dict()   # Requirements and unpinned distributions by bitset of packages.
+    requirement_sets = []
+
+    for node_id in range(graph.num_nodes):
+        rule = graph.get_rule(node_id)
+
+        if graph.get_kind(node_id) != MODULE or rule not in rules:
+            continue
+
+        bits = closures[node_id]
+
+        if bits not in resolved:
+            names = set()
+
+            for bit, distribution in enumerate(distributions):
+                if bits >> bit & 1:
+                    names.update(lock_dependencies.get_closure(distribution))
+
+            if pins is None:
+                resolved[bits] = [[name] for name in sorted(names)], []
+            else:
+                resolved[bits] = ([pins[name] for name in sorted(names) if name in pins],
+                                  sorted(name for name in names if name not in pins))
+
+        requirements, unpinned = resolved[bits]
+        name = graph.get_name(node_id)
+        requirement_sets.append(RequirementSet(get_module_label(name), name, rule, requirements,
+                                               unpinned))
+
+    return sorted(requirement_sets, key=lambda requirement_set: requirement_set.label)
+
+
+def format_requirements_file(requirement_set):
+    """Format a requirements file from which pip installs the requirements of a binary.
+
+    Args:
+        requirement_set (RequirementSet): Requirements of a binary.
+
+    Returns:
+        contents (str): Requirements in the layout of pip-compile, one requirement per line with
+            its options on continuation lines.
+    """
+    lines = ['# Requirements of %s generated by pazel.' % requirement_set.label]
+    lines += [' \\\n    '.join(requirement) for requirement in requirement_set.requirements]
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_requirements_files(requirement_sets, output_dir):
+    """Write one requirements file per binary, e.g. output_dir/foo/bar.txt for '//foo:bar'.
+
+    Args:
+        requirement_sets (list of RequirementSet): Requirements of the binaries.
+        output_dir (str): Directory in which the files are written.
+
+    Returns:
+        paths (list of str): Paths of the written files.
+    """
+    paths = []
+
+    for requirement_set in requirement_sets:
+        package, name = requirement_set.label[len('//'):].split(':')
+        path = os.path.join(output_dir, package, name + '.txt')
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as requirements_file:
+            requirements_file.write(format_requirements_file(requirement_set))
+
+        paths.append(path)
+
+    return paths
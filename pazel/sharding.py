@@ -0,0 +1,155 @@
+"""Split the directories of a project deterministically to shards for distributed runs."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+
+
+def parse_shard(shard_spec):
+    """Parse a shard specification of the form 'i/N'.
+
+    Args:
+        shard_spec (str): Shard index and the number of shards, e.g. '0/4'. Indices start from 0.
+
+    Returns:
+        shard (tuple of int): Tuple (shard index, number of shards).
+
+    Raises:
+        ValueError: If the specification is invalid.
+    """
+    try:
+        index, num_shards = [int(part) for part in shard_spec.split('/')]
+    except ValueError:
+        raise ValueError("Invalid shard %s. Expected the form i/N, e.g. 0/4." % shard_spec)
+
+    if num_shards < 1 or not 0 <= index < num_shards:
+        raise ValueError("Invalid shard %s. Expected 0 <= i < N." % shard_spec)
+
+    return index, num_shards
+
+
+def get_relative_directory(directory, project_root):
+    """Return a directory relative to the project root using forward slashes.
+
+    Args:
+        directory (str): Path to a directory in the project.
+        project_root (str): Project root directory.
+
+    Returns:
+        relative_directory (str): The relative directory, '.' for the project root itself.
+    """
+    relative_directory = os.path.relpath(os.path.abspath(directory), os.path.abspath(project_root))
+
+    return relative_directory.replace(os.sep, '/')
+
+
+def get_shard_index(relative_directory, num_shards):
+    """Assign a directory to a shard.
+
+    The assignment depends only on the relative path so it is identical on every machine and in
+    every Python process (unlike the built-in hash of strings).
+
+    Args:
+        relative_directory (str): Directory relative to the project root.
+        num_shards (int): Number of shards.
+
+    Returns:
+        index (int): Index of the shard that handles the directory.
+    """
+    digest = hashlib.md5(relative_directory.encode('utf-8')).hexdigest()
+
+    return int(digest[:8], 16) % num_shards
+
+
+def in_shard(directory, project_root, shard):
+    """Check whether a directory belongs to a given shard.
+
+    Args:
+        directory (str): Path to a directory in the project.
+        project_root (str): Project root directory.
+        shard (tuple of int): Tuple (shard index, number of shards) or None for no sharding.
+
+    Returns:
+        belongs (bool): Whether the shard generates the BUILD file of the directory.
+    """
+    if shard is None:
+        return True
+
+    index, num_shards = shard
+    relative_directory = get_relative_directory(directory, project_root)
+
+    return get_shard_index(relative_directory, num_shards) == index
+
+
+def write_shard_manifest(manifest_path, shard, relative_directories):
+    """Write the list of directories handled by a shard.
+
+    Args:
+        manifest_path (str): Path to the output JSON file.
+        shard (tuple of int): Tuple (shard index, number of shards).
+        relative_directories (list of str): Directories handled by the shard relative to the
+            project root.
+    """
+    manifest = {'shard': list(shard), 'directories': sorted(relative_directories)}
+
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+
+def verify_shard_manifests(input_path, project_root, manifest_paths):
+    """Check that shard manifests cover all directories of the input path exactly once.
+
+    Args:
+        input_path (str): Directory for which BUILD files were generated.
+        project_root (str): Project root directory.
+        manifest_paths (list of str): Paths to manifests written by write_shard_manifest.
+
+    Returns:
+        errors (list of str): Descriptions of missing shards, missing directories, and directories
+            handled by multiple shards. Empty if the coverage is complete.
+    """
+    errors = []
+    seen_shards = set()
+    num_shards = None
+    owner = dict()
+
+    for manifest_path in manifest_paths:
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        index, manifest_num_shards = manifest['shard']
+
+        if num_shards is None:
+            num_shards = manifest_num_shards
+        elif num_shards != manifest_num_shards:
+            errors.append("Manifest %s has %d shards, expected %d."
+                          % (manifest_path, manifest_num_shards, num_shards))
+
+        if index in seen_shards:
+            errors.append("Shard %d/%d is listed in multiple manifests." % (index, num_shards))
+
+        seen_shards.add(index)
+
+        for relative_directory in manifest['directories']:
+            if relative_directory in owner:
+                errors.append("Directory %s is handled by shards %d and %d."
+                              % (relative_directory, owner[relative_directory], index))
+            else:
+                owner[relative_directory] = index
+
+    if num_shards is not None:
+        for index in range(num_shards):
+            if index not in seen_shards:
+                errors.append("Manifest for shard %d/%d is missing." % (index, num_shards))
+
+    for dirpath, _, _ in os.walk(input_path):
+        relative_directory = get_relative_directory(dirpath, project_root)
+
+        if relative_directory not in owner:
+            errors.append("Directory %s is not handled by any shard." % relative_directory)
+
+    return errors
@@ -0,0 +1,209 @@
+"""Split binaries into a py_library for the importable code and a thin py_binary wrapper."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import ast
+import os
+
+from pazel.bazel_rules import infer_bazel_rule_type
+from pazel.bazel_rules import PyBinaryRule
+from pazel.helpers import intern_string
+from pazel.helpers import is_ignored
+from pazel.parse_build import get_ignored_rules
+from pazel.parse_imports import get_import_from_module
+from pazel.parse_imports import infer_import_type
+
+# Suffix of the name of the py_library split from a binary, e.g. 'bar_lib' for 'bar.py'.
+LIBRARY_SUFFIX = '_lib'
+
+
+def _is_main_check(node):
+    """Check whether an AST node is the test "__name__ == '__main__'" in either order."""
+    if not isinstance(node, ast.Compare) or len(node.ops) != 1 or \
+            not isinstance(node.ops[0], ast.Eq):
+        return False
+
+    operands = [node.left, node.comparators[0]]
+    names = [operand.id for operand in operands if isinstance(operand, ast.Name)]
+    strings = [getattr(operand, 'value', getattr(operand, 's', None)) for operand in operands
+               if not isinstance(operand, ast.Name)]
+
+    return names == ['__name__'] and strings == ['__main__']
+
+
+def get_main_block_imports(script_source):
+    """Get the imports of the top-level "if __name__ == '__main__':" blocks of a script.
+
+    Like get_imports, only the statements directly in the blocks are considered.
+
+    Args:
+        script_source (str): The source code of a Python script.
+
+    Returns:
+        packages (list of tuple): List of (package name, None) tuples, or None if the script has
+            no main block.
+        from_imports (list of tuple): List of (package/module name, some object) tuples, or None
+            if the script has no main block.
+    """
+    main_blocks = [node for node in ast.parse(script_source).body
+                   if isinstance(node, ast.If) and _is_main_check(node.test)]
+
+    if not main_blocks:
+        return None, None
+
+    packages, from_imports = [], []
+
+    for main_block in main_blocks:
+        for node in main_block.body:
+            if isinstance(node, ast.ImportFrom):
+                module = get_import_from_module(node)
+                from_imports.extend((module, name.name) for name in node.names)
+            elif isinstance(node, ast.Import):
+                packages.extend((package.name, None) for package in node.names)
+
+    return packages, from_imports
+
+
+def has_main_block(script_source):
+    """Check whether a script has a top-level "if __name__ == '__main__':" block."""
+    return get_main_block_imports(script_source)[0] is not None
+
+
+def is_split_binary(bazel_rule_type, script_source):
+    """Check whether the rule of a script is split into a py_library and a py_binary.
+
+    Only pazel-native binaries with a main block are split. Binaries that run code at the top level
+    cannot be imported without running it.
+
+    Args:
+        bazel_rule_type (BazelRule class): Rule type of the script.
+        script_source (str): The source code of the script.
+
+    Returns:
+        split (bool): Whether the script gets a py_library and a py_binary.
+    """
+    return bazel_rule_type is PyBinaryRule and has_main_block(script_source)
+
+
+def parse_main_block(script_path, project_root, contains_pre_installed_packages,
+                     custom_import_inference_rules):
+    """Infer what the main block of a script imports.
+
+    Args:
+        script_path (str): Path to a Python file.
+        project_root (str): Imports in the Python script are assumed to be relative to this path.
+        contains_pre_installed_packages (bool): Environment contains pre-installed packages (true)
+            or only the standard library (false).
+        custom_import_inference_rules (list of ImportInferenceRule classes): Custom rule classes
+            implementing ImportInferenceRule.
+
+    Returns:
+        package_names (set of str): Package names imported in the main block, or None if the
+            script has no main block.
+        module_names (set of str): Module names imported in the main block, or None if the script
+            has no main block.
+    """
+    with open(script_path, 'r') as script_file:
+        script_source = script_file.read()
+
+    packages, from_imports = get_main_block_imports(script_source)
+
+    if packages is None:
+        return None, None
+
+    package_names, module_names = infer_import_type(packages + from_imports, project_root,
+                                                    contains_pre_installed_packages,
+                                                    custom_import_inference_rules, script_path)
+
+    return set(package_names), set(module_names)
+
+
+def get_library_label(module_name):
+    """Get the label of the py_library split from a binary, e.g. '//foo:bar_lib' for 'foo.bar'."""
+    parts = module_name.split('.')
+
+    return '//%s:%s%s' % ('/'.join(parts[:-1]), parts[-1], LIBRARY_SUFFIX)
+
+
+class SplitBinaryLabels(object):
+    """Map the module names of split binaries to the labels of their py_library.
+
+    Instances behave like a read-only dictionary from dotted module names to labels, like
+    AggregatedModuleLabels, so that code importing a binary depends on its library instead.
+    """
+
+    def __init__(self, project_root, custom_bazel_rules, fallback=None):
+        """Instantiate.
+
+        Args:
+            project_root (str): Imports in the Python files are relative to this path.
+            custom_bazel_rules (list of BazelRule classes): User-defined BazelRule classes.
+            fallback (dict): Optional mapping consulted for modules that are not split binaries,
+                e.g. AggregatedModuleLabels.
+        """
+        self.project_root = project_root
+        self.custom_bazel_rules = custom_bazel_rules
+        self.fallback = fallback
+        self._labels = dict()
+
+    def get(self, module_name, default=None):
+        """Get the label of a module.
+
+        Args:
+            module_name (str): Module name in dotted notation relative to the project root.
+            default (str): Value returned if the module is not a split binary and the fallback has
+                no label for it.
+
+        Returns:
+            label (str): Label of the split py_library, the label given by the fallback, or default.
+        """
+        if module_name not in self._labels:
+            self._labels[intern_string(module_name)] = intern_string(self._find_label(module_name))
+
+        label = self._labels[module_name]
+
+        if label is None and self.fallback is not None:
+            label = self.fallback.get(module_name)
+
+        return label if label is not None else default
+
+    def release(self):
+        """Forget the memoized labels, also of the fallback, to bound memory use."""
+        self._labels = dict()
+
+        if self.fallback is not None:
+            self.fallback.release()
+
+    def _find_label(self, module_name):
+        """Find the label of the py_library of a module, or None if the module is not split."""
+        parts = module_name.split('.')
+        directory = os.path.join(self.project_root, *parts[:-1])
+        script_path = os.path.join(directory, parts[-1] + '.py')
+
+        try:
+            with open(script_path, 'r') as script_file:
+                script_source = script_file.read()
+        except IOError:
+            return None
+
+        # Ignored scripts keep their hand-written rules.
+        if is_ignored(script_path, get_ignored_rules(os.path.join(directory, 'BUILD'))):
+            return None
+
+        # Only scripts with a main block are split, so the rule hooks run only for them and their
+        # calls are not counted in HOOK_STATS for every imported module.
+        try:
+            if '__main__' not in script_source or not has_main_block(script_source):
+                return None
+
+            bazel_rule_type = infer_bazel_rule_type(script_path, script_source,
+                                                    self.custom_bazel_rules)
+        except (RuntimeError, SyntaxError):
+            return None
+
+        if bazel_rule_type is not PyBinaryRule:
+            return None
+
+        return get_library_label(module_name)
@@ -0,0 +1,366 @@
+"""Tokenize and parse the Starlark subset used in Bazel BUILD files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import ast
+import re
+
+# Token kinds produced by tokenize.
+NAME = 'name'
+STRING = 'string'
+NUMBER = 'number'
+OP = 'op'
+COMMENT = 'comment'
+NEWLINE = 'newline'
+
+# Triple-quoted and single-quoted string literals written as "unrolled loops" so that matching is
+# linear in the length of the literal. An optional prefix such as r or b may precede the quotes.
+_STRING_PATTERN = r'''[rRbBuU]{0,2}(?:
+    """[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""
+  | \'\'\'[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*\'\'\'
+  | "[^"\\\n]*(?:\\.[^"\\\n]*)*"
+  | '[^'\\\n]*(?:\\.[^'\\\n]*)*'
+)'''
+
+_TOKEN_REGEX = re.compile(r'''
+    (?P<newline>\r?\n)
+  | (?P<skip>[ \t\f]+|\\\r?\n)
+  | (?P<comment>\#[^\r\n]*)
+  | (?P<string>''' + _STRING_PATTERN + r''')
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9][0-9A-Za-z_.]*)
+  | (?P<op>\*\*|//|==|!=|<=|>=|\+=|-=|[-+*/%=<>()\[\]{},.:;|&^~!])
+  | (?P<error>.)
+''', re.VERBOSE | re.DOTALL)
+
+_OPENING_BRACKETS = '([{'
+_CLOSING_BRACKETS = ')]}'
+
+_IGNORE_TAG_REGEX = re.compile(r'#\s*pazel-ignore\b')
+
+
+class Token(object):
+    """A single token of a BUILD file."""
+
+    __slots__ = ('kind', 'value', 'start', 'end')
+
+    def __init__(self, kind, value, start, end):
+        """Instantiate.
+
+        Args:
+            kind (str): Token kind, one of NAME, STRING, NUMBER, OP, COMMENT, and NEWLINE.
+            value (str): Source text of the token.
+            start (int): Index of the first character of the token in the source.
+            end (int): Index one past the last character of the token in the source.
+        """
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        """Return a readable representation of the token."""
+        return 'Token(%s, %r, %d, %d)' % (self.kind, self.value, self.start, self.end)
+
+
+def tokenize(source, start=0):
+    """Split BUILD file source code to tokens in a single linear pass.
+
+    Whitespace and line continuations are skipped. Characters that do not start any valid token
+    (e.g. an unterminated quote) are returned as single-character OP tokens so that tokenizing never
+    fails.
+
+    Args:
+        source (str): Source code of a BUILD file.
+        start (int): Index at which tokenizing starts.
+
+    Yields:
+        token (Token): The next token in the source.
+    """
+    match_token = _TOKEN_REGEX.match
+    pos = start
+    length = len(source)
+
+    while pos < length:
+        match = match_token(source, pos)
+        kind = match.lastgroup
+        end = match.end()
+
+        if kind != 'skip':
+            if kind == 'error':
+                kind = OP
+
+            yield Token(kind, match.group(), pos, end)
+
+        pos = end
+
+
+def decode_string(literal):
+    """Return the value of a Starlark string literal.
+
+    Args:
+        literal (str): String literal including its quotes and an optional prefix.
+
+    Returns:
+        value (str): Value of the literal.
+    """
+    prefix_length = 0
+
+    while literal[prefix_length] not in '"\'':
+        prefix_length += 1
+
+    prefix = literal[:prefix_length].lower()
+    quote_length = 3 if literal[prefix_length:prefix_length + 3] in ('"""', "'''") else 1
+    body = literal[prefix_length + quote_length:len(literal) - quote_length]
+
+    if 'r' in prefix or '\\' not in body:
+        return body
+
+    try:
+        return ast.literal_eval(literal[prefix_length:])
+    except (SyntaxError, ValueError):
+        return body
+
+
+def _literal_value(tokens):
+    """Return the value of a string or a list of strings, or None for other expressions."""
+    if len(tokens) == 1 and tokens[0].kind == STRING:
+        return decode_string(tokens[0].value)
+
+    if len(tokens) < 2 or tokens[0].value != '[' or tokens[-1].value != ']':
+        return None
+
+    values = []
+    expect_string = True
+
+    for token in tokens[1:-1]:
+        if expect_string and token.kind == STRING:
+            values.append(decode_string(token.value))
+        elif not expect_string and token.value == ',':
+            pass
+        else:
+            return None
+
+        expect_string = not expect_string
+
+    return values
+
+
+class RuleArgument(object):
+    """A positional or keyword argument of a rule in a BUILD file."""
+
+    __slots__ = ('name', 'start', 'value_start', 'end', 'value')
+
+    def __init__(self, name, start, value_start, end, value):
+        """Instantiate.
+
+        Args:
+            name (str): Keyword of the argument or None for positional arguments.
+            start (int): Index at which the argument (including its keyword) starts in the source.
+            value_start (int): Index at which the value of the argument starts in the source.
+            end (int): Index one past the end of the argument in the source.
+            value (str, list of str, or None): Value of the argument if it is a string or a list of
+                strings, otherwise None.
+        """
+        self.name = name
+        self.start = start
+        self.value_start = value_start
+        self.end = end
+        self.value = value
+
+
+class BuildRule(object):
+    """A top-level function call such as py_library(...) or load(...) in a BUILD file."""
+
+    def __init__(self, kind, text, start, end, args, kwargs, ignore_tag_start):
+        """Instantiate.
+
+        Args:
+            kind (str): Name of the called rule, e.g. 'py_library'.
+            text (str): Source text of the rule from its name to the closing parenthesis.
+            start (int): Index at which the rule starts in the source.
+            end (int): Index one past the closing parenthesis of the rule in the source.
+            args (list of RuleArgument): Positional arguments.
+            kwargs (dict): Mapping from keyword to RuleArgument.
+            ignore_tag_start (int): Index of a preceding "# pazel-ignore" comment, or None if the
+                rule is not ignored.
+        """
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        self.args = args
+        self.kwargs = kwargs
+        self.ignore_tag_start = ignore_tag_start
+
+    @property
+    def ignored(self):
+        """Whether the rule is preceded by the "# pazel-ignore" tag."""
+        return self.ignore_tag_start is not None
+
+    def get_name(self):
+        """Return the name of the rule given by 'name' or by the first positional argument.
+
+        Returns:
+            name (str): Name of the rule. None if it cannot be determined statically.
+        """
+        name_argument = self.kwargs.get('name') or (self.args[0] if self.args else None)
+
+        if name_argument is None or not isinstance(name_argument.value, str):
+            return None
+
+        return name_argument.value
+
+    def get_value_text(self, attribute):
+        """Return the value of a keyword argument exactly as written, or None if it is missing."""
+        argument = self.kwargs.get(attribute)
+
+        if argument is None:
+            return None
+
+        return self.text[argument.value_start - self.start:argument.end - self.start]
+
+    def get_srcs(self):
+        """Return the source files of the rule given by 'srcs' or by positional string arguments.
+
+        Returns:
+            srcs (list of str): Source file names. Empty if they cannot be determined statically.
+        """
+        srcs_argument = self.kwargs.get('srcs')
+
+        if srcs_argument is None:
+            # Custom rules may list the source files as positional arguments.
+            return [arg.value for arg in self.args if isinstance(arg.value, str)]
+
+        srcs = srcs_argument.value
+
+        if isinstance(srcs, list):
+            return srcs
+
+        return [srcs] if srcs is not None else []
+
+
+def _make_argument(tokens):
+    """Create a RuleArgument from the tokens between two commas of a rule."""
+    if len(tokens) > 2 and tokens[0].kind == NAME and tokens[1].value == '=':
+        name = tokens[0].value
+        value_tokens = tokens[2:]
+    else:
+        name = None
+        value_tokens = tokens
+
+    return RuleArgument(name, tokens[0].start, value_tokens[0].start, tokens[-1].end,
+                        _literal_value(value_tokens))
+
+
+def parse_rules(source):
+    """Parse all top-level rules of a BUILD file in a single linear pass.
+
+    Top-level statements other than plain function calls (e.g. assignments) are skipped. A rule is
+    marked as ignored if a "# pazel-ignore" comment appears between it and the previous statement.
+
+    Args:
+        source (str): Source code of a BUILD file.
+
+    Returns:
+        rules (list of BuildRule): Rules in the order they appear in the source.
+
+    Raises:
+        SyntaxError: If a rule has unbalanced brackets.
+    """
+    rules = []
+    tokens = tokenize(source)
+
+    at_statement_start = True
+    ignore_tag_start = None
+    previous = None     # Previous token at the start of a top-level statement.
+    depth = 0
+
+    for token in tokens:
+        kind = token.kind
+
+        if depth == 0 and kind == COMMENT:
+            if at_statement_start and _IGNORE_TAG_REGEX.match(token.value):
+                ignore_tag_start = token.start
+            continue
+
+        if depth == 0 and kind == NEWLINE:
+            at_statement_start = True
+            previous = None
+            continue
+
+        if kind == COMMENT or kind == NEWLINE:
+            continue
+
+        # A statement of the form NAME ( ... ) is a rule.
+        if previous is not None and token.value == '(' and depth == 0:
+            rules.append(_parse_rule(source, previous, tokens, ignore_tag_start))
+            ignore_tag_start = None
+            previous = None
+            at_statement_start = False
+            continue
+
+        if depth == 0 and (at_statement_start or previous is not None):
+            if at_statement_start and kind == NAME:
+                previous = token
+                at_statement_start = False
+                continue
+
+            # The statement is not a rule. The ignore tag only applies to the next statement.
+            ignore_tag_start = None
+
+        previous = None
+        at_statement_start = False
+
+        if kind == OP:
+            if token.value in _OPENING_BRACKETS:
+                depth += 1
+            elif token.value in _CLOSING_BRACKETS:
+                depth = max(depth - 1, 0)
+
+    return rules
+
+
+def _parse_rule(source, name_token, tokens, ignore_tag_start):
+    """Parse the arguments of a rule whose opening parenthesis has just been consumed."""
+    args = []
+    kwargs = {}
+    argument_tokens = []
+    depth = 1
+
+    for token in tokens:
+        if token.kind == COMMENT or token.kind == NEWLINE:
+            continue
+
+        value = token.value
+
+        if token.kind == OP:
+            if value in _OPENING_BRACKETS:
+                depth += 1
+            elif value in _CLOSING_BRACKETS:
+                depth -= 1
+
+        if depth == 0 or (depth == 1 and value == ','):
+            if argument_tokens:
+                argument = _make_argument(argument_tokens)
+
+                if argument.name is None:
+                    args.append(argument)
+                else:
+                    kwargs[argument.name] = argument
+
+                argument_tokens = []
+
+            if depth == 0:
+                start = name_token.start
+                end = token.end
+
+                return BuildRule(name_token.value, source[start:end], start, end, args, kwargs,
+                                 ignore_tag_start)
+        else:
+            argument_tokens.append(token)
+
+    raise SyntaxError("Unbalanced parentheses in rule %s starting at index %d."
+                      % (name_token.value, name_token.start))
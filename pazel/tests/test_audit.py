@@ -0,0 +1,118 @@
+"""Test auditing the deps of existing BUILD files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.audit import audit_build_files
+from pazel.audit import compare_deps
+from pazel.audit import has_problems
+from pazel.audit import normalize_label
+
+BUILD_SOURCE = """py_library(
+    name = "bar1",
+    srcs = ["bar1.py"],
+    deps = [requirement("NumPy")],
+)
+
+py_library(
+    name = "bar2",
+    srcs = ["bar2.py"],
+    deps = [
+        ":bar1",
+        "//old:bar3",
+        requirement("requests"),
+    ],
+)
+
+py_binary(
+    name = "bar3",
+    srcs = ["bar3.py"],
+    deps = [":bar1"] + select({"//conditions:default": []}),
+)
+
+genrule(
+    name = "gen",
+    srcs = ["data.txt"],
+)
+"""
+
+
+class TestAudit(unittest.TestCase):
+    """Test auditing the deps of existing BUILD files."""
+
+    def setUp(self):
+        """Create a project with a stale BUILD file."""
+        self.project_root = tempfile.mkdtemp()
+        files = {
+            '.pazelrc': "EXTRA_IMPORT_NAME_TO_PIP_NAME = {'yaml': 'pyyaml'}\n",
+            'foo/__init__.py': '',
+            'foo/bar1.py': 'import numpy\n',
+            'foo/bar2.py': 'import yaml\nfrom foo import bar1\nfrom foo import bar3\n',
+            'foo/bar3.py': 'from foo import bar1\n',
+            'foo/BUILD': BUILD_SOURCE,
+        }
+
+        for relative_path, content in files.items():
+            path = os.path.join(self.project_root, relative_path)
+
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'w') as project_file:
+                project_file.write(content)
+
+    def tearDown(self):
+        """Remove the project."""
+        shutil.rmtree(self.project_root)
+
+    def test_normalize_label(self):
+        """Test writing labels in their absolute form."""
+        self.assertEqual(normalize_label(':bar', 'foo'), '//foo:bar')
+        self.assertEqual(normalize_label('bar', ''), '//:bar')
+        self.assertEqual(normalize_label('//foo/bar', 'x'), '//foo/bar:bar')
+        self.assertEqual(normalize_label('@repo//foo', 'x'), '@repo//foo:foo')
+        self.assertEqual(normalize_label('//foo:bar', 'x'), '//foo:bar')
+        self.assertEqual(normalize_label('requirement("x")', 'x'), 'requirement("x")')
+
+    def test_compare_deps(self):
+        """Test classifying deps as unused, missing, and mislabeled."""
+        unused, missing, mislabeled = compare_deps(
+            ['//a:x', '//old:y', 'requirement("PyYAML")', '//a:z'],
+            ['//a:x', '//new:y', 'requirement("pyyaml")', '//a:w'])
+
+        self.assertEqual(unused, ['//a:z'])
+        self.assertEqual(missing, ['//a:w'])
+        self.assertEqual(mislabeled, [('//old:y', '//new:y'),
+                                      ('requirement("PyYAML")', 'requirement("pyyaml")')])
+
+    def test_audit_build_files(self):
+        """Test auditing a stale BUILD file without modifying it."""
+        findings = audit_build_files(self.project_root, self.project_root, False,
+                                     os.path.join(self.project_root, '.pazelrc'))
+        findings = dict((finding['rule'], finding) for finding in findings)
+
+        self.assertEqual(sorted(findings), ['bar1', 'bar2', 'bar3'])
+
+        self.assertEqual(findings['bar1']['mislabeled'],
+                         [{'existing': 'requirement("NumPy")', 'expected': 'requirement("numpy")'}])
+
+        self.assertEqual(findings['bar2']['unused'], ['requirement("requests")'])
+        self.assertEqual(findings['bar2']['missing'], ['requirement("pyyaml")'])
+        self.assertEqual(findings['bar2']['mislabeled'],
+                         [{'existing': '//old:bar3', 'expected': '//foo:bar3'}])
+
+        self.assertIn('skipped', findings['bar3'])
+        self.assertFalse(has_problems(findings['bar3']))
+
+        with open(os.path.join(self.project_root, 'foo', 'BUILD'), 'r') as build_file:
+            self.assertEqual(build_file.read(), BUILD_SOURCE)
+
+
+if __name__ == '__main__':
+    unittest.main()
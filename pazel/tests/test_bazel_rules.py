@@ -7,8 +7,11 @@ from __future__ import print_function
 import unittest
 
 from pazel.bazel_rules import BazelRule
+from pazel.bazel_rules import count_test_cases
 from pazel.bazel_rules import get_native_bazel_rules
+from pazel.bazel_rules import get_shard_count
 from pazel.bazel_rules import infer_bazel_rule_type
+from pazel.bazel_rules import passes_prefilters
 from pazel.bazel_rules import PyBinaryRule
 from pazel.bazel_rules import PY_BINARY_TEMPLATE
 from pazel.bazel_rules import PyLibraryRule
@@ -65,6 +68,8 @@ class TestTemplates(unittest.TestCase):
         """Test PY_TEST_TEMPLATE."""
         name = 'my_test'
         size = 'medium'
+        timeout = 'timeout = "long",'
+        shard_count = 'shard_count = 4,'
         data = 'data = ["something"],'
         deps = "deps = ['//foo:bar']"
 
@@ -72,12 +77,15 @@ class TestTemplates(unittest.TestCase):
     name = "my_test",
     srcs = ["my_test.py"],
     size = "medium",
+    timeout = "long",
+    shard_count = 4,
     data = ["something"],
     deps = ['//foo:bar']
 )"""
 
         # Generate the rule and strip empty lines.
-        generated = PY_TEST_TEMPLATE.format(name=name, size=size, data=data, deps=deps)
+        generated = PY_TEST_TEMPLATE.format(name=name, size=size, timeout=timeout,
+                                            shard_count=shard_count, data=data, deps=deps)
         generated = self._format_generated(generated)
 
         self.assertEqual(generated, expected)
@@ -204,6 +212,44 @@ class TestPyTestRule(unittest.TestCase):
         self.assertEqual(PyTestRule.applies_to(test_script_name, test_source), True)
 
 
+class TestTestSharding(unittest.TestCase):
+    """Test counting test cases and choosing the number of shards."""
+
+    def test_count_test_cases(self):
+        """Test count_test_cases."""
+        source = """
+import unittest
+
+class Helper(object):
+    def test_not_a_test(self):
+        pass
+
+class TestA(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_a1(self):
+        pass
+
+    def test_a2(self):
+        pass
+
+class TestB(TestA):
+    def test_b1(self):
+        pass
+"""
+        self.assertEqual(count_test_cases(source), (2, 5))
+        self.assertEqual(count_test_cases(test_source), (1, 0))
+        self.assertEqual(count_test_cases('invalid syntax ('), (0, 0))
+
+    def test_get_shard_count(self):
+        """Test get_shard_count."""
+        self.assertIsNone(get_shard_count(10, None))
+        self.assertIsNone(get_shard_count(10, 10))
+        self.assertEqual(get_shard_count(11, 10), 2)
+        self.assertEqual(get_shard_count(100000, 10), 50)
+
+
 class TestNativeBazelRules(unittest.TestCase):
     """Test getting native Bazel rule classes."""
 
@@ -230,5 +276,41 @@ class TestBazelRuleInference(unittest.TestCase):
                          PyTestRule)
 
 
+class TestPrefilters(unittest.TestCase):
+    """Test prefiltering rules before calling applies_to."""
+
+    def test_passes_prefilters(self):
+        """Test passes_prefilters for each kind of prefilter."""
+        class FilteredRule(BazelRule):
+            filename_patterns = ['*_doc.py']
+            import_prefixes = ['doctest']
+            source_substrings = ['doctest.testmod']
+
+        source = 'import doctest\ndoctest.testmod()\n'
+
+        self.assertTrue(passes_prefilters(FilteredRule, 'my_doc.py', source, set(['doctest']), {}))
+        self.assertFalse(passes_prefilters(FilteredRule, 'my.py', source, set(['doctest']), {}))
+        self.assertFalse(passes_prefilters(FilteredRule, 'my_doc.py', source, set(['os']), {}))
+        self.assertFalse(passes_prefilters(FilteredRule, 'my_doc.py', 'import doctest', None, {}))
+
+        # Unknown imports do not filter out rules.
+        self.assertTrue(passes_prefilters(FilteredRule, 'my_doc.py', source, None, {}))
+
+        # Rules without prefilters always pass.
+        self.assertTrue(passes_prefilters(PyLibraryRule, 'my.py', source, set(), {}))
+
+    def test_prefiltered_custom_rule_is_not_called(self):
+        """Test that applies_to of a prefiltered custom rule is not called."""
+        class NeverCalledRule(BazelRule):
+            source_substrings = ['never in source']
+
+            @staticmethod
+            def applies_to(script_name, script_source):
+                raise AssertionError("applies_to should not be called.")
+
+        self.assertEqual(infer_bazel_rule_type(script_name, module_source, [NeverCalledRule]),
+                         PyLibraryRule)
+
+
 if __name__ == '__main__':
     unittest.main()
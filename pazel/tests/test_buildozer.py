@@ -0,0 +1,119 @@
+"""Test expressing changes to BUILD files as buildozer commands."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.buildozer import BuildozerCommands
+
+EXISTING_BUILD_SOURCE = """load("@my_deps//:requirements.bzl", "requirement")
+
+py_library(
+    name = "a",
+    srcs = ["a.py"],
+    deps = [
+        ":b",
+        "@pip//six",
+    ],
+    visibility = ["//visibility:public"],
+)
+
+py_test(
+    name = "test_a",
+    srcs = ["test_a.py"],
+    size = "small",
+    shard_count = 4,
+    deps = [":a"],
+)
+
+py_library(
+    name = "gone",
+    srcs = ["gone.py"],
+)
+
+# pazel-ignore
+py_library(
+    name = "x",
+    srcs = ["x.py"],
+)
+"""
+
+GENERATED_BUILD_SOURCE = """py_library(
+    name = "a",
+    srcs = ["a.py"],
+    deps = [
+        "//foo:c",
+        requirement("pyyaml"),
+        requirement("six"),
+    ],
+)
+
+py_test(
+    name = "test_a",
+    srcs = ["test_a.py"],
+    size = "medium",
+    deps = ["//foo:a"],
+)
+
+py_binary(
+    name = "c",
+    srcs = ["c.py"],
+)"""
+
+
+class TestBuildozerCommands(unittest.TestCase):
+    """Test the buildozer commands of a directory."""
+
+    def setUp(self):
+        """Create a BUILD file."""
+        self.directory = tempfile.mkdtemp()
+        self.build_file_path = os.path.join(self.directory, 'BUILD')
+
+        with open(self.build_file_path, 'w') as build_file:
+            build_file.write(EXISTING_BUILD_SOURCE)
+
+    def tearDown(self):
+        """Remove the BUILD file."""
+        shutil.rmtree(self.directory)
+
+    def test_add_directory(self):
+        """Test the delta between the existing and the generated rules."""
+        commands = BuildozerCommands([], '@pip//{name}')
+        commands.add_directory(self.build_file_path, GENERATED_BUILD_SOURCE, 'foo')
+
+        self.assertEqual(commands.format(), 'delete|//foo:gone\n'
+                                            'remove deps :b|//foo:a\n'
+                                            'add deps //foo:c @pip//pyyaml|//foo:a\n'
+                                            'set size "medium"|//foo:test_a\n'
+                                            'remove shard_count|//foo:test_a\n'
+                                            'new py_binary c|//foo:__pkg__\n'
+                                            'add srcs c.py|//foo:c\n')
+
+    def test_data_only_directory(self):
+        """Test that the BUILD file of a directory without Python files is kept as it is."""
+        with open(self.build_file_path, 'w') as build_file:
+            build_file.write('py_library(\n    name = "data",\n    data = glob(["*.csv"]),\n)\n')
+
+        commands = BuildozerCommands([])
+        commands.add_directory(self.build_file_path, '', 'data')
+
+        self.assertEqual(commands.lines, [])
+
+    def test_unsupported(self):
+        """Test that changes buildozer cannot make are left as comments."""
+        commands = BuildozerCommands([])
+        commands.add_directory(os.path.join(self.directory, 'missing', 'BUILD'),
+                               'py_library(\n    name = "a",\n    deps = [requirement("six")],\n)',
+                               '')
+
+        self.assertEqual(commands.lines, ['new py_library a|//:__pkg__',
+                                          '# //:a: cannot add or remove requirement("six")'])
+
+
+if __name__ == '__main__':
+    unittest.main()
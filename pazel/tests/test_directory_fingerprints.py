@@ -0,0 +1,107 @@
+"""Test skipping unchanged directories with directory fingerprints."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.directory_fingerprints import ALL_DIRECTORIES
+from pazel.directory_fingerprints import DirectoryFingerprints
+from pazel.directory_fingerprints import get_import_directories
+from pazel.directory_fingerprints import IMPORT_DIRECTORIES
+from pazel.parse_imports import infer_import_type
+
+
+class TestDirectoryFingerprints(unittest.TestCase):
+    """Test skipping unchanged directories with directory fingerprints."""
+
+    def setUp(self):
+        """Create a project with two packages."""
+        self.project_root = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+
+        for relative_path in ['foo/__init__.py', 'foo/bar.py', 'foo/sub/baz.py', 'xyz/abc.py']:
+            self._write(relative_path, 'x = 1\n')
+
+    def tearDown(self):
+        """Remove the project and the cache."""
+        shutil.rmtree(self.project_root)
+        shutil.rmtree(self.cache_dir)
+
+    def _write(self, relative_path, content):
+        """Write a file of the project."""
+        path = os.path.join(self.project_root, relative_path)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as project_file:
+            project_file.write(content)
+
+    def _run(self, dependencies, configuration=None):
+        """Record every directory of the project with the given dependencies, like a run of app."""
+        fingerprints = DirectoryFingerprints(self.project_root, self.cache_dir, configuration)
+
+        for relative_directory in ['.', 'foo', 'foo/sub', 'xyz']:
+            fingerprints.record(relative_directory, dependencies.get(relative_directory, set()))
+
+        fingerprints.save()
+
+    def _load(self, configuration=None):
+        """Load the fingerprints of the previous run."""
+        return DirectoryFingerprints(self.project_root, self.cache_dir, configuration)
+
+    def test_get_import_directories(self):
+        """Test the directories in which imports are resolved."""
+        self.assertEqual(get_import_directories('a.b', 'c'), ['.', 'a', 'a/b', 'a/b/c'])
+        self.assertEqual(get_import_directories('a', None), ['.', 'a'])
+        self.assertEqual(get_import_directories('a', '*'), ['.', 'a'])
+
+    def test_record_imports(self):
+        """Test recording the directories in which imports are resolved."""
+        IMPORT_DIRECTORIES.start()
+        infer_import_type([('foo.bar', 'x'), ('os', None)], self.project_root, False, [])
+
+        # The standard library is not resolved against the project tree.
+        self.assertEqual(IMPORT_DIRECTORIES.stop(), set(['.', 'foo', 'foo/bar', 'foo/bar/x']))
+
+    def test_unchanged(self):
+        """Test that directories and subtrees are unchanged until their files change."""
+        self._run({'xyz': set(['.', 'foo'])})
+        fingerprints = self._load()
+
+        self.assertTrue(fingerprints.is_subtree_unchanged('.'))
+        self.assertTrue(fingerprints.is_unchanged('xyz'))
+
+        # Edits in place change the size or the modification time of the file.
+        self._write('foo/sub/baz.py', 'x = 12\n')
+        fingerprints = self._load()
+
+        self.assertFalse(fingerprints.is_unchanged('foo/sub'))
+        self.assertFalse(fingerprints.is_subtree_unchanged('foo'))
+        self.assertTrue(fingerprints.is_unchanged('foo'))
+        self.assertTrue(fingerprints.is_subtree_unchanged('xyz'))
+
+    def test_dependencies(self):
+        """Test that a new module invalidates the directories that resolve imports against it."""
+        self._run({'xyz': set(['.', 'foo', 'foo/bar']), 'foo/sub': set([ALL_DIRECTORIES])})
+        self._write('foo/bar/__init__.py', 'x = 1\n')
+        fingerprints = self._load()
+
+        self.assertFalse(fingerprints.is_unchanged('xyz'))
+        self.assertFalse(fingerprints.is_unchanged('foo/sub'))
+        self.assertTrue(fingerprints.is_unchanged('.'))
+
+        # Another configuration discards the fingerprints.
+        self._run({})
+
+        self.assertTrue(self._load().is_unchanged('xyz'))
+        self.assertFalse(self._load(['--fast-imports']).is_unchanged('xyz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Test mapping import names to distribution names."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.distribution_index import build_distribution_index
+from pazel.distribution_index import get_distribution_index
+from pazel.distribution_index import normalize_distribution_name
+from pazel.distribution_index import read_lock_file
+from pazel.distribution_index import read_pinned_requirements
+
+
+class TestDistributionIndex(unittest.TestCase):
+    """Test building the distribution index from installed metadata."""
+
+    def setUp(self):
+        """Create a fake site-packages directory."""
+        self.directory = tempfile.mkdtemp()
+        self.site_packages = os.path.join(self.directory, 'site-packages')
+        os.mkdir(self.site_packages)
+
+        self._add_distribution('PyYAML-5.1.dist-info', 'PyYAML', top_level='yaml\n_yaml\n')
+        self._add_distribution('python_dateutil-2.8.dist-info', 'python-dateutil',
+                               record='dateutil/__init__.py,,\n'
+                                      'dateutil/parser.py,,\n'
+                                      'python_dateutil-2.8.dist-info/RECORD,,\n'
+                                      '../../bin/tool,,\n')
+        self._add_distribution('six-1.12.dist-info', 'six', record='six.py,,\n')
+        self._add_distribution('google_a-1.0.dist-info', 'google-a', top_level='google\n')
+        self._add_distribution('google_b-1.0.dist-info', 'google-b', top_level='google\n')
+
+    def tearDown(self):
+        """Remove the fake site-packages directory."""
+        shutil.rmtree(self.directory)
+
+    def _add_distribution(self, dirname, name, top_level=None, record=None):
+        metadata_dir = os.path.join(self.site_packages, dirname)
+        os.mkdir(metadata_dir)
+
+        with open(os.path.join(metadata_dir, 'METADATA'), 'w') as metadata_file:
+            metadata_file.write('Metadata-Version: 2.1\nName: %s\n\nName: wrong\n' % name)
+
+        for filename, content in (('top_level.txt', top_level), ('RECORD', record)):
+            if content is not None:
+                with open(os.path.join(metadata_dir, filename), 'w') as metadata_file:
+                    metadata_file.write(content)
+
+    def test_normalize_distribution_name(self):
+        """Test normalizing distribution names."""
+        self.assertEqual(normalize_distribution_name('Foo_Bar.baz--x'), 'foo-bar-baz-x')
+
+    def test_build_distribution_index(self):
+        """Test reading import names from top_level.txt and RECORD files."""
+        index = build_distribution_index([self.site_packages])
+
+        expected_index = {'yaml': 'PyYAML', '_yaml': 'PyYAML', 'dateutil': 'python-dateutil',
+                          'six': 'six'}
+
+        # 'google' is provided by two distributions, so it cannot be resolved.
+        self.assertEqual(index, expected_index)
+
+    def test_lock_file(self):
+        """Test that only distributions pinned in a lock file are indexed."""
+        lock_path = os.path.join(self.directory, 'requirements.txt')
+
+        with open(lock_path, 'w') as lock_file:
+            lock_file.write('# Generated file.\n'
+                            'pyyaml==5.1 \\\n'
+                            '    --hash=sha256:abc\n'
+                            'typing-extensions[extra]==3.7  # via foo\n'
+                            '-r other.txt\n')
+
+        allowed_names = read_lock_file(lock_path)
+
+        self.assertEqual(allowed_names, {'pyyaml': 'pyyaml',
+                                         'typing-extensions': 'typing-extensions'})
+
+        index = build_distribution_index([self.site_packages], allowed_names)
+
+        self.assertEqual(index, {'yaml': 'pyyaml', '_yaml': 'pyyaml',
+                                 'typing_extensions': 'typing-extensions'})
+
+    def test_read_pinned_requirements(self):
+        """Test reading pinned requirements and the '# via' comments of pip-compile."""
+        lock_path = os.path.join(self.directory, 'requirements.txt')
+
+        with open(lock_path, 'w') as lock_file:
+            lock_file.write('--index-url https://example.com\n'
+                            'numpy==1.16.0 \\\n'
+                            '    --hash=sha256:abc \\\n'
+                            '    --hash=sha256:def\n'
+                            '    # via\n'
+                            '    #   -r requirements.in\n'
+                            '    #   Pandas\n'
+                            'pandas==0.24.0\n'
+                            '    # via -r requirements.in\n'
+                            'python_dateutil==2.8.0    # via pandas\n'
+                            'six==1.12 ; python_version < "3"\n')
+
+        pins, dependents = read_pinned_requirements(lock_path)
+
+        self.assertEqual(pins, {'numpy': ['numpy==1.16.0', '--hash=sha256:abc',
+                                          '--hash=sha256:def'],
+                                'pandas': ['pandas==0.24.0'],
+                                'python-dateutil': ['python_dateutil==2.8.0'],
+                                'six': ['six==1.12 ; python_version < "3"']})
+        self.assertEqual(dependents, {'numpy': set(['pandas']), 'python-dateutil': set(['pandas'])})
+
+    def test_cache(self):
+        """Test that the index is cached until the installed distributions change."""
+        cache_dir = os.path.join(self.directory, 'cache')
+        os.utime(self.site_packages, (1000000000, 1000000000))
+        index = get_distribution_index([self.site_packages], cache_dir=cache_dir)
+
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        # Change the metadata of a distribution without changing site-packages itself.
+        os.remove(os.path.join(self.site_packages, 'six-1.12.dist-info', 'RECORD'))
+
+        self.assertEqual(get_distribution_index([self.site_packages], cache_dir=cache_dir), index)
+
+        # Installing or uninstalling changes the modification time, so the index is rebuilt.
+        os.utime(self.site_packages, (1000000010, 1000000010))
+
+        self.assertNotIn('six', get_distribution_index([self.site_packages], cache_dir=cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Test collecting per-file failures."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import signal
+import unittest
+
+from pazel.error_report import ErrorCollector
+from pazel.error_report import format_errors
+from pazel.parse_imports import get_imports
+
+
+class TestErrorCollector(unittest.TestCase):
+    """Test collecting per-file failures."""
+
+    def test_collect(self):
+        """Test that failures are attributed to their files and abandon only their directory."""
+        error_collector = ErrorCollector(keep_going=True)
+        reached = []
+
+        with error_collector.collect('foo/BUILD'):
+            with error_collector.check('foo/bad.py'):
+                get_imports('def broken(:\n')
+                reached.append('foo/bad.py')
+
+            with error_collector.check('foo/good.py'):
+                get_imports('import os\n')
+                reached.append('foo/good.py')
+
+            with error_collector.check('foo/worse.py'):
+                get_imports('def broken(:\n')
+
+            reached.append('foo')
+            error_collector.abandon_if_failed()
+            reached.append('foo/BUILD')
+
+        with error_collector.collect('bar/BUILD'):
+            error_collector.abandon_if_failed()
+            reached.append('bar/BUILD')
+
+        # All files of the directory are handled, but its BUILD file is not written.
+        self.assertEqual(reached, ['foo/good.py', 'foo', 'bar/BUILD'])
+        self.assertEqual([file_error.path for file_error in error_collector.errors],
+                         ['foo/bad.py', 'foo/worse.py'])
+
+        file_error = error_collector.errors[0]
+
+        self.assertEqual(file_error.phase, 'parsing imports')
+        self.assertTrue(file_error.error.startswith('SyntaxError: '))
+
+        self.assertEqual(format_errors(error_collector.errors).splitlines()[1],
+                         '  foo/bad.py: %s while parsing imports' % file_error.error)
+        self.assertEqual(format_errors([]), '')
+
+        # A failure outside the checks of single files is attributed to the BUILD file.
+        with error_collector.collect('baz/BUILD'):
+            raise RuntimeError("Invalid ignored rule.")
+
+        self.assertEqual(error_collector.errors[-1].path, 'baz/BUILD')
+
+    def test_propagate(self):
+        """Test that exceptions propagate as is without keep_going."""
+        error_collector = ErrorCollector()
+
+        with self.assertRaises(SyntaxError):
+            with error_collector.collect('foo/BUILD'):
+                with error_collector.check('foo/bad.py'):
+                    get_imports('def broken(:\n')
+
+    @unittest.skipUnless(hasattr(signal, 'setitimer'), "Timers are not available.")
+    def test_time_budget(self):
+        """Test that a file exceeding its time budget fails."""
+        error_collector = ErrorCollector(keep_going=True, file_time_budget=0.05)
+
+        with error_collector.collect('foo/BUILD'):
+            with error_collector.check('foo/slow.py'):
+                while True:
+                    pass
+
+        self.assertEqual(len(error_collector.errors), 1)
+        self.assertTrue(error_collector.errors[0].error.startswith('FileTimeoutError: '))
+
+        # The timer is stopped after the check.
+        with error_collector.collect('bar/BUILD'):
+            with error_collector.check('bar/fast.py'):
+                pass
+
+        self.assertEqual(len(error_collector.errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
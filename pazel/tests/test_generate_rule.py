@@ -4,8 +4,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+import shutil
+import tempfile
 import unittest
 
+from pazel.generate_rule import format_list_attribute
+from pazel.generate_rule import generate_aggregate_rule
+from pazel.generate_rule import parse_directory_and_generate_rules
 from pazel.generate_rule import sort_module_names
 
 
@@ -22,6 +28,57 @@ class TestGenerateRule(unittest.TestCase):
 
         self.assertEqual(sorted_modules, expected_sorted_modules)
 
+    def test_format_list_attribute(self):
+        """Test format_list_attribute."""
+        self.assertEqual(format_list_attribute('deps', []), '')
+        self.assertEqual(format_list_attribute('deps', ['":a"']), 'deps = [":a"],')
+        self.assertEqual(format_list_attribute('deps', ['":a"', '":b"']),
+                         'deps = [\n        ":a",\n        ":b",\n    ],')
+
+    def test_generate_aggregate_rule(self):
+        """Test generating a py_library for all libraries in a directory."""
+        rule = generate_aggregate_rule('foo', '//foo:foo', ['foo/b.py', 'foo/a.py'], set(['yaml']),
+                                       set(['foo.a', 'xyz.abc']), None, {'yaml': 'pyyaml'}, {},
+                                       {'foo.a': '//foo:foo'})
+
+        expected_rule = """py_library(
+    name = "foo",
+    srcs = [
+        "a.py",
+        "b.py",
+    ],
+    deps = [
+        "//xyz:abc",
+        requirement("pyyaml"),
+    ],
+)"""
+
+        self.assertEqual(rule, expected_rule)
+
+    def test_aggregate_name_collision(self):
+        """Test that a directory falls back to file granularity if its name is taken."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            directory = os.path.join(project_root, 'bar')
+            os.makedirs(directory)
+            script_paths = [os.path.join(directory, name) for name in ('bar.py', 'lib.py')]
+
+            with open(script_paths[0], 'w') as script_file:
+                script_file.write('def main():\n    pass\n\nmain()\n')
+
+            with open(script_paths[1], 'w') as script_file:
+                script_file.write('x = 1\n')
+
+            rules = parse_directory_and_generate_rules(directory, script_paths, project_root,
+                                                       False, [], [], {}, {}, None)
+
+            self.assertEqual([rule.split('"')[1] for rule in rules], ['bar', 'lib'])
+            self.assertTrue(rules[0].startswith('py_binary('))
+            self.assertTrue(rules[1].startswith('py_library('))
+        finally:
+            shutil.rmtree(project_root)
+
 
 if __name__ == '__main__':
     unittest.main()
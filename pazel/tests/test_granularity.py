@@ -0,0 +1,122 @@
+"""Test aggregating the libraries of a directory to a single target."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.granularity import AggregatedModuleLabels
+from pazel.granularity import get_aggregate_label
+from pazel.granularity import get_aggregate_name
+from pazel.granularity import get_granularity
+
+
+class TestGranularity(unittest.TestCase):
+    """Test aggregating the libraries of a directory to a single target."""
+
+    def test_get_granularity(self):
+        """Test that the granularity of the closest configured parent directory is used."""
+        directory_granularity = {'foo': 'directory', 'foo/bar': 'file'}
+
+        self.assertEqual(get_granularity('.', 'file', directory_granularity), 'file')
+        self.assertEqual(get_granularity('xyz', 'file', directory_granularity), 'file')
+        self.assertEqual(get_granularity('foo', 'file', directory_granularity), 'directory')
+        self.assertEqual(get_granularity('foo/abc', 'file', directory_granularity), 'directory')
+        self.assertEqual(get_granularity('foo/bar/abc', 'file', directory_granularity), 'file')
+        self.assertEqual(get_granularity('xyz', 'directory', {}), 'directory')
+
+    def test_get_aggregate_label(self):
+        """Test get_aggregate_label."""
+        self.assertEqual(get_aggregate_label('foo/bar', 'bar'), '//foo/bar:bar')
+        self.assertEqual(get_aggregate_label('.', 'app'), '//:app')
+
+    def test_aggregated_module_labels(self):
+        """Test that only libraries in aggregated directories map to the aggregate label."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            for directory in ('foo', 'xyz'):
+                os.makedirs(os.path.join(project_root, directory))
+
+            sources = {'foo/lib.py': 'x = 1\n',
+                       'foo/main.py': 'def main():\n    pass\n\nmain()\n',
+                       'xyz/lib.py': 'x = 1\n'}
+
+            for path, source in sources.items():
+                with open(os.path.join(project_root, path), 'w') as script_file:
+                    script_file.write(source)
+
+            module_labels = AggregatedModuleLabels(project_root, 'file', {'foo': 'directory'}, [])
+
+            self.assertEqual(module_labels.get('foo.lib'), '//foo:foo')
+            self.assertIsNone(module_labels.get('foo.main'))
+            self.assertIsNone(module_labels.get('foo.missing'))
+            self.assertIsNone(module_labels.get('xyz.lib'))
+
+            # Labels are memoized until they are released, e.g. after each directory.
+            with open(os.path.join(project_root, 'foo/missing.py'), 'w') as script_file:
+                script_file.write('x = 1\n')
+
+            self.assertIsNone(module_labels.get('foo.missing'))
+
+            module_labels.release()
+            self.assertEqual(module_labels.get('foo.missing'), '//foo:foo')
+        finally:
+            shutil.rmtree(project_root)
+
+    def test_get_aggregate_name(self):
+        """Test that the aggregate py_library does not take the name of another rule."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            sources = {'foo/lib.py': 'x = 1\n',
+                       'foo/foo.py': 'x = 1\n',
+                       'bar/lib.py': 'x = 1\n',
+                       'bar/bar.py': 'def main():\n    pass\n\nmain()\n',
+                       'baz_lib/baz.py': 'def main():\n    pass\n\nif __name__ == "__main__":\n'
+                                         '    main()\n',
+                       'abc/lib.py': 'x = 1\n',
+                       'abc/BUILD': '# pazel-ignore\nfilegroup(\n    name = "abc",\n)\n'}
+
+            for path, source in sources.items():
+                path = os.path.join(project_root, path)
+
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+
+                with open(path, 'w') as script_file:
+                    script_file.write(source)
+
+            def get_name(directory, split_binaries=False):
+                """Get the aggregate name of a directory of the project."""
+                return get_aggregate_name(os.path.join(project_root, directory), project_root, [],
+                                          split_binaries)
+
+            # A library named after the directory is part of the aggregate.
+            self.assertEqual(get_name('foo'), 'foo')
+
+            # The py_binary of bar/bar.py, the py_library split from baz_lib/baz.py, and the
+            # ignored rule abc/BUILD:abc already take the names.
+            self.assertIsNone(get_name('bar'))
+            self.assertEqual(get_name('baz_lib'), 'baz_lib')
+            self.assertIsNone(get_name('baz_lib', split_binaries=True))
+            self.assertIsNone(get_name('abc'))
+
+            # The name of the project root depends on the checkout.
+            self.assertIsNone(get_name('.'))
+
+            # Without an aggregate name, the libraries of the directory keep their own labels.
+            module_labels = AggregatedModuleLabels(project_root, 'directory', {}, [])
+
+            self.assertEqual(module_labels.get('foo.lib'), '//foo:foo')
+            self.assertIsNone(module_labels.get('bar.lib'))
+        finally:
+            shutil.rmtree(project_root)
+
+
+if __name__ == '__main__':
+    unittest.main()
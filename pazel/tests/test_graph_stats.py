@@ -0,0 +1,75 @@
+"""Test fan-in, fan-out, and closure statistics."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from pazel.graph_stats import compute_closures
+from pazel.graph_stats import compute_target_stats
+from pazel.graph_stats import format_target_stats
+from pazel.graph_stats import get_histogram
+from pazel.graph_stats import get_package_fan_in
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import ImportGraph
+
+
+class TestGraphStats(unittest.TestCase):
+    """Test statistics of a small graph with a cycle."""
+
+    def setUp(self):
+        """Create a graph where a imports b, b and c import each other, and c imports numpy."""
+        graph = ImportGraph()
+        a, b, c, d = [graph.add_node(name) for name in ('a', 'b', 'c', 'd')]
+        numpy = graph.add_node('numpy', EXTERNAL_PACKAGE)
+
+        for node_id, size in ((a, 10), (b, 20), (c, 40), (d, 80)):
+            graph.set_script(node_id, 'py_library', size)
+
+        for source, target in ((a, b), (b, c), (c, b), (c, numpy)):
+            graph.add_edge(source, target)
+
+        self.graph = graph
+        self.ids = (a, b, c, d, numpy)
+
+    def test_compute_closures(self):
+        """Test the transitive successors and predecessors as bitsets."""
+        a, b, c, d, numpy = self.ids
+        successors, predecessors = compute_closures(self.graph)
+
+        def bits(*node_ids):
+            return sum(1 << node_id for node_id in node_ids)
+
+        self.assertEqual(successors[a], bits(b, c, numpy))
+        self.assertEqual(successors[b], bits(b, c, numpy))
+        self.assertEqual(successors[d], 0)
+        self.assertEqual(predecessors[numpy], bits(a, b, c))
+        self.assertEqual(predecessors[b], bits(a, b, c))
+        self.assertEqual(predecessors[a], 0)
+
+    def test_compute_target_stats(self):
+        """Test the statistics of each target."""
+        stats = dict((target.name, target) for target in compute_target_stats(self.graph))
+
+        self.assertEqual(sorted(stats), ['a', 'b', 'c', 'd'])
+        self.assertEqual(stats['a'].to_dict(), {
+            'name': 'a', 'rule': 'py_library', 'fan_in': 0, 'fan_out': 1, 'transitive_fan_in': 0,
+            'transitive_fan_out': 3, 'transitive_bytes': 70, 'external_packages': ['numpy']})
+
+        # Modules in a cycle do not count themselves.
+        self.assertEqual(stats['b'].transitive_fan_in, 2)
+        self.assertEqual(stats['b'].transitive_fan_out, 2)
+        self.assertEqual(stats['b'].transitive_bytes, 60)
+
+        self.assertEqual(get_package_fan_in(list(stats.values())), [('numpy', 3)])
+        self.assertIn('Top 2:', format_target_stats(list(stats.values()), top=2))
+
+    def test_get_histogram(self):
+        """Test counting values in power-of-two buckets."""
+        self.assertEqual(get_histogram([0, 1, 2, 3, 7, 8, 0]),
+                         [(0, 0, 2), (1, 1, 1), (2, 3, 2), (4, 7, 1), (8, 15, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
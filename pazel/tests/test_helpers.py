@@ -4,8 +4,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import json
 import unittest
 
+from pazel.helpers import intern_string
+from pazel.helpers import is_ignored
 from pazel.helpers import parse_enclosed_expression
 
 
@@ -38,6 +41,39 @@ class TestHelpers(unittest.TestCase):
 
         self.assertEqual(expression, expected_expression)
 
+    def test_parse_enclosed_expression_with_strings(self):
+        """Test that parse_enclosed_expression skips brackets in strings and comments."""
+        expected_expression = """py_library(
+            name = "foo)",  # Closing ) in a comment.
+            srcs = ["foo.py"],
+        )"""
+
+        source = 'text ' + expected_expression + ' more text)'
+        start = source.find('py_library')
+
+        expression = parse_enclosed_expression(source, start, '(')
+
+        self.assertEqual(expression, expected_expression)
+
+    def test_intern_string(self):
+        """Test that equal strings are interned to the same object."""
+        module_name = '.'.join(['foo', 'bar'])
+
+        self.assertIs(intern_string(module_name), intern_string('foo.bar'))
+        self.assertIsNone(intern_string(None))
+
+        # Strings loaded from JSON caches are unicode on Python 2.
+        self.assertIs(intern_string(json.loads('"foo.bar"')), intern_string('foo.bar'))
+
+    def test_is_ignored(self):
+        """Test ignoring scripts listed in the srcs of ignored rules."""
+        ignored_rules = ['\n# pazel-ignore\npy_library(\n    name = "core",\n'
+                         '    srcs = ["a.py", "b.py"],\n)']
+
+        self.assertTrue(is_ignored('foo/a.py', ignored_rules))
+        self.assertTrue(is_ignored('foo/b.py', ignored_rules))
+        self.assertFalse(is_ignored('foo/c.py', ignored_rules))
+
 
 if __name__ == '__main__':
     unittest.main()
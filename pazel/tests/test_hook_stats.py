@@ -0,0 +1,51 @@
+"""Test counting calls to hooks."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from pazel.hook_stats import HookStats
+from pazel.import_inference_rules import passes_prefilters
+
+
+class TestHookStats(unittest.TestCase):
+    """Test counting calls to hooks."""
+
+    def test_call_and_skip(self):
+        """Test that calls and skipped calls are counted per hook."""
+        stats = HookStats()
+
+        self.assertEqual(stats.call('Rule.applies_to', max, 1, 2), 2)
+        stats.call('Rule.applies_to', max, 3, 4)
+        stats.skip('Rule.applies_to')
+        stats.skip('Other.holds')
+
+        calls, skipped, seconds = stats.get('Rule.applies_to')
+        self.assertEqual((calls, skipped), (2, 1))
+        self.assertTrue(seconds >= 0.0)
+        self.assertEqual(stats.get('Other.holds')[:2], (0, 1))
+
+        report = stats.report()
+        self.assertIn('Rule.applies_to', report)
+        self.assertIn('Other.holds', report)
+
+        stats.reset()
+        self.assertEqual(stats.get('Rule.applies_to'), (0, 0, 0.0))
+
+    def test_import_inference_prefilters(self):
+        """Test the prefilters of import inference rules."""
+        class StarImportRule(object):
+            base_prefixes = ['foo']
+            unknown_names = ['*']
+
+        self.assertTrue(passes_prefilters(StarImportRule, 'foo', '*'))
+        self.assertTrue(passes_prefilters(StarImportRule, 'foo.bar', '*'))
+        self.assertFalse(passes_prefilters(StarImportRule, 'foobar', '*'))
+        self.assertFalse(passes_prefilters(StarImportRule, 'foo', 'bar'))
+        self.assertTrue(passes_prefilters(object, 'anything', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Test finding import cycles."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from pazel.import_cycles import find_edges_to_break
+from pazel.import_cycles import find_import_cycles
+from pazel.import_cycles import find_strongly_connected_components
+from pazel.import_cycles import format_import_cycles
+from pazel.import_graph import ImportGraph
+
+
+def _create_graph(edges):
+    """Create a graph from (source name, target name) edges."""
+    graph = ImportGraph()
+
+    for source, target in edges:
+        graph.add_edge(graph.add_node(source), graph.add_node(target))
+
+    return graph
+
+
+class TestImportCycles(unittest.TestCase):
+    """Test finding import cycles and the imports to remove."""
+
+    def test_strongly_connected_components(self):
+        """Test that components are found in reverse topological order."""
+        graph = _create_graph([('a', 'b'), ('b', 'c'), ('c', 'a'), ('c', 'd'), ('d', 'e'),
+                               ('e', 'd')])
+
+        components = [[graph.get_name(n) for n in component]
+                      for component in find_strongly_connected_components(graph)]
+
+        self.assertEqual(components, [['d', 'e'], ['a', 'b', 'c']])
+
+    def test_long_chain(self):
+        """Test that long import chains do not exceed the recursion limit."""
+        graph = _create_graph([(str(i), str(i + 1)) for i in range(5000)] + [('5000', '0')])
+
+        self.assertEqual(len(find_strongly_connected_components(graph)), 1)
+
+    def test_edges_to_break(self):
+        """Test that the removed edges make the component acyclic and are all needed."""
+        graph = _create_graph([('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'a'), ('c', 'c')])
+        component, = find_strongly_connected_components(graph)
+        edges = [(graph.get_name(s), graph.get_name(t))
+                 for s, t in find_edges_to_break(graph, component)]
+
+        self.assertEqual(edges, [('a', 'b'), ('c', 'c')])
+
+    def test_find_import_cycles(self):
+        """Test that acyclic modules are not reported."""
+        graph = _create_graph([('a', 'b'), ('b', 'a'), ('x', 'y')])
+        cycles = find_import_cycles(graph)
+
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(sorted(graph.get_name(n) for n in cycles[0].node_ids), ['a', 'b'])
+        self.assertEqual(len(cycles[0].edges_to_break), 1)
+
+        self.assertIn('Cycle 1: a, b', format_import_cycles(graph, cycles))
+        self.assertEqual(format_import_cycles(graph, []), 'No import cycles found.')
+
+
+if __name__ == '__main__':
+    unittest.main()
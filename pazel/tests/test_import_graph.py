@@ -0,0 +1,137 @@
+"""Test building and exporting the import graph of a project."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from pazel.import_graph import build_import_graph
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import ImportGraph
+from pazel.import_graph import write_graph
+
+
+def create_project(files):
+    """Create a temporary project from a mapping from relative paths to file contents."""
+    project_root = tempfile.mkdtemp()
+
+    for relative_path, content in files.items():
+        path = os.path.join(project_root, relative_path)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as project_file:
+            project_file.write(content)
+
+    return project_root
+
+
+class TestImportGraph(unittest.TestCase):
+    """Test the compact import graph."""
+
+    def test_graph(self):
+        """Test interning nodes and compressing edges."""
+        graph = ImportGraph()
+        a = graph.add_node('a')
+        b = graph.add_node('b')
+        c = graph.add_node('c', EXTERNAL_PACKAGE)
+
+        self.assertEqual((a, b, c), (0, 1, 2))
+        self.assertEqual(graph.add_node('a'), a)
+        self.assertIsNone(graph.get_id('c'))
+        self.assertEqual(graph.get_id('c', EXTERNAL_PACKAGE), c)
+
+        graph.add_edge(a, c)
+        graph.add_edge(a, b)
+        graph.add_edge(a, c)
+        graph.add_edge(b, c)
+
+        self.assertEqual(graph.num_edges, 3)
+        self.assertEqual(list(graph.successors(a)), [b, c])
+        self.assertEqual(list(graph.predecessors(c)), [a, b])
+        self.assertEqual(list(graph.predecessors(a)), [])
+
+        # Nodes and edges can be added after querying the graph.
+        d = graph.add_node('d')
+        graph.add_edge(d, a)
+
+        self.assertEqual(list(graph.edges()), [(a, b), (a, c), (b, c), (d, a)])
+        self.assertEqual(list(graph.predecessors(a)), [d])
+        self.assertEqual(list(graph.successors(d)), [a])
+
+
+class TestBuildImportGraph(unittest.TestCase):
+    """Test building and exporting the import graph of a project."""
+
+    def setUp(self):
+        """Build the graph of a small project."""
+        self.project_root = create_project({
+            '.pazelrc': "EXTRA_IMPORT_NAME_TO_PIP_NAME = {'yaml': 'pyyaml'}\n",
+            'foo/__init__.py': '',
+            'foo/bar1.py': 'import numpy as np\n',
+            'foo/bar2.py': 'import yaml\nfrom foo.bar1 import np\n',
+            'tests/test_bar2.py': 'import unittest\nfrom foo import bar2\n',
+        })
+
+        self.graph = build_import_graph(self.project_root, self.project_root, False,
+                                        os.path.join(self.project_root, '.pazelrc'))
+
+    def tearDown(self):
+        """Remove the project."""
+        shutil.rmtree(self.project_root)
+
+    def test_build_import_graph(self):
+        """Test that modules import local modules and external packages."""
+        graph = self.graph
+        bar2 = graph.get_id('foo.bar2')
+
+        self.assertEqual(graph.get_rule(bar2), 'py_library')
+        self.assertGreater(graph.get_size(bar2), 0)
+
+        successors = set(graph.get_name(node_id) for node_id in graph.successors(bar2))
+        self.assertEqual(successors, set(['foo.bar1', 'pyyaml']))
+
+        predecessors = set(graph.get_name(node_id) for node_id in graph.predecessors(bar2))
+        self.assertEqual(predecessors, set(['tests.test_bar2']))
+
+    def test_write_graph(self):
+        """Test exporting the graph as JSON, DOT, and GraphML."""
+        output = StringIO()
+        write_graph(self.graph, output, 'json')
+        exported = json.loads(output.getvalue())
+
+        self.assertEqual(len(exported['nodes']), self.graph.num_nodes)
+        self.assertEqual([tuple(edge) for edge in exported['edges']], list(self.graph.edges()))
+
+        output = StringIO()
+        write_graph(self.graph, output, 'dot')
+
+        self.assertTrue(output.getvalue().startswith('digraph imports {'))
+        self.assertEqual(output.getvalue().count('->'), self.graph.num_edges)
+
+        output = StringIO()
+        write_graph(self.graph, output, 'graphml')
+        root = ElementTree.fromstring(output.getvalue())
+        namespace = '{http://graphml.graphdrawing.org/xmlns}'
+
+        self.assertEqual(len(root.findall('.//%snode' % namespace)), self.graph.num_nodes)
+        self.assertEqual(len(root.findall('.//%sedge' % namespace)), self.graph.num_edges)
+
+        with self.assertRaises(ValueError):
+            write_graph(self.graph, StringIO(), 'svg')
+
+
+if __name__ == '__main__':
+    unittest.main()
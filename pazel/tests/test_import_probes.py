@@ -0,0 +1,166 @@
+"""Test probing whether imported modules are installed."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pazel.distribution_index import get_search_paths
+from pazel.import_probes import ImportProbes
+from pazel.import_probes import ProbeWorker
+
+
+class TestProbeWorker(unittest.TestCase):
+    """Test probing modules in a worker process."""
+
+    def test_probe(self):
+        """Test answering a batch of probes in another interpreter."""
+        worker = ProbeWorker(sys.executable)
+
+        try:
+            self.assertEqual(worker.identity['prefix'], sys.prefix)
+
+            answers = worker.probe([('os', None, False), ('os', 'path', False),
+                                    ('os', 'not_in_os', False), ('not_a_module_xyz', None, True),
+                                    (None, 'abc', True)])
+
+            self.assertEqual(answers, [True, True, False, False, False])
+
+            # The worker stays alive between batches.
+            self.assertEqual(worker.probe([('json', None, False)]), [True])
+        finally:
+            worker.close()
+
+    def test_invalid_interpreter(self):
+        """Test that a missing interpreter raises an error."""
+        with self.assertRaises(RuntimeError):
+            ProbeWorker('/not/a/python/interpreter')
+
+
+class TestImportProbes(unittest.TestCase):
+    """Test memoizing probes."""
+
+    def test_memoize(self):
+        """Test that each import is probed once, in batches."""
+        probes = ImportProbes()
+        probes.start_worker(sys.executable)
+
+        try:
+            batches = []
+            original_probe = probes._worker.probe
+
+            def probe(batch):
+                batches.append(batch)
+                return original_probe(batch)
+
+            probes._worker.probe = probe
+
+            probes.prefetch([('os', None), ('json', None), ('os', None)], False)
+
+            self.assertTrue(probes.is_installed('os', None, False))
+            self.assertTrue(probes.is_installed('json', None, False))
+            self.assertFalse(probes.is_installed('not_a_module_xyz', None, False))
+            self.assertFalse(probes.is_installed('not_a_module_xyz', None, False))
+
+            self.assertEqual(batches, [[('os', None, False), ('json', None, False)],
+                                       [('not_a_module_xyz', None, False)]])
+        finally:
+            probes.stop_worker()
+
+    def test_get_search_paths(self):
+        """Test that distributions are looked up on the import path of the target interpreter."""
+        site_packages = tempfile.mkdtemp()
+        original_python_path = os.environ.get('PYTHONPATH')
+        os.environ['PYTHONPATH'] = site_packages
+        probes = ImportProbes()
+
+        try:
+            probes.start_worker(sys.executable)
+
+            self.assertIn(site_packages, probes.get_search_paths())
+            self.assertNotIn(site_packages, get_search_paths())
+        finally:
+            probes.stop_worker()
+
+            if original_python_path is None:
+                del os.environ['PYTHONPATH']
+            else:
+                os.environ['PYTHONPATH'] = original_python_path
+
+            shutil.rmtree(site_packages)
+
+        self.assertEqual(probes.get_search_paths(), get_search_paths())
+
+    def test_cache(self):
+        """Test that answers are persisted across runs until the environment changes."""
+        cache_dir = tempfile.mkdtemp()
+        probes = ImportProbes()
+        probes.start_worker(sys.executable)
+
+        try:
+            probes.load_cache(cache_dir)
+            probes.prefetch([('os', None), ('not_a_module_xyz', None)], False)
+            probes.save_cache()
+
+            # A new run answers from the cache without probing.
+            probes.start_worker(sys.executable)
+
+            def probe(batch):
+                raise AssertionError("Unexpected probes %s." % batch)
+
+            probes._worker.probe = probe
+            probes.load_cache(cache_dir)
+
+            self.assertTrue(probes.is_installed('os', None, False))
+            self.assertFalse(probes.is_installed('not_a_module_xyz', None, False))
+
+            # A cache saved for another state of the environment is not used.
+            cache_path, = [os.path.join(cache_dir, filename) for filename in os.listdir(cache_dir)]
+
+            with open(cache_path, 'r') as cache_file:
+                cached = json.load(cache_file)
+
+            cached['fingerprint'] = 'outdated'
+
+            with open(cache_path, 'w') as cache_file:
+                json.dump(cached, cache_file)
+
+            probes.start_worker(sys.executable)
+            probes.load_cache(cache_dir)
+
+            self.assertEqual(probes.get_num_answers(), 0)
+        finally:
+            probes.stop_worker()
+            shutil.rmtree(cache_dir)
+
+    def test_low_memory(self):
+        """Test that imports of packages that are not installed are answered without memoizing."""
+        probes = ImportProbes()
+        probes.low_memory = True
+
+        probes.prefetch([('not_a_module_xyz.a', 'b'), ('not_a_module_xyz.c', None),
+                         ('os', 'path')], False)
+
+        self.assertFalse(probes.is_installed('not_a_module_xyz.a', 'b', False))
+        self.assertFalse(probes.is_installed('not_a_module_xyz.d', 'e', False))
+        self.assertTrue(probes.is_installed('os', 'path', False))
+
+        # The top-level packages and the import of the installed package.
+        self.assertEqual(probes.get_num_answers(), 3)
+
+    def test_local(self):
+        """Test probing modules in the current interpreter without a worker."""
+        probes = ImportProbes()
+
+        self.assertTrue(probes.is_installed('os', 'path', False))
+        self.assertFalse(probes.is_installed('not_a_module_xyz', None, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Test indexing the labels of existing rules."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel import label_index
+from pazel.label_index import LabelIndex
+
+BUILD_SOURCE = """# pazel-ignore
+py_library(
+    name = "core",
+    srcs = [
+        "a.py",
+        "b.py",
+        "sub/c.py",
+    ],
+)
+
+# pazel-ignore
+py_test(
+    name = "test_core",
+    srcs = [
+        "a.py",
+        "test_core.py",
+    ],
+)
+
+py_library(
+    name = "d",
+    srcs = ["d.py"],
+)
+"""
+
+PACKAGE_BUILD_SOURCE = """# pazel-ignore
+py_library(
+    name = "everything",
+    srcs = glob(["*.py"]),
+)
+
+# pazel-ignore
+py_library(
+    name = "init",
+    srcs = ["__init__.py"],
+)
+"""
+
+
+class TestLabelIndex(unittest.TestCase):
+    """Test indexing the labels of existing rules."""
+
+    def setUp(self):
+        """Create a project with hand-written BUILD files."""
+        self.project_root = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.project_root, 'cache')
+
+        for relative_path, content in [('foo/BUILD', BUILD_SOURCE),
+                                       ('foo/pkg/BUILD', PACKAGE_BUILD_SOURCE)]:
+            path = os.path.join(self.project_root, relative_path)
+            os.makedirs(os.path.dirname(path))
+
+            with open(path, 'w') as build_file:
+                build_file.write(content)
+
+    def tearDown(self):
+        """Remove the project."""
+        shutil.rmtree(self.project_root)
+
+    def test_get(self):
+        """Test finding the owners of modules."""
+        index = LabelIndex(self.project_root, fallback={'foo.e': '//foo:aggregate'})
+
+        self.assertEqual(index.get('foo.a'), '//foo:core')
+        self.assertEqual(index.get('foo.b'), '//foo:core')
+        self.assertEqual(index.get('foo.sub.c'), '//foo:core')
+        self.assertEqual(index.get('foo.test_core'), '//foo:test_core')
+
+        # Rules that are not ignored are replaced by pazel, so they do not own modules.
+        self.assertIsNone(index.get('foo.d'))
+        self.assertEqual(index.get('foo.d', 'default'), 'default')
+
+        # The package foo.pkg, imported as foo.pkg.pkg, is owned by the rule of
+        # foo/pkg/__init__.py, even though the rule is not named after the directory.
+        self.assertEqual(index.get('foo.pkg.__init__'), '//foo/pkg:init')
+        self.assertEqual(index.get('foo.pkg.pkg'), '//foo/pkg:init')
+
+        # Modules are looked up by their files, so foo/pkg/pkg.py is not owned by the rule of
+        # foo/pkg/__init__.py.
+        open(os.path.join(self.project_root, 'foo', 'pkg', 'pkg.py'), 'w').close()
+        self.assertIsNone(index.get('foo.pkg.pkg'))
+
+        self.assertEqual(index.get('foo.e'), '//foo:aggregate')
+
+    def test_cache(self):
+        """Test that unchanged BUILD files are not parsed again."""
+        LabelIndex(self.project_root, self.cache_dir).scan()
+
+        original_index_build_file = label_index.index_build_file
+
+        def index_build_file(build_file_path):
+            raise AssertionError("Unexpected parse of %s." % build_file_path)
+
+        label_index.index_build_file = index_build_file
+
+        try:
+            index = LabelIndex(self.project_root, self.cache_dir)
+
+            self.assertEqual(index.get('foo.a'), '//foo:core')
+        finally:
+            label_index.index_build_file = original_index_build_file
+
+
+if __name__ == '__main__':
+    unittest.main()
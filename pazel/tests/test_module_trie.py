@@ -0,0 +1,83 @@
+"""Test resolving dotted import names against the project tree."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.module_trie import get_module_trie
+from pazel.module_trie import ModuleTrie
+from pazel.module_trie import MODULE
+from pazel.module_trie import PACKAGE
+from pazel.module_trie import release_module_tries
+
+
+class TestModuleTrie(unittest.TestCase):
+    """Test resolving dotted import names against the project tree."""
+
+    def setUp(self):
+        """Create a project with a package, a namespace package, and a data directory."""
+        self.project_root = tempfile.mkdtemp()
+
+        for relative_path in ['a/__init__.py', 'a/b.py', 'a/c/__init__.py', 'ns/sub/d.py',
+                              'data/e.txt']:
+            self._write(relative_path)
+
+    def tearDown(self):
+        """Remove the project."""
+        shutil.rmtree(self.project_root)
+
+    def _write(self, relative_path):
+        """Create a file of the project."""
+        path = os.path.join(self.project_root, relative_path)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        open(path, 'w').close()
+
+    def test_find_longest_prefix(self):
+        """Test finding the longest prefix that is a module or a package."""
+        trie = ModuleTrie(self.project_root)
+
+        self.assertEqual(trie.find_longest_prefix(['a', 'b', 'x', 'y']), (2, MODULE))
+        self.assertEqual(trie.find_longest_prefix(['a', 'c']), (2, PACKAGE))
+        self.assertEqual(trie.find_longest_prefix(['a', 'x']), (1, PACKAGE))
+
+        # Directories without Python files are walked through but do not match.
+        self.assertEqual(trie.find_longest_prefix(['ns', 'sub', 'd']), (3, MODULE))
+        self.assertEqual(trie.find_longest_prefix(['ns', 'x']), (0, None))
+        self.assertEqual(trie.find_longest_prefix(['data']), (0, None))
+        self.assertEqual(trie.find_longest_prefix(['numpy', 'linalg']), (0, None))
+
+    def test_new_module(self):
+        """Test that a directory is listed again after a module is added to it."""
+        trie = ModuleTrie(self.project_root)
+
+        self.assertEqual(trie.find_longest_prefix(['x']), (0, None))
+
+        self._write('x.py')
+        os.utime(self.project_root, (0, 0))
+
+        # Directories are checked for changes only once until the trie is refreshed.
+        self.assertEqual(trie.find_longest_prefix(['x']), (0, None))
+
+        trie.refresh()
+        self.assertEqual(trie.find_longest_prefix(['x']), (1, MODULE))
+
+    def test_release_module_tries(self):
+        """Test that the tries of the run are shared until they are released."""
+        trie = get_module_trie(self.project_root)
+
+        self.assertIs(get_module_trie(self.project_root), trie)
+
+        release_module_tries()
+        self.assertIsNot(get_module_trie(self.project_root), trie)
+
+
+if __name__ == '__main__':
+    unittest.main()
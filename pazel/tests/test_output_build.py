@@ -0,0 +1,185 @@
+"""Test writing BUILD files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.output_build import BuildFileWriter
+from pazel.output_build import patch_build_file
+
+REQUIREMENT_LOAD = 'load("@my_deps//:requirements.bzl", "requirement")'
+
+EXISTING_BUILD_SOURCE = REQUIREMENT_LOAD + """
+
+package(default_visibility = ["//visibility:public"])
+
+py_library(
+    name = "b",
+    srcs = ["b.py"],
+)
+
+# Keep a before its dependents.
+py_library(
+    name = "a",
+    srcs = ["a.py"],
+    deps = [":b"],
+)
+
+# pazel-ignore
+py_library(
+    name = "x",
+    srcs = ["x.py"],
+)
+
+py_binary(
+    name = "gone",
+    srcs = ["gone.py"],
+)
+"""
+
+
+class TestBuildFileWriter(unittest.TestCase):
+    """Test writing BUILD files atomically."""
+
+    def setUp(self):
+        """Create a temporary directory with an existing BUILD file."""
+        self.directory = tempfile.mkdtemp()
+        self.build_file_path = os.path.join(self.directory, 'BUILD')
+        self.other_build_file_path = os.path.join(self.directory, 'other', 'BUILD')
+        os.mkdir(os.path.dirname(self.other_build_file_path))
+
+        with open(self.build_file_path, 'w') as build_file:
+            build_file.write('old\n')
+
+        os.chmod(self.build_file_path, 0o640)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory)
+
+    def _read(self, path):
+        with open(path, 'r') as build_file:
+            return build_file.read()
+
+    def _list_files(self):
+        return sorted(os.listdir(self.directory)) + sorted(
+            os.listdir(os.path.dirname(self.other_build_file_path)))
+
+    def test_write(self):
+        """Test that BUILD files are replaced right away and keep their permissions."""
+        writer = BuildFileWriter()
+        writer.write(self.build_file_path, 'new\n')
+        writer.write(self.other_build_file_path, 'other\n')
+
+        self.assertEqual(self._read(self.build_file_path), 'new\n')
+        self.assertEqual(self._read(self.other_build_file_path), 'other\n')
+        self.assertEqual(os.stat(self.build_file_path).st_mode & 0o777, 0o640)
+        self.assertEqual(writer.num_staged, 0)
+        self.assertEqual(self._list_files(), ['BUILD', 'other', 'BUILD'])
+
+    def test_unchanged(self):
+        """Test that a BUILD file with unchanged content is not rewritten."""
+        writer = BuildFileWriter(all_or_nothing=True)
+        writer.write(self.build_file_path, 'old\n')
+
+        self.assertEqual(writer.num_staged, 0)
+
+    def test_all_or_nothing(self):
+        """Test that staged BUILD files are moved into place only on commit."""
+        writer = BuildFileWriter(all_or_nothing=True)
+        writer.write(self.build_file_path, 'new\n')
+        writer.write(self.other_build_file_path, 'other\n')
+
+        self.assertEqual(writer.num_staged, 2)
+        self.assertEqual(self._read(self.build_file_path), 'old\n')
+        self.assertFalse(os.path.exists(self.other_build_file_path))
+
+        writer.commit()
+
+        self.assertEqual(self._read(self.build_file_path), 'new\n')
+        self.assertEqual(self._read(self.other_build_file_path), 'other\n')
+        self.assertEqual(self._list_files(), ['BUILD', 'other', 'BUILD'])
+
+    def test_rollback(self):
+        """Test that a rollback removes the staged BUILD files and keeps the existing ones."""
+        writer = BuildFileWriter(all_or_nothing=True)
+        writer.write(self.build_file_path, 'new\n')
+        writer.write(self.other_build_file_path, 'other\n')
+        writer.rollback()
+
+        self.assertEqual(writer.num_staged, 0)
+        self.assertEqual(self._read(self.build_file_path), 'old\n')
+        self.assertEqual(self._list_files(), ['BUILD', 'other'])
+
+
+class TestPatchBuildFile(unittest.TestCase):
+    """Test updating only the changed rules of a BUILD file."""
+
+    def test_patch(self):
+        """Test replacing, inserting, and removing rules while keeping everything else."""
+        build_source = """py_library(
+    name = "a",
+    srcs = ["a.py"],
+    deps = [requirement("pyyaml")],
+)
+
+py_library(
+    name = "b",
+    srcs = ["b.py"],
+)
+
+py_library(
+    name = "c",
+    srcs = ["c.py"],
+)"""
+
+        expected_output = REQUIREMENT_LOAD + """
+
+package(default_visibility = ["//visibility:public"])
+
+py_library(
+    name = "b",
+    srcs = ["b.py"],
+)
+
+py_library(
+    name = "c",
+    srcs = ["c.py"],
+)
+
+# Keep a before its dependents.
+py_library(
+    name = "a",
+    srcs = ["a.py"],
+    deps = [requirement("pyyaml")],
+)
+
+# pazel-ignore
+py_library(
+    name = "x",
+    srcs = ["x.py"],
+)
+"""
+
+        self.assertEqual(patch_build_file(EXISTING_BUILD_SOURCE, build_source, [],
+                                          REQUIREMENT_LOAD), expected_output)
+
+    def test_unpatchable(self):
+        """Test that BUILD files missing a load statement or all generated rules are not patched."""
+        build_source = 'py_library(\n    name = "b",\n    deps = [requirement("six")],\n)'
+        existing_source = EXISTING_BUILD_SOURCE.replace(REQUIREMENT_LOAD, '')
+
+        self.assertIsNone(patch_build_file(existing_source, build_source, [], REQUIREMENT_LOAD))
+        self.assertIsNotNone(patch_build_file(EXISTING_BUILD_SOURCE, build_source, [],
+                                              REQUIREMENT_LOAD))
+        self.assertIsNone(patch_build_file(EXISTING_BUILD_SOURCE, 'py_test(name = "t")', [],
+                                           REQUIREMENT_LOAD))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Test parsing existing BUILD files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.bazel_rules import PyLibraryRule
+from pazel.bazel_rules import PyTestRule
+from pazel.parse_build import find_existing_data_deps
+from pazel.parse_build import find_existing_rule
+from pazel.parse_build import find_existing_test_size
+from pazel.parse_build import get_ignored_rules
+
+
+BUILD_SOURCE = """load("@my_deps//:requirements.bzl", "requirement")
+
+py_library(
+    name = "foo",
+    srcs = ["foo.py"],
+    data = ["weird)name.txt"],  # Parenthesis ) in a string and in a comment.
+)
+
+py_test(
+    name = "test_foo",
+    srcs = ["test_foo.py"],
+    size = "large",
+    data = glob(["test_data/*.png"]),
+    deps = [":foo"],
+)
+
+# pazel-ignore
+py_binary(
+    name = "bar",
+    srcs = ["bar.py"],
+)
+"""
+
+
+class TestParseBuild(unittest.TestCase):
+    """Test parsing existing BUILD files."""
+
+    def setUp(self):
+        """Write a BUILD file to a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.build_file_path = os.path.join(self.directory, 'BUILD')
+
+        with open(self.build_file_path, 'w') as build_file:
+            build_file.write(BUILD_SOURCE)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory)
+
+    def test_find_existing_rule(self):
+        """Test find_existing_rule."""
+        rule = find_existing_rule(self.build_file_path, 'foo.py', PyLibraryRule)
+
+        self.assertTrue(rule.startswith('py_library('))
+        self.assertTrue(rule.endswith('comment.\n)'))
+        self.assertIsNone(find_existing_rule(self.build_file_path, 'missing.py', PyLibraryRule))
+
+    def test_find_existing_data_deps(self):
+        """Test find_existing_data_deps."""
+        self.assertEqual(find_existing_data_deps(os.path.join(self.directory, 'foo.py'),
+                                                 PyLibraryRule), 'data = ["weird)name.txt"]')
+        self.assertEqual(find_existing_data_deps(os.path.join(self.directory, 'test_foo.py'),
+                                                 PyTestRule), 'data = glob(["test_data/*.png"])')
+
+    def test_find_existing_test_size(self):
+        """Test find_existing_test_size."""
+        self.assertEqual(find_existing_test_size(os.path.join(self.directory, 'test_foo.py'),
+                                                 PyTestRule), 'large')
+        self.assertIsNone(find_existing_test_size(os.path.join(self.directory, 'foo.py'),
+                                                  PyLibraryRule))
+
+    def test_get_ignored_rules(self):
+        """Test get_ignored_rules."""
+        ignored_rules = get_ignored_rules(self.build_file_path)
+
+        self.assertEqual(len(ignored_rules), 1)
+        self.assertTrue(ignored_rules[0].startswith('\n# pazel-ignore\npy_binary('))
+        self.assertEqual(get_ignored_rules(os.path.join(self.directory, 'missing')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+import shutil
+import tempfile
 import unittest
 
+from pazel.module_trie import refresh_module_tries
 from pazel.parse_imports import get_imports
+from pazel.parse_imports import infer_import_type
+from pazel.parse_imports import scan_imports
 
 
 class TestParseImports(unittest.TestCase):
@@ -30,6 +36,87 @@ from asd import \
         self.assertEqual(packages, expected_packages)
         self.assertEqual(from_imports, expected_from_imports)
 
+    def test_get_relative_imports(self):
+        """Test that the modules of relative imports keep their leading dots."""
+        script_source = """
+from . import a
+from .b import c
+from ..d.e import f
+"""
+        expected_from_imports = [('.', 'a'), ('.b', 'c'), ('..d.e', 'f')]
+
+        self.assertEqual(get_imports(script_source), ([], expected_from_imports))
+        self.assertEqual(scan_imports(script_source), ([], expected_from_imports))
+
+    def test_infer_import_type(self):
+        """Test resolving dotted and relative imports to the modules of the project."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            for relative_path in ['a/__init__.py', 'a/b.py', 'a/c/__init__.py', 'a/c/c.py',
+                                  'a/c/d.py']:
+                path = os.path.join(project_root, relative_path)
+
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+
+                open(path, 'w').close()
+
+            script_path = os.path.join(project_root, 'a', 'c', 'd.py')
+            imports = [('a.b.x', None), ('a.c', None), ('a', 'c'), ('a', None),
+                       ('nonlocal_package.sub', None), ('.', 'c'), ('..b', 'x'), ('...', 'y')]
+            packages, modules = infer_import_type(imports, project_root, False, [], script_path)
+
+            self.assertEqual(packages, set(['nonlocal_package.sub']))
+            self.assertEqual(modules, set(['a.b', 'a.c.__init__', 'a.c.c', 'a.__init__']))
+
+            # The rest of a local package is defined in its __init__.py, not in a pip package.
+            imports = [('a.x', None), ('a', 'undefined_name'), ('a.c.y', 'z')]
+            self.assertEqual(infer_import_type(imports, project_root, False, []),
+                             (set(), set(['a.__init__', 'a.c.__init__'])))
+
+            # Namespace packages have no __init__.py and are left out.
+            os.makedirs(os.path.join(project_root, 'e', 'f'))
+            open(os.path.join(project_root, 'e', 'h.py'), 'w').close()
+            open(os.path.join(project_root, 'e', 'f', 'g.py'), 'w').close()
+            refresh_module_tries()
+            self.assertEqual(infer_import_type([('e.x', None), ('e', 'y'), ('e.f', 'g')],
+                                               project_root, False, []),
+                             (set(), set(['e.f.g'])))
+
+            # Without the path to the script, relative imports are left out.
+            self.assertEqual(infer_import_type([('.', 'c')], project_root, False, []),
+                             (set(), set()))
+        finally:
+            shutil.rmtree(project_root)
+
+    def test_scan_imports(self):
+        """Test that scan_imports finds the same imports as get_imports."""
+        script_source = '''"""Docstring."""
+from __future__ import print_function
+
+import os.path as osp, sys  # A comment.
+from . import (a,
+               b as c,)
+from ..foo.bar import *
+
+DATA = {'import': 'from'}
+'''
+        self.assertEqual(scan_imports(script_source), get_imports(script_source))
+        self.assertEqual(get_imports(script_source, 1000), get_imports(script_source))
+
+    def test_scan_imports_fallback(self):
+        """Test that scan_imports gives up when the whole script needs to be parsed."""
+        # A top-level import after other statements.
+        self.assertIsNone(scan_imports('import os\nx = 1\nimport sys\n'))
+
+        # An import preamble longer than the budget.
+        self.assertIsNone(scan_imports('import os\n' * 10, max_bytes=50))
+
+        # Imports inside functions are not top-level imports.
+        script_source = 'import os\n\ndef f():\n    import sys\n'
+        self.assertEqual(scan_imports(script_source), ([('os', None)], []))
+
 
 if __name__ == '__main__':
     unittest.main()
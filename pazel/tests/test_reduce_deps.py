@@ -0,0 +1,84 @@
+"""Test the transitive reduction of dependencies."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.reduce_deps import DependencyReducer
+
+
+class TestDependencyReducer(unittest.TestCase):
+    """Test dropping dependencies that are reachable through other dependencies."""
+
+    def setUp(self):
+        """Create a small project."""
+        self.project_root = tempfile.mkdtemp()
+        files = {
+            'foo/__init__.py': '',
+            'foo/a.py': 'import numpy\nfrom foo import b\nfrom foo import c\n',
+            'foo/b.py': 'from foo import c\n',
+            'foo/c.py': 'import numpy.linalg\n',
+            'foo/x.py': 'from foo import y\nfrom foo import z\n',
+            'foo/y.py': 'from foo import z\n',
+            'foo/z.py': 'from foo import y\n',
+            'foo/BUILD': '# pazel-ignore\npy_library(\n    name = "c",\n    srcs = ["c.py"],\n)\n',
+        }
+
+        for relative_path, content in files.items():
+            path = os.path.join(self.project_root, relative_path)
+
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'w') as project_file:
+                project_file.write(content)
+
+    def tearDown(self):
+        """Remove the project."""
+        shutil.rmtree(self.project_root)
+
+    def _reduce(self, reducer, module_name, package_names, module_names):
+        script_path = os.path.join(self.project_root, 'foo', module_name + '.py')
+
+        return reducer.reduce(script_path, set(package_names), set(module_names))
+
+    def test_reduce(self):
+        """Test that the closure of the dependencies stays the same."""
+        reducer = DependencyReducer(self.project_root, False, [], [], {})
+
+        # foo.c is reached through foo.b. The rule of foo.c is ignored, so numpy is kept.
+        packages, modules = self._reduce(reducer, 'a', ['numpy'], ['foo.b', 'foo.c'])
+
+        self.assertEqual(packages, set(['numpy']))
+        self.assertEqual(modules, set(['foo.b']))
+
+        # Modules in a cycle reach each other. Only one of them is kept.
+        packages, modules = self._reduce(reducer, 'x', [], ['foo.y', 'foo.z'])
+
+        self.assertEqual(packages, set())
+        self.assertEqual(modules, set(['foo.y']))
+
+        # The closures are recomputed from the graph after they have been released.
+        reducer.release_closures()
+        packages, modules = self._reduce(reducer, 'a', ['numpy'], ['foo.b', 'foo.c'])
+
+        self.assertEqual(modules, set(['foo.b']))
+
+    def test_reduce_packages(self):
+        """Test that packages reachable through local modules are dropped."""
+        os.remove(os.path.join(self.project_root, 'foo', 'BUILD'))
+        reducer = DependencyReducer(self.project_root, False, [], [], {'numpy': '//third_party:np'})
+
+        packages, modules = self._reduce(reducer, 'a', ['numpy'], ['foo.b', 'foo.c'])
+
+        self.assertEqual(packages, set())
+        self.assertEqual(modules, set(['foo.b']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Test computing the minimal pinned requirements of binaries."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.import_graph import EXTERNAL_PACKAGE
+from pazel.import_graph import ImportGraph
+from pazel.requirement_sets import compute_package_closures
+from pazel.requirement_sets import compute_requirement_sets
+from pazel.requirement_sets import write_requirements_files
+
+
+class TestRequirementSets(unittest.TestCase):
+    """Test requirements of binaries that share libraries."""
+
+    def setUp(self):
+        """Create a graph where binaries foo.a and foo.b import bar.lib, which imports yaml."""
+        graph = ImportGraph()
+        a, b, lib, cycle = [graph.add_node(name) for name in ('foo.a', 'foo.b', 'bar.lib', 'c')]
+        yaml = graph.add_node('yaml', EXTERNAL_PACKAGE)
+        pandas = graph.add_node('pandas', EXTERNAL_PACKAGE)
+
+        for node_id, rule in ((a, 'py_binary'), (b, 'py_binary'), (lib, 'py_library'),
+                              (cycle, 'py_test')):
+            graph.set_script(node_id, rule, 10)
+
+        for source, target in ((a, lib), (b, lib), (b, pandas), (lib, yaml), (lib, cycle),
+                               (cycle, lib)):
+            graph.add_edge(source, target)
+
+        self.graph = graph
+        self.pins = {'pyyaml': ['PyYAML==5.1', '--hash=sha256:abc'], 'pandas': ['pandas==0.24.0'],
+                     'six': ['six==1.12.0']}
+
+    def test_compute_package_closures(self):
+        """Test that the closures contain the packages reached through the import cycle."""
+        packages, closures = compute_package_closures(self.graph)
+
+        self.assertEqual(packages, ['yaml', 'pandas'])
+        self.assertEqual(closures[self.graph.get_id('foo.a')], 1)
+        self.assertEqual(closures[self.graph.get_id('foo.b')], 3)
+        self.assertEqual(closures[self.graph.get_id('c')], 1)
+
+    def test_compute_requirement_sets(self):
+        """Test pinning the requirements of binaries and their dependencies from a lock file."""
+        requirement_sets = compute_requirement_sets(
+            self.graph, self.pins, {'six': set(['pandas']), 'python-dateutil': set(['pandas'])},
+            {'yaml': 'PyYAML'})
+
+        self.assertEqual([requirement_set.to_dict() for requirement_set in requirement_sets], [
+            {'label': '//foo:a', 'rule': 'py_binary', 'unpinned': [],
+             'requirements': ['PyYAML==5.1 --hash=sha256:abc']},
+            {'label': '//foo:b', 'rule': 'py_binary', 'unpinned': ['python-dateutil'],
+             'requirements': ['pandas==0.24.0', 'PyYAML==5.1 --hash=sha256:abc', 'six==1.12.0']}])
+
+        tests = compute_requirement_sets(self.graph, rules=('py_test',))
+        self.assertEqual([(test.label, test.requirements) for test in tests],
+                         [('//:c', [['yaml']])])
+
+    def test_write_requirements_files(self):
+        """Test writing one requirements file per binary."""
+        output_dir = tempfile.mkdtemp()
+
+        try:
+            requirement_sets = compute_requirement_sets(self.graph, self.pins,
+                                                        import_name_to_pip_name={'yaml': 'pyyaml'})
+            paths = write_requirements_files(requirement_sets, output_dir)
+
+            self.assertEqual(paths, [os.path.join(output_dir, 'foo', 'a.txt'),
+                                     os.path.join(output_dir, 'foo', 'b.txt')])
+
+            with open(paths[0], 'r') as requirements_file:
+                self.assertEqual(requirements_file.read(),
+                                 '# Requirements of //foo:a generated by pazel.\n'
+                                 'PyYAML==5.1 \\\n'
+                                 '    --hash=sha256:abc\n')
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Test splitting directories to shards."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.sharding import get_shard_index
+from pazel.sharding import in_shard
+from pazel.sharding import parse_shard
+from pazel.sharding import verify_shard_manifests
+from pazel.sharding import write_shard_manifest
+
+
+class TestSharding(unittest.TestCase):
+    """Test splitting directories to shards."""
+
+    def test_parse_shard(self):
+        """Test parse_shard."""
+        self.assertEqual(parse_shard('0/4'), (0, 4))
+        self.assertEqual(parse_shard('3/4'), (3, 4))
+
+        for invalid in ('4/4', '-1/4', '1/0', 'a/b', '1'):
+            with self.assertRaises(ValueError):
+                parse_shard(invalid)
+
+    def test_get_shard_index(self):
+        """Test that shard indices are deterministic and within range."""
+        for directory in ('.', 'foo', 'foo/bar', 'xyz'):
+            index = get_shard_index(directory, 3)
+            self.assertTrue(0 <= index < 3)
+            self.assertEqual(index, get_shard_index(directory, 3))
+
+    def test_verify_shard_manifests(self):
+        """Test that manifests of all shards cover every directory exactly once."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            for directory in ('foo', 'foo/bar', 'xyz', 'abc'):
+                os.makedirs(os.path.join(project_root, directory))
+
+            num_shards = 3
+            manifest_paths = []
+
+            for index in range(num_shards):
+                directories = []
+
+                for dirpath, _, _ in os.walk(project_root):
+                    if in_shard(dirpath, project_root, (index, num_shards)):
+                        directories.append(os.path.relpath(dirpath, project_root))
+
+                manifest_path = os.path.join(project_root, 'manifest%d.json' % index)
+                write_shard_manifest(manifest_path, (index, num_shards), directories)
+                manifest_paths.append(manifest_path)
+
+            self.assertEqual(verify_shard_manifests(project_root, project_root, manifest_paths),
+                             [])
+
+            errors = verify_shard_manifests(project_root, project_root, manifest_paths[1:])
+            self.assertIn("Manifest for shard 0/3 is missing.", errors)
+        finally:
+            shutil.rmtree(project_root)
+
+
+if __name__ == '__main__':
+    unittest.main()
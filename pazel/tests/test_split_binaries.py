@@ -0,0 +1,106 @@
+"""Test splitting binaries into a library and a binary."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.bazel_rules import PyBinaryRule
+from pazel.bazel_rules import PyLibraryRule
+from pazel.generate_rule import generate_split_binary_rules
+from pazel.hook_stats import HOOK_STATS
+from pazel.split_binaries import get_main_block_imports
+from pazel.split_binaries import is_split_binary
+from pazel.split_binaries import SplitBinaryLabels
+
+TOOL_SOURCE = """import os
+
+from foo import util
+
+
+def run():
+    return util.f()
+
+
+if __name__ == '__main__':
+    import argparse
+    from foo.util import f
+    run()
+"""
+
+
+class TestSplitBinaries(unittest.TestCase):
+    """Test splitting binaries into a library and a binary."""
+
+    def test_get_main_block_imports(self):
+        """Test that only the imports directly in the main block are returned."""
+        self.assertEqual(get_main_block_imports(TOOL_SOURCE),
+                         ([('argparse', None)], [('foo.util', 'f')]))
+        self.assertEqual(get_main_block_imports('import os\nos.getcwd()\n'), (None, None))
+        self.assertEqual(get_main_block_imports('if "__main__" == __name__:\n    import os\n'),
+                         ([('os', None)], []))
+
+        self.assertTrue(is_split_binary(PyBinaryRule, TOOL_SOURCE))
+        self.assertFalse(is_split_binary(PyLibraryRule, TOOL_SOURCE))
+        self.assertFalse(is_split_binary(PyBinaryRule, 'import os\nos.getcwd()\n'))
+
+    def test_generate_split_binary_rules(self):
+        """Test that imports used only in the main block go only to the binary."""
+        rules = generate_split_binary_rules('app/tool.py', set(['os']), set(['foo.util']),
+                                            set(['yaml', 'os']), set(['foo.util', 'xyz.abc']),
+                                            {'yaml': 'pyyaml'}, {})
+
+        expected_rules = """py_library(
+    name = "tool_lib",
+    srcs = ["tool.py"],
+    deps = [
+        "//foo:util",
+        requirement("os"),
+    ],
+)
+
+py_binary(
+    name = "tool",
+    srcs = ["tool.py"],
+    deps = [
+        ":tool_lib",
+        "//xyz:abc",
+        requirement("pyyaml"),
+    ],
+)"""
+
+        self.assertEqual(rules, expected_rules)
+
+    def test_split_binary_labels(self):
+        """Test that importers of a split binary depend on its library."""
+        project_root = tempfile.mkdtemp()
+
+        try:
+            os.mkdir(os.path.join(project_root, 'app'))
+
+            for filename, source in (('tool.py', TOOL_SOURCE), ('lib.py', 'import os\n'),
+                                     ('script.py', 'import os\nos.getcwd()\n')):
+                with open(os.path.join(project_root, 'app', filename), 'w') as script_file:
+                    script_file.write(source)
+
+            labels = SplitBinaryLabels(project_root, [], {'app.lib': '//app:app'})
+            HOOK_STATS.reset()
+
+            self.assertEqual(labels.get('app.tool'), '//app:tool_lib')
+            self.assertEqual(labels.get('app.lib'), '//app:app')
+            self.assertIsNone(labels.get('app.script'))
+            self.assertIsNone(labels.get('app.missing'))
+
+            # The rule hooks run only for the script with a main block.
+            self.assertEqual(HOOK_STATS.get('PyBinaryRule.applies_to')[0], 1)
+        finally:
+            HOOK_STATS.reset()
+            shutil.rmtree(project_root)
+
+
+if __name__ == '__main__':
+    unittest.main()
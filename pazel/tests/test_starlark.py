@@ -0,0 +1,97 @@
+"""Test tokenizing and parsing BUILD files."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from pazel.starlark import decode_string
+from pazel.starlark import parse_rules
+from pazel.starlark import STRING
+from pazel.starlark import tokenize
+
+
+BUILD_SOURCE = '''package(default_visibility = ["//visibility:public"])
+
+load("@my_deps//:requirements.bzl", "requirement")
+
+VISIBILITY = ["//visibility:public"]
+
+py_library(
+    name = "bar1",  # A comment with a ) parenthesis.
+    srcs = ["bar1.py"],
+    deps = [requirement("numpy")],
+)
+
+# pazel-ignore
+custom_rule("bar5",
+            "bar5.py"
+)
+
+py_test(name = "test_bar", srcs = ['test_bar.py'], size = "medium", data = glob(["*.png"]))
+'''
+
+
+class TestTokenize(unittest.TestCase):
+    """Test tokenizing BUILD files."""
+
+    def test_strings(self):
+        """Test that brackets and quotes inside string literals do not split strings."""
+        source = 'x = ["a)b", \'c"d\', """e\n)f"""]'
+        strings = [token.value for token in tokenize(source) if token.kind == STRING]
+
+        self.assertEqual(strings, ['"a)b"', '\'c"d\'', '"""e\n)f"""'])
+
+    def test_decode_string(self):
+        """Test decode_string."""
+        self.assertEqual(decode_string('"abc"'), 'abc')
+        self.assertEqual(decode_string("'''a\nb'''"), 'a\nb')
+        self.assertEqual(decode_string('"a\\"b"'), 'a"b')
+        self.assertEqual(decode_string('r"a\\d"'), 'a\\d')
+
+
+class TestParseRules(unittest.TestCase):
+    """Test parsing rules from BUILD files."""
+
+    def test_parse_rules(self):
+        """Test that rules, their spans and their arguments are parsed."""
+        rules = parse_rules(BUILD_SOURCE)
+
+        self.assertEqual([rule.kind for rule in rules],
+                         ['package', 'load', 'py_library', 'custom_rule', 'py_test'])
+
+        for rule in rules:
+            self.assertEqual(BUILD_SOURCE[rule.start:rule.end], rule.text)
+            self.assertTrue(rule.text.startswith(rule.kind + '('))
+            self.assertTrue(rule.text.endswith(')'))
+
+        library = rules[2]
+        self.assertEqual(library.kwargs['name'].value, 'bar1')
+        self.assertEqual(library.get_srcs(), ['bar1.py'])
+        self.assertIsNone(library.kwargs['deps'].value)
+        self.assertFalse(library.ignored)
+
+        test = rules[4]
+        self.assertEqual(test.kwargs['size'].value, 'medium')
+        data = test.kwargs['data']
+        self.assertEqual(BUILD_SOURCE[data.start:data.end], 'data = glob(["*.png"])')
+
+    def test_ignored_rules(self):
+        """Test that only the rule following the pazel-ignore tag is ignored."""
+        rules = parse_rules(BUILD_SOURCE)
+        ignored = [rule for rule in rules if rule.ignored]
+
+        self.assertEqual(len(ignored), 1)
+        self.assertEqual(ignored[0].kind, 'custom_rule')
+        self.assertEqual(ignored[0].get_srcs(), ['bar5', 'bar5.py'])
+        self.assertTrue(BUILD_SOURCE[ignored[0].ignore_tag_start:].startswith('# pazel-ignore'))
+
+    def test_unbalanced_rule(self):
+        """Test that a rule without a closing parenthesis raises SyntaxError."""
+        with self.assertRaises(SyntaxError):
+            parse_rules('py_library(\n    name = "foo",\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
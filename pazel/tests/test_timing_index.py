@@ -0,0 +1,76 @@
+"""Test inferring the size and timeout of tests from their recorded durations."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pazel.timing_index import get_test_label
+from pazel.timing_index import infer_test_size_and_timeout
+from pazel.timing_index import TimingIndex
+
+
+class TestTimingIndex(unittest.TestCase):
+    """Test inferring the size and timeout of tests from their recorded durations."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory)
+
+    def _write(self, relative_path, content):
+        """Write a file under the temporary directory."""
+        path = os.path.join(self.directory, relative_path)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as output_file:
+            output_file.write(content)
+
+    def test_infer_test_size_and_timeout(self):
+        """Test infer_test_size_and_timeout."""
+        self.assertEqual(infer_test_size_and_timeout(1.0), ('small', 'short'))
+        self.assertEqual(infer_test_size_and_timeout(100.0), ('medium', 'moderate'))
+        self.assertEqual(infer_test_size_and_timeout(400.0), ('large', 'long'))
+        self.assertEqual(infer_test_size_and_timeout(10000.0), ('enormous', 'eternal'))
+
+    def test_get_test_label(self):
+        """Test get_test_label."""
+        self.assertEqual(get_test_label('/root/foo/test_bar.py', '/root'), '//foo:test_bar')
+        self.assertEqual(get_test_label('/root/test_bar.py', '/root'), '//:test_bar')
+
+    def test_ingest(self):
+        """Test reading durations from bazel-testlogs and persisting the index."""
+        self._write('testlogs/foo/test_a/test.xml',
+                    '<testsuites><testsuite name="a" time="12.5"/></testsuites>')
+        self._write('testlogs/foo/test_b/shard_1_of_2/test.xml',
+                    '<testsuites><testsuite><testcase name="b" duration="3"/></testsuite>'
+                    '</testsuites>')
+        self._write('testlogs/foo/test_b/shard_2_of_2/test.xml',
+                    '<testsuites><testsuite><testcase name="b" duration="7"/></testsuite>'
+                    '</testsuites>')
+        self._write('testlogs/test_c/test.log', 'Ran 2 tests in 1.500s\n\nOK\n')
+
+        index_path = os.path.join(self.directory, 'timings.json')
+        index = TimingIndex(index_path)
+        index.ingest(os.path.join(self.directory, 'testlogs'))
+        index.save()
+
+        loaded_index = TimingIndex(index_path)
+
+        self.assertEqual(loaded_index.get('//foo:test_a'), 12.5)
+        self.assertEqual(loaded_index.get('//foo:test_b'), 7.0)     # The slowest shard.
+        self.assertEqual(loaded_index.get('//:test_c'), 1.5)
+        self.assertIsNone(loaded_index.get('//foo:missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+"""Infer the size and timeout of tests from their recorded durations."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+
+# Bazel test sizes and their default timeouts in seconds, from the smallest to the largest.
+TEST_SIZE_TIMEOUTS = [('small', 'short', 60), ('medium', 'moderate', 300), ('large', 'long', 900),
+                      ('enormous', 'eternal', 3600)]
+
+# Tests get the smallest size whose timeout is at least this many times the measured duration.
+TIMEOUT_SAFETY_FACTOR = 2.0
+
+TIMING_INDEX_VERSION = 1
+
+# Directories Bazel creates for test shards, runs, and attempts under the directory of a test.
+_RUN_DIRECTORY_REGEX = re.compile(r'^(shard|run|attempt)_\d+(_of_\d+)?$')
+# Summary line written by unittest to test.log.
+_UNITTEST_SUMMARY_REGEX = re.compile(r'^Ran \d+ tests? in ([0-9.]+)s$', re.MULTILINE)
+
+
+def infer_test_size_and_timeout(duration):
+    """Choose the Bazel test size and timeout for a measured test duration.
+
+    Args:
+        duration (float): Duration of the test (or its slowest shard) in seconds.
+
+    Returns:
+        size (str): Test size, e.g. 'small'.
+        timeout (str): Test timeout, e.g. 'short'.
+    """
+    required = duration * TIMEOUT_SAFETY_FACTOR
+
+    for size, timeout, seconds in TEST_SIZE_TIMEOUTS:
+        if required <= seconds:
+            return size, timeout
+
+    size, timeout, _ = TEST_SIZE_TIMEOUTS[-1]
+
+    return size, timeout
+
+
+def get_test_label(script_path, project_root):
+    """Get the label of the test generated for a script, e.g. //foo:test_bar."""
+    script_dir = os.path.relpath(os.path.dirname(os.path.abspath(script_path)),
+                                 os.path.abspath(project_root))
+    package = '' if script_dir == '.' else script_dir.replace(os.sep, '/')
+    script_name = os.path.basename(script_path).replace('.py', '')
+
+    return '//%s:%s' % (package, script_name)
+
+
+def _read_xml_duration(xml_path):
+    """Read the duration of a test from a JUnit XML file written by Bazel, or None."""
+    try:
+        root = ElementTree.parse(xml_path).getroot()
+    except (IOError, ElementTree.ParseError):
+        return None
+
+    if root.get('time') is not None:
+        return float(root.get('time'))
+
+    suites = [root] if root.tag == 'testsuite' else root.findall('testsuite')
+    suite_times = [suite.get('time') for suite in suites]
+
+    if suite_times and all(time is not None for time in suite_times):
+        return sum(float(time) for time in suite_times)
+
+    # Bazel-generated test.xml files store the duration in the test cases.
+    case_times = [case.get('time', case.get('duration')) for case in root.iter('testcase')]
+    case_times = [float(time) for time in case_times if time is not None]
+
+    return sum(case_times) if case_times else None
+
+
+def _read_log_duration(log_path):
+    """Read the duration of a test from the unittest summary lines in test.log, or None."""
+    try:
+        with open(log_path, 'r') as log_file:
+            matches = _UNITTEST_SUMMARY_REGEX.findall(log_file.read())
+    except IOError:
+        return None
+
+    return sum(float(match) for match in matches) if matches else None
+
+
+class TimingIndex(object):
+    """Durations of tests by label, persisted as a compact JSON file.
+
+    The index remembers the modification times of the ingested test logs so that ingesting the same
+    bazel-testlogs directory again only reads the logs that changed.
+    """
+
+    def __init__(self, index_path=None):
+        """Instantiate and load an existing index from index_path, if any.
+
+        Args:
+            index_path (str): Path to the JSON file of the index. None for an in-memory index.
+        """
+        self.index_path = index_path
+        self.durations = dict()
+        self._log_mtimes = dict()
+
+        if index_path is None:
+            return
+
+        try:
+            with open(index_path, 'r') as index_file:
+                index = json.load(index_file)
+        except (IOError, ValueError):
+            return
+
+        if index.get('version') == TIMING_INDEX_VERSION:
+            self.durations = index['durations']
+            self._log_mtimes = index['log_mtimes']
+
+    def get(self, label, default=None):
+        """Return the recorded duration of a test in seconds."""
+        return self.durations.get(label, default)
+
+    def ingest(self, testlogs_path):
+        """Read test durations from a bazel-testlogs directory.
+
+        For sharded or repeated tests, the duration of the slowest shard or run is recorded because
+        the timeout applies to each of them separately.
+
+        Args:
+            testlogs_path (str): Path to bazel-testlogs.
+        """
+        shard_durations = dict()
+
+        for dirpath, _, filenames in os.walk(testlogs_path):
+            if 'test.xml' not in filenames and 'test.log' not in filenames:
+                continue
+
+            relative_log_path = os.path.relpath(dirpath, testlogs_path).replace(os.sep, '/')
+            mtime = max(os.path.getmtime(os.path.join(dirpath, filename)) for filename in
+                        ('test.xml', 'test.log') if filename in filenames)
+
+            if self._log_mtimes.get(relative_log_path, [None])[0] == mtime:
+                duration = self._log_mtimes[relative_log_path][1]
+            else:
+                duration = _read_xml_duration(os.path.join(dirpath, 'test.xml'))
+
+                if duration is None:
+                    duration = _read_log_duration(os.path.join(dirpath, 'test.log'))
+
+                self._log_mtimes[relative_log_path] = [mtime, duration]
+
+            if duration is None:
+                continue
+
+            # Map e.g. foo/test_bar/shard_1_of_2 to //foo:test_bar.
+            parts = relative_log_path.split('/')
+
+            while len(parts) > 1 and _RUN_DIRECTORY_REGEX.match(parts[-1]):
+                parts = parts[:-1]
+
+            label = '//%s:%s' % ('/'.join(parts[:-1]), parts[-1])
+            shard_durations[label] = max(duration, shard_durations.get(label, 0.0))
+
+        self.durations.update(shard_durations)
+
+    def save(self):
+        """Write the index to its JSON file."""
+        index = {'version': TIMING_INDEX_VERSION, 'durations': self.durations,
+                 'log_mtimes': self._log_mtimes}
+
+        with open(self.index_path, 'w') as index_file:
+            json.dump(index, index_file, separators=(',', ':'), sort_keys=True)
+
+
+def get_test_size_and_timeout(test_timings, script_path, project_root):
+    """Get the size and timeout of a test from its recorded duration.
+
+    Args:
+        test_timings (TimingIndex): Recorded test durations. Can be None.
+        script_path (str): Path to a Python test.
+        project_root (str): Project root directory.
+
+    Returns:
+        size (str): Test size or None if the duration of the test has not been recorded.
+        timeout (str): Test timeout or None if the duration of the test has not been recorded.
+    """
+    if test_timings is None:
+        return None, None
+
+    duration = test_timings.get(get_test_label(script_path, project_root))
+
+    if duration is None:
+        return None, None
+
+    return infer_test_size_and_timeout(duration)